@@ -0,0 +1,497 @@
+"""
+Модуль для асинхронной загрузки комментариев нескольких видео одновременно.
+
+Запросы к endpoint `commentThreads` и `comments` YouTube Data API v3 выполняются через httpx.AsyncClient
+с OAuth-токеном канала. Одновременно загружается не больше `concurrency` видео,
+загруженные страницы отдаются вызывающему коду сразу.
+
+Краткое описание функций:
+- request_page_async: Запрашивает одну страницу API с повторами временных ошибок.
+- iter_video_comment_pages_async: Постранично загружает ветки комментариев одного видео.
+- fetch_videos_comments_async: Загружает комментарии списка видео с ограничением параллельности.
+- fetch_comment_replies_async: Загружает все ответы одной ветки (comments.list).
+- fetch_threads_replies_async: Загружает ответы нескольких веток с ограничением параллельности.
+- get_threads_replies: Синхронная обёртка над fetch_threads_replies_async.
+- iter_videos_comments: Синхронная обёртка, запускающая загрузку в отдельном потоке.
+"""
+import time
+import queue
+import asyncio
+import threading
+
+import httpx
+
+from google.auth.transport.requests import Request
+
+import config
+
+from get_video_comments import CommentFetchError, page_has_only_known_threads
+from metrics import API_REQUESTS, API_REQUEST_SECONDS
+from quota_scheduler import QuotaExceededError
+from rate_limiter import compute_backoff_delay, parse_retry_after
+from utils_youtube import youtube_rate_limiter, DEFAULT_BASE_URL, RETRYABLE_STATUSES, RATE_LIMIT_REASONS
+
+
+class FetchStopped(Exception):
+    """
+    Потребитель результатов прекратил чтение, загрузку нужно остановить.
+    """
+
+
+def get_error_reason(response) -> str:
+    """
+    Извлекает причину ошибки (`reason`) из ответа YouTube API.
+
+    Args:
+        response (httpx.Response): Ответ с ошибкой.
+
+    Returns:
+        str: Причина ошибки (например, "commentsDisabled") или пустая строка.
+    """
+    try:
+        errors = response.json().get('error', {}).get('errors', [])
+    except ValueError:
+        return ""
+
+    return errors[0].get('reason', "") if errors else ""
+
+
+def get_response_status(response) -> str:
+    """
+    Возвращает результат запроса для метрик.
+
+    Args:
+        response (httpx.Response | None): Ответ API или None при сетевой ошибке.
+
+    Returns:
+        str: "ok", код статуса HTTP или "error".
+    """
+    if response is None:
+        return "error"
+
+    return "ok" if response.status_code == 200 else str(response.status_code)
+
+
+async def get_access_token(credentials) -> str:
+    """
+    Возвращает действующий OAuth-токен, при необходимости обновляя учётные данные.
+
+    Args:
+        credentials (google.auth.credentials.Credentials): Учётные данные канала.
+
+    Returns:
+        str: Токен доступа.
+    """
+    if not credentials.valid:
+        await asyncio.to_thread(credentials.refresh, Request())
+
+    return credentials.token
+
+
+async def request_page_async(client, credentials, path, params, endpoint, subject, logger, quota_tracker=None):
+    """
+    Выполняет запрос одной страницы к YouTube Data API с повторами временных ошибок.
+
+    Запросы проходят через общий ограничитель частоты, временные ошибки повторяются
+    с экспоненциальным откатом не больше `config.youtube_max_attempts` раз.
+
+    Args:
+        client (httpx.AsyncClient): HTTP-клиент с базовым адресом YouTube Data API.
+        credentials (google.auth.credentials.Credentials): Учётные данные канала.
+        path (str): Путь метода API (например, "/commentThreads").
+        params (dict): Параметры запроса.
+        endpoint (str): Метод API для учёта квоты (например, "commentThreads.list").
+        subject (str): Описание запрашиваемого объекта для логов (например, "видео <id>").
+        logger (logging.Logger): Логгер.
+        quota_tracker (QuotaTracker, optional): Счётчик квоты проекта.
+
+    Returns:
+        dict | None: Ответ API или None, если комментарии отключены или объект не найден.
+
+    Raises:
+        QuotaExceededError: Если квота проекта исчерпана.
+        CommentFetchError: Если страницу не удалось получить (после всех повторов
+            временных ошибок или при невременной ошибке).
+    """
+    attempt = 0
+
+    while True:
+        attempt += 1
+        await youtube_rate_limiter.acquire_async()
+
+        if quota_tracker is not None:
+            quota_tracker.ensure_available(endpoint)
+
+        started = time.perf_counter()
+
+        try:
+            token = await get_access_token(credentials)
+            response = await client.get(
+                path,
+                params=params,
+                headers={"Authorization": f"Bearer {token}"}
+            )
+        except httpx.HTTPError as err:
+            response = None
+            error_message = str(err)
+        finally:
+            if quota_tracker is not None:
+                quota_tracker.charge(endpoint)
+
+        API_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+        API_REQUESTS.inc(endpoint=endpoint, status=get_response_status(response))
+
+        if response is not None and response.status_code == 200:
+            youtube_rate_limiter.on_success()
+
+            return response.json()
+
+        retry_after = None
+
+        if response is not None:
+            reason = get_error_reason(response)
+            error_message = f"{response.status_code} {reason}"
+
+            if response.status_code == 403 and reason == "quotaExceeded":
+                if quota_tracker is not None:
+                    quota_tracker.mark_exhausted()
+
+                raise QuotaExceededError(f"Квота исчерпана при загрузке комментариев для {subject}.")
+            elif response.status_code == 401:
+                raise CommentFetchError("Ошибка 401: Недействительный API-ключ или истекший токен доступа.")
+            elif response.status_code == 403 and reason == "commentsDisabled":
+                logger.warning("Комментарии отключены для %s, пропускаем...", subject)
+
+                return None
+            elif response.status_code == 404:
+                logger.error("Ошибка 404: не найдено (%s).", subject)
+
+                return None
+            elif response.status_code == 429 or (response.status_code == 403 and reason in RATE_LIMIT_REASONS):
+                retry_after = parse_retry_after(response.headers.get('retry-after'))
+                youtube_rate_limiter.on_throttled(retry_after)
+            elif response.status_code not in RETRYABLE_STATUSES:
+                raise CommentFetchError(f"Ошибка при получении комментариев для {subject}: {error_message}")
+
+        if attempt >= config.youtube_max_attempts:
+            raise CommentFetchError(f"Не удалось получить комментарии для {subject}: {error_message}")
+
+        delay = max(
+            retry_after or 0,
+            compute_backoff_delay(attempt, config.youtube_backoff_base_seconds, config.youtube_backoff_max_seconds)
+        )
+
+        logger.warning(
+            "Временная ошибка для %s (%s), повтор %d/%d через %.1f с",
+            subject, error_message, attempt, config.youtube_max_attempts - 1, delay
+        )
+        await asyncio.sleep(delay)
+
+
+async def iter_video_comment_pages_async(client, credentials, video_id, logger, known_watermark=None, quota_tracker=None, page_token=None):
+    """
+    Асинхронно загружает ветки комментариев видео (включая ответы) и отдаёт их постранично.
+
+    Логика совпадает с iter_video_comment_pages: при переданном `known_watermark` обход страниц
+    прекращается на первой странице без новых веток, при переданном `page_token` обход
+    начинается с этой страницы.
+
+    Args:
+        client (httpx.AsyncClient): HTTP-клиент с базовым адресом YouTube Data API.
+        credentials (google.auth.credentials.Credentials): Учётные данные канала.
+        video_id (str): Идентификатор видео.
+        logger (logging.Logger): Логгер.
+        known_watermark (str, optional): Самая поздняя дата уже сохранённых комментариев видео.
+        quota_tracker (QuotaTracker, optional): Счётчик квоты проекта.
+        page_token (str, optional): Токен страницы, с которой начать обход.
+
+    Yields:
+        tuple: (ветки комментариев (items) одной страницы ответа, токен следующей страницы или None).
+
+    Raises:
+        QuotaExceededError: Если квота проекта исчерпана.
+        CommentFetchError: Если страницу не удалось загрузить (кроме отключённых комментариев
+            и ненайденного видео, при которых обход просто завершается).
+    """
+    params = {
+        "part": "snippet,replies",
+        "videoId": video_id,
+        "maxResults": 100,
+        "order": "time",
+        "textFormat": "plainText"
+    }
+
+    if page_token:
+        params["pageToken"] = page_token
+
+    while True:
+        data = await request_page_async(
+            client=client,
+            credentials=credentials,
+            path="/commentThreads",
+            params=params,
+            endpoint="commentThreads.list",
+            subject=f"видео {video_id}",
+            logger=logger,
+            quota_tracker=quota_tracker
+        )
+
+        if data is None:
+            return
+
+        page_items = data.get('items', [])
+
+        yield page_items, data.get('nextPageToken')
+
+        if known_watermark and page_has_only_known_threads(page_items, known_watermark):
+            return
+
+        if not data.get('nextPageToken'):
+            return
+
+        params = {**params, "pageToken": data['nextPageToken']}
+
+
+async def fetch_videos_comments_async(credentials, videos, concurrency, logger, on_page, base_url=DEFAULT_BASE_URL, quota_tracker=None):
+    """
+    Загружает комментарии списка видео, держа в работе не больше `concurrency` видео одновременно.
+
+    Args:
+        credentials (google.auth.credentials.Credentials): Учётные данные канала.
+        videos (list): Список кортежей (идентификатор видео, known_watermark или None,
+            токен начальной страницы или None).
+        concurrency (int): Максимальное количество одновременно загружаемых видео.
+        logger (logging.Logger): Логгер.
+        on_page (callable): Асинхронная функция (video_id, page_items, next_page_token), вызываемая
+            для каждой загруженной страницы и один раз после последней страницы видео: с page_items=None,
+            если видео загружено полностью, или с ошибкой CommentFetchError вместо page_items.
+        base_url (str, optional): Базовый адрес YouTube Data API (для локального тестового сервера).
+        quota_tracker (QuotaTracker, optional): Счётчик квоты проекта.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def fetch_one(video_id, known_watermark, page_token):
+            try:
+                async with semaphore:
+                    pages = iter_video_comment_pages_async(
+                        client=client,
+                        credentials=credentials,
+                        video_id=video_id,
+                        logger=logger,
+                        known_watermark=known_watermark,
+                        quota_tracker=quota_tracker,
+                        page_token=page_token
+                    )
+
+                    async for page_items, next_page_token in pages:
+                        await on_page(video_id, page_items, next_page_token)
+            except (QuotaExceededError, FetchStopped):
+                raise
+            except CommentFetchError as err:
+                await on_page(video_id, err, None)
+
+                return
+            except Exception as err:
+                await on_page(video_id, CommentFetchError(f"Ошибка при обновлении комментариев видео {video_id}: {err}"), None)
+
+                return
+
+            await on_page(video_id, None, None)
+
+        await asyncio.gather(*(fetch_one(*video) for video in videos))
+
+
+async def fetch_comment_replies_async(client, credentials, parent_id, logger, quota_tracker=None):
+    """
+    Асинхронно получает все ответы на комментарий через comments.list(parentId=...).
+
+    Args:
+        client (httpx.AsyncClient): HTTP-клиент с базовым адресом YouTube Data API.
+        credentials (google.auth.credentials.Credentials): Учётные данные канала.
+        parent_id (str): Идентификатор основного комментария ветки.
+        logger (logging.Logger): Логгер.
+        quota_tracker (QuotaTracker, optional): Счётчик квоты проекта.
+
+    Returns:
+        list | None: Ответы в порядке API или None, если загрузить их полностью не удалось.
+
+    Raises:
+        QuotaExceededError: Если квота проекта исчерпана.
+    """
+    replies = []
+    params = {
+        "part": "snippet",
+        "parentId": parent_id,
+        "maxResults": 100,
+        "textFormat": "plainText"
+    }
+
+    while True:
+        try:
+            data = await request_page_async(
+                client=client,
+                credentials=credentials,
+                path="/comments",
+                params=params,
+                endpoint="comments.list",
+                subject=f"ветки {parent_id}",
+                logger=logger,
+                quota_tracker=quota_tracker
+            )
+        except CommentFetchError as err:
+            logger.error("%s", err)
+
+            return None
+
+        if data is None:
+            return None
+
+        replies.extend(data.get('items', []))
+
+        if not data.get('nextPageToken'):
+            return replies
+
+        params = {**params, "pageToken": data['nextPageToken']}
+
+
+async def fetch_threads_replies_async(credentials, parent_ids, concurrency, logger, base_url=DEFAULT_BASE_URL, quota_tracker=None):
+    """
+    Загружает ответы нескольких веток, держа в работе не больше `concurrency` веток одновременно.
+
+    Args:
+        credentials (google.auth.credentials.Credentials): Учётные данные канала.
+        parent_ids (list): Идентификаторы основных комментариев веток.
+        concurrency (int): Максимальное количество одновременно загружаемых веток.
+        logger (logging.Logger): Логгер.
+        base_url (str, optional): Базовый адрес YouTube Data API.
+        quota_tracker (QuotaTracker, optional): Счётчик квоты проекта.
+
+    Returns:
+        dict: Ответы по веткам {идентификатор ветки: список ответов или None}.
+
+    Raises:
+        QuotaExceededError: Если квота проекта исчерпана.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def fetch_one(parent_id):
+            async with semaphore:
+                return await fetch_comment_replies_async(client, credentials, parent_id, logger, quota_tracker)
+
+        results = await asyncio.gather(*(fetch_one(parent_id) for parent_id in parent_ids))
+
+    return dict(zip(parent_ids, results))
+
+
+def get_threads_replies(credentials, parent_ids, concurrency, logger, base_url=DEFAULT_BASE_URL, quota_tracker=None):
+    """
+    Синхронная обёртка над fetch_threads_replies_async для вызова из потока обработки канала.
+
+    Args:
+        credentials (google.auth.credentials.Credentials): Учётные данные канала.
+        parent_ids (list): Идентификаторы основных комментариев веток.
+        concurrency (int): Максимальное количество одновременно загружаемых веток.
+        logger (logging.Logger): Логгер.
+        base_url (str, optional): Базовый адрес YouTube Data API.
+        quota_tracker (QuotaTracker, optional): Счётчик квоты проекта.
+
+    Returns:
+        dict: Ответы по веткам {идентификатор ветки: список ответов или None}.
+
+    Raises:
+        QuotaExceededError: Если квота проекта исчерпана.
+    """
+    if not parent_ids:
+        return {}
+
+    return asyncio.run(fetch_threads_replies_async(credentials, parent_ids, concurrency, logger, base_url, quota_tracker))
+
+
+def iter_videos_comments(credentials, videos, concurrency, logger, base_url=DEFAULT_BASE_URL, quota_tracker=None):
+    """
+    Загружает комментарии видео асинхронно и отдаёт их синхронному коду постранично.
+
+    Цикл событий работает в отдельном потоке, загруженные страницы передаются через
+    ограниченную очередь, поэтому сохранение в базу данных и уведомления выполняются
+    в вызывающем потоке параллельно с загрузкой, а в памяти находится не больше
+    `concurrency` страниц. Страницы разных видео могут чередоваться.
+
+    Args:
+        credentials (google.auth.credentials.Credentials): Учётные данные канала.
+        videos (list): Список кортежей (идентификатор видео, known_watermark или None,
+            токен начальной страницы или None).
+        concurrency (int): Максимальное количество одновременно загружаемых видео.
+        logger (logging.Logger): Логгер.
+        base_url (str, optional): Базовый адрес YouTube Data API.
+        quota_tracker (QuotaTracker, optional): Счётчик квоты проекта.
+
+    Yields:
+        tuple: (идентификатор видео, ветки одной страницы, токен следующей страницы). После
+               последней страницы видео отдаётся (идентификатор видео, None, None), а если видео
+               загружено не полностью — (идентификатор видео, CommentFetchError, None).
+
+    Raises:
+        QuotaExceededError: Если квота проекта исчерпана во время загрузки.
+    """
+    results = queue.Queue(maxsize=concurrency)
+    stop_event = threading.Event()
+    finished = object()
+    errors = []
+
+    def put_result(result):
+        # Ждём освобождения места в очереди, пока потребитель не прекратил чтение
+        while not stop_event.is_set():
+            try:
+                results.put(result, timeout=1)
+
+                return
+            except queue.Full:
+                continue
+
+    async def on_page(video_id, page_items, next_page_token):
+        if stop_event.is_set():
+            raise FetchStopped()
+
+        await asyncio.to_thread(put_result, (video_id, page_items, next_page_token))
+
+    def run_loop():
+        try:
+            asyncio.run(fetch_videos_comments_async(
+                credentials=credentials,
+                videos=videos,
+                concurrency=concurrency,
+                logger=logger,
+                on_page=on_page,
+                base_url=base_url,
+                quota_tracker=quota_tracker
+            ))
+        except FetchStopped:
+            pass
+        except QuotaExceededError as err:
+            errors.append(err)
+        except Exception as err:
+            logger.error("Ошибка асинхронной загрузки комментариев: %s", err)
+        finally:
+            put_result(finished)
+
+    fetch_thread = threading.Thread(target=run_loop, name="async-comment-fetcher", daemon=True)
+    fetch_thread.start()
+
+    try:
+        while True:
+            result = results.get()
+
+            if result is finished:
+                break
+
+            yield result
+
+        if errors:
+            raise errors[0]
+    finally:
+        stop_event.set()
+        fetch_thread.join()
@@ -0,0 +1,389 @@
+"""
+Сквозной бенчмарк получения комментариев на локальном имитаторе YouTube Data API.
+
+Скрипт запускает fake_youtube_api.FakeYouTubeServer с заданным размером каналов,
+создаёт временную базу данных и токены каналов и выполняет несколько запусков
+`youtube_chanells_comments_fetcher.main()`. Первый запуск загружает все комментарии,
+перед каждым следующим на всех видео появляется `--new-threads` новых веток.
+Для каждого запуска выводятся время, количество запросов к API, скорость записи
+в базу данных и пиковая память (размер процесса, с `--trace-memory` — и пик
+выделений Python за запуск). Имитатор работает в том же процессе.
+
+Результаты можно сохранить (`--output`) и сравнить с сохранёнными ранее (`--baseline`):
+при замедлении больше `--max-regression` процентов скрипт завершается с кодом 1.
+С кодом 1 скрипт завершается и тогда, когда запуск не уложился в `--max-run-seconds`
+или частота запросов запуска ниже `--min-requests-per-second` (например, из-за того,
+что ограничитель частоты не восстанавливается после ответов 429 при `--error-rate`).
+
+Пример:
+    python benchmark_fetcher.py --channels 2 --videos 50 --threads 200 --replies 8 --error-rate 0.02
+    python benchmark_fetcher.py --error-rate 0.05 --min-requests-per-second 20 --max-run-seconds 120
+    python benchmark_fetcher.py --async-fetch --output bench.json
+    python benchmark_fetcher.py --async-fetch --baseline bench.json
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import logging
+import argparse
+import tempfile
+import threading
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Windows: пиковый размер процесса не измеряется
+    resource = None
+
+from google.oauth2.credentials import Credentials
+
+import config
+
+from metrics import DB_SAVE_SECONDS
+from init_database import init_database
+from utils_database import connect_database
+from fake_youtube_api import FakeYouTubeData, FakeYouTubeServer, get_fake_token
+
+
+def parse_args():
+    """
+    Разбирает аргументы командной строки.
+
+    Returns:
+        argparse.Namespace: Аргументы.
+    """
+    parser = argparse.ArgumentParser(description="Бенчмарк получения комментариев на локальном имитаторе YouTube API.")
+
+    parser.add_argument("--channels", type=int, default=1, help="Количество каналов.")
+    parser.add_argument("--videos", type=int, default=20, help="Количество видео на канале.")
+    parser.add_argument("--threads", type=int, default=200, help="Количество веток у видео.")
+    parser.add_argument("--replies", type=int, default=3, help="Количество ответов в ветке.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 429.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Доля ответов 403 rateLimitExceeded.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Задержка ответа сервера в миллисекундах.")
+    parser.add_argument("--runs", type=int, default=2, help="Количество запусков (первый — полная загрузка).")
+    parser.add_argument("--new-threads", type=int, default=10, help="Новых веток на видео перед каждым следующим запуском.")
+    parser.add_argument("--async-fetch", action="store_true", help="Асинхронная загрузка комментариев (httpx).")
+    parser.add_argument("--concurrency", type=int, default=config.async_fetch_concurrency, help="Параллельных видео при асинхронной загрузке.")
+    parser.add_argument("--workers", type=int, default=config.channel_workers, help="Каналов, обрабатываемых параллельно.")
+    parser.add_argument("--requests-per-second", type=float, default=1000, help="Ограничение частоты запросов к API.")
+    parser.add_argument("--backoff-base", type=float, default=0.01, help="Базовая задержка повтора после ошибки в секундах.")
+    parser.add_argument("--trace-memory", action="store_true", help="Измерять пиковую память запуска через tracemalloc (замедляет работу в несколько раз).")
+    parser.add_argument("--output", help="Файл JSON для сохранения результатов.")
+    parser.add_argument("--baseline", help="Файл JSON с результатами для сравнения.")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="Допустимое замедление в процентах.")
+    parser.add_argument("--max-run-seconds", type=float, default=600, help="Максимальная длительность одного запуска.")
+    parser.add_argument("--min-requests-per-second", type=float, help="Минимально допустимая частота запросов запуска.")
+
+    return parser.parse_args()
+
+
+def configure(args, work_dir: str, base_url: str):
+    """
+    Настраивает конфигурацию программы на временную папку и локальный сервер.
+
+    Модули программы читают часть настроек при импорте (например, ограничитель
+    частоты запросов), поэтому функция вызывается до их импорта.
+
+    Args:
+        args (argparse.Namespace): Аргументы командной строки.
+        work_dir (str): Временная папка для базы данных и токенов.
+        base_url (str): Базовый адрес локального сервера API.
+    """
+    config.channels = []
+
+    for channel_index in range(args.channels):
+        token_path = os.path.join(work_dir, f"token_{channel_index}.pickle")
+
+        with open(token_path, 'wb') as token_file:
+            pickle.dump(Credentials(token=get_fake_token(channel_index)), token_file)
+
+        # Общий client_secret: все каналы расходуют квоту одного проекта
+        config.channels.append({
+            "token_channel_path": token_path,
+            "client_secret_path": os.path.join(work_dir, "client_secret.json")
+        })
+
+    config.database_path = os.path.join(work_dir, "comments.db")
+    config.youtube_api_base_url = base_url
+    config.async_comment_fetch = args.async_fetch
+    config.async_fetch_concurrency = args.concurrency
+    config.channel_workers = args.workers
+    config.youtube_requests_per_second = args.requests_per_second
+    config.youtube_burst_requests = max(1, int(args.requests_per_second))
+    config.youtube_backoff_base_seconds = args.backoff_base
+    config.youtube_backoff_max_seconds = max(args.backoff_base, 1)
+    config.quota_daily_limit = 10 ** 9
+    config.full_crawl_every_n_runs = 0
+    config.send_notification_on_telegram = False
+    config.save_comments_data_to_json = False
+    config.metrics_textfile_path = None
+    config.metrics_http_port = None
+
+
+def count_rows(database_path: str, table: str) -> int:
+    """
+    Возвращает количество строк таблицы.
+    """
+    conn = connect_database(database_path)
+
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def get_histogram_sum(histogram) -> float:
+    """
+    Возвращает суммарное время по всем сериям гистограммы метрик.
+    """
+    return sum(series["sum"] for series in histogram._values.values())
+
+
+def get_peak_rss_mb():
+    """
+    Возвращает пиковый размер процесса в памяти с момента его запуска.
+
+    Returns:
+        float | None: Размер в МБ или None, если модуль resource недоступен.
+    """
+    if resource is None:
+        return None
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # В macOS ru_maxrss в байтах, в Linux — в килобайтах
+    return round(peak_rss / 2 ** 20 if sys.platform == "darwin" else peak_rss / 2 ** 10, 1)
+
+
+def run_once(fetcher, data: FakeYouTubeData, trace_memory: bool, max_seconds: float) -> dict:
+    """
+    Выполняет один запуск программы и собирает его показатели.
+
+    Запуск выполняется в отдельном потоке: если он не завершился за `max_seconds`,
+    ожидание прекращается и показатели запуска отмечаются как timed_out.
+
+    Args:
+        fetcher (module): Модуль youtube_chanells_comments_fetcher.
+        data (FakeYouTubeData): Данные локального сервера.
+        trace_memory (bool): Измерять ли пиковую память через tracemalloc.
+        max_seconds (float): Максимальная длительность запуска в секундах.
+
+    Returns:
+        dict: Показатели запуска.
+    """
+    # Ограничитель частоты создаётся при импорте utils_youtube (после настройки конфигурации)
+    from utils_youtube import youtube_rate_limiter
+
+    comments_before = count_rows(config.database_path, "comments")
+    db_seconds_before = get_histogram_sum(DB_SAVE_SECONDS)
+    throttled_before = youtube_rate_limiter.throttled_count
+    slowdowns_before = youtube_rate_limiter.slowdown_count
+    data.reset_stats()
+
+    if trace_memory:
+        tracemalloc.start()
+
+    errors = []
+
+    def run_fetcher():
+        try:
+            fetcher.main()
+        except BaseException as err:
+            errors.append(err)
+
+    started = time.perf_counter()
+    runner = threading.Thread(target=run_fetcher, name="benchmark-run", daemon=True)
+    runner.start()
+    runner.join(max_seconds)
+    elapsed = time.perf_counter() - started
+    timed_out = runner.is_alive()
+
+    if errors:
+        raise errors[0]
+
+    peak_memory = None
+
+    if trace_memory:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    stats = data.get_stats()
+    new_comments = count_rows(config.database_path, "comments") - comments_before
+    api_calls = sum(stats["requests"].values())
+
+    return {
+        "seconds": round(elapsed, 3),
+        "timed_out": timed_out,
+        "api_calls": api_calls,
+        "api_calls_by_endpoint": stats["requests"],
+        "injected_errors": stats["injected_errors"],
+        "throttled_responses": youtube_rate_limiter.throttled_count - throttled_before,
+        "rate_slowdowns": youtube_rate_limiter.slowdown_count - slowdowns_before,
+        "final_rate": round(float(youtube_rate_limiter.rate), 1),
+        "new_comments": new_comments,
+        "comments_per_second": round(new_comments / elapsed, 1) if elapsed else None,
+        "api_calls_per_second": round(api_calls / elapsed, 1) if elapsed else None,
+        "db_save_seconds": round(get_histogram_sum(DB_SAVE_SECONDS) - db_seconds_before, 3),
+        "peak_memory_mb": round(peak_memory / 2 ** 20, 1) if peak_memory is not None else None,
+        "peak_rss_mb": get_peak_rss_mb()
+    }
+
+
+def print_results(results: list):
+    """
+    Выводит показатели запусков таблицей.
+    """
+    print(f"{'Запуск':>6} {'Время, с':>9} {'Запросов':>9} {'Комм.':>9} {'Комм./с':>9} {'Запр./с':>8} {'БД, с':>7} {'Память, МБ':>11} {'RSS, МБ':>8}")
+
+    for number, result in enumerate(results, start=1):
+        print(
+            f"{number:>6} {result['seconds']:>9} {result['api_calls']:>9} {result['new_comments']:>9} "
+            f"{result['comments_per_second']:>9} {result['api_calls_per_second']:>8} "
+            f"{result['db_save_seconds']:>7} {str(result['peak_memory_mb']):>11} {str(result['peak_rss_mb']):>8}"
+        )
+        print(f"{'':>6} запросы: {result['api_calls_by_endpoint']}, ошибки: {result['injected_errors']}")
+        print(
+            f"{'':>6} ответов «слишком много запросов»: {result['throttled_responses']}, "
+            f"снижений частоты: {result['rate_slowdowns']}, "
+            f"частота в конце: {result['final_rate']} из {config.youtube_requests_per_second} запр./с"
+        )
+
+        if result["timed_out"]:
+            print(f"{'':>6} запуск не завершился за {result['seconds']} с")
+
+
+def check_limits(results: list, max_seconds: float, min_requests_per_second: float) -> bool:
+    """
+    Проверяет, что запуски уложились в допустимое время и частоту запросов.
+
+    Args:
+        results (list): Показатели запусков.
+        max_seconds (float): Максимальная длительность запуска в секундах.
+        min_requests_per_second (float | None): Минимально допустимая частота запросов.
+
+    Returns:
+        bool: True, если все запуски уложились в ограничения.
+    """
+    passed = True
+
+    for number, result in enumerate(results, start=1):
+        if result["timed_out"]:
+            print(f"Запуск {number}: не завершился за {max_seconds} с: ПРЕВЫШЕНО ВРЕМЯ")
+            passed = False
+        elif min_requests_per_second is not None and result["api_calls_per_second"] < min_requests_per_second:
+            print(
+                f"Запуск {number}: {result['api_calls_per_second']} запр./с при минимуме "
+                f"{min_requests_per_second}: НИЗКАЯ ЧАСТОТА ЗАПРОСОВ"
+            )
+            passed = False
+
+    return passed
+
+
+def compare_with_baseline(results: list, baseline_path: str, max_regression: float) -> bool:
+    """
+    Сравнивает время запусков с сохранёнными результатами.
+
+    Args:
+        results (list): Показатели текущих запусков.
+        baseline_path (str): Файл JSON с прежними результатами.
+        max_regression (float): Допустимое замедление в процентах.
+
+    Returns:
+        bool: True, если ни один запуск не замедлился больше допустимого.
+    """
+    with open(baseline_path, 'r', encoding='utf-8') as file:
+        baseline = json.load(file)["results"]
+
+    passed = True
+
+    for number, (result, previous) in enumerate(zip(results, baseline), start=1):
+        change = (result["seconds"] - previous["seconds"]) / previous["seconds"] * 100 if previous["seconds"] else 0.0
+        status = "OK"
+
+        if change > max_regression:
+            status = "ЗАМЕДЛЕНИЕ"
+            passed = False
+
+        if result["api_calls"] > previous["api_calls"]:
+            status = "БОЛЬШЕ ЗАПРОСОВ"
+            passed = False
+
+        print(
+            f"Запуск {number}: {previous['seconds']} с -> {result['seconds']} с ({change:+.1f}%), "
+            f"запросов {previous['api_calls']} -> {result['api_calls']}: {status}"
+        )
+
+    return passed
+
+
+def main():
+    """
+    Запускает бенчмарк.
+
+    Returns:
+        int: Код завершения (1 при замедлении относительно `--baseline` или нарушении
+            `--max-run-seconds` и `--min-requests-per-second`).
+    """
+    args = parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    data = FakeYouTubeData(
+        channels=args.channels,
+        videos=args.videos,
+        threads=args.threads,
+        replies=args.replies,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        latency_ms=args.latency_ms
+    )
+    server = FakeYouTubeServer(data)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        configure(args, work_dir, server.start())
+
+        # Импорт после настройки: модуль создаёт ограничитель частоты запросов при импорте
+        import youtube_chanells_comments_fetcher as fetcher
+
+        fetcher.logger = logging.getLogger()
+        init_database(database_path=config.database_path, main_logger=fetcher.logger)
+        results = []
+
+        try:
+            for run_number in range(args.runs):
+                if run_number:
+                    data.add_threads(args.new_threads)
+
+                results.append(run_once(fetcher, data, trace_memory=args.trace_memory, max_seconds=args.max_run_seconds))
+
+                if results[-1]["timed_out"]:
+                    break
+        finally:
+            server.stop()
+
+    print_results(results)
+    passed = check_limits(results, args.max_run_seconds, args.min_requests_per_second)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({"args": vars(args), "results": results}, file, ensure_ascii=False, indent=4)
+
+    if args.baseline and not compare_with_baseline(results, args.baseline, args.max_regression):
+        passed = False
+
+    if results and results[-1]["timed_out"]:
+        # Незавершённый запуск продолжает работать в потоках программы, которых нельзя
+        # остановить снаружи: процесс завершается без ожидания их окончания
+        sys.stdout.flush()
+        os._exit(1)
+
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Модуль суррогатных ключей каналов, видео и авторов комментариев.
+
+Строки таблицы `comment_rows` хранят вместо текстовых идентификаторов канала, видео
+и автора целочисленные ключи справочников `dim_channels`, `dim_videos` и `dim_authors`
+(представление `comments` возвращает строки в прежнем виде). Ключи выдаются
+в Python: DimensionCache помнит уже известные ключи, поэтому при сохранении страницы
+комментариев к справочникам обращаются только для новых каналов, видео и авторов.
+
+Краткое описание:
+- DimensionCache: Кэш ключей справочников, заполняемый при сохранении комментариев.
+"""
+import config
+
+
+# Количество идентификаторов каналов авторов в одном запросе ключей (ограничение числа параметров SQLite)
+AUTHOR_KEYS_QUERY_SIZE = 500
+
+
+class DimensionCache:
+    """
+    Ключи справочников каналов, видео и авторов.
+
+    Ключи, полученные внутри транзакции, используются сразу, но запоминаются только после
+    её фиксации (commit): после отката в кэше не остаётся ключей несохранённых строк
+    справочников. Экземпляр используется одним потоком (например, на время обработки
+    одного канала) и очищается, когда число ключей превышает `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = None):
+        """
+        Args:
+            max_entries (int, optional): Максимальное количество запоминаемых ключей.
+                По умолчанию `config.dimension_cache_max_entries`.
+        """
+        self.max_entries = config.dimension_cache_max_entries if max_entries is None else max_entries
+
+        self._channels = {}
+        self._videos = {}
+        self._authors = {}
+        self._pending = ({}, {}, {})
+
+    def get_channel_keys(self, cursor, channels: dict) -> dict:
+        """
+        Возвращает ключи каналов, добавляя новые каналы в справочник и обновляя изменившиеся названия.
+
+        Args:
+            cursor (sqlite3.Cursor): Курсор базы данных (внутри открытой транзакции).
+            channels (dict): Названия каналов {идентификатор канала: название}.
+
+        Returns:
+            dict: Ключи каналов {идентификатор канала: ключ}.
+        """
+        keys = {}
+
+        for channel_id, channel_name in channels.items():
+            known = self._pending[0].get(channel_id) or self._channels.get(channel_id)
+
+            if known is None or known[1] != channel_name:
+                cursor.execute('''
+                    INSERT INTO dim_channels (channel_id, channel_name)
+                    VALUES (?, ?)
+                    ON CONFLICT (channel_id) DO UPDATE SET channel_name = excluded.channel_name
+                    RETURNING id
+                ''', (channel_id, channel_name))
+
+                known = (cursor.fetchone()[0], channel_name)
+                self._pending[0][channel_id] = known
+
+            keys[channel_id] = known[0]
+
+        return keys
+
+    def get_video_keys(self, cursor, videos: dict) -> dict:
+        """
+        Возвращает ключи видео, добавляя новые видео в справочник.
+
+        Args:
+            cursor (sqlite3.Cursor): Курсор базы данных (внутри открытой транзакции).
+            videos (dict): Ключи каналов видео {идентификатор видео: ключ канала}.
+
+        Returns:
+            dict: Ключи видео {идентификатор видео: ключ}.
+        """
+        keys = {}
+
+        for video_id, channel_key in videos.items():
+            key = self._pending[1].get(video_id) or self._videos.get(video_id)
+
+            if key is None:
+                cursor.execute('''
+                    INSERT INTO dim_videos (youtube_video_id, channel_key)
+                    VALUES (?, ?)
+                    ON CONFLICT (youtube_video_id) DO UPDATE SET channel_key = excluded.channel_key
+                    RETURNING id
+                ''', (video_id, channel_key))
+
+                key = cursor.fetchone()[0]
+                self._pending[1][video_id] = key
+
+            keys[video_id] = key
+
+        return keys
+
+    def get_author_keys(self, cursor, authors: set) -> dict:
+        """
+        Возвращает ключи авторов, добавляя новых авторов в справочник.
+
+        Автор — это пара (идентификатор канала автора, отображаемое имя), поэтому
+        у комментариев сохраняется имя автора на момент их загрузки. Новые авторы
+        добавляются одним executemany, их ключи читаются запросами по индексу справочника.
+
+        Args:
+            cursor (sqlite3.Cursor): Курсор базы данных (внутри открытой транзакции).
+            authors (set): Пары (идентификатор канала автора, имя автора).
+
+        Returns:
+            dict: Ключи авторов {(идентификатор канала автора, имя автора): ключ}.
+        """
+        keys = {}
+        missing = []
+
+        for author in authors:
+            key = self._pending[2].get(author) or self._authors.get(author)
+
+            if key is None:
+                missing.append(author)
+            else:
+                keys[author] = key
+
+        if not missing:
+            return keys
+
+        cursor.executemany('''
+            INSERT INTO dim_authors (author_channel_id, author)
+            VALUES (?, ?)
+            ON CONFLICT (author_channel_id, author) DO NOTHING
+        ''', missing)
+
+        missing_set = set(missing)
+        author_channel_ids = sorted({author_channel_id for author_channel_id, _ in missing})
+
+        for start in range(0, len(author_channel_ids), AUTHOR_KEYS_QUERY_SIZE):
+            chunk = author_channel_ids[start:start + AUTHOR_KEYS_QUERY_SIZE]
+
+            cursor.execute(f'''
+                SELECT id, author_channel_id, author
+                FROM dim_authors
+                WHERE author_channel_id IN ({", ".join("?" for _ in chunk)})
+            ''', chunk)
+
+            for key, author_channel_id, author in cursor.fetchall():
+                author = (author_channel_id, author)
+
+                if author in missing_set:
+                    keys[author] = key
+                    self._pending[2][author] = key
+
+        return keys
+
+    def commit(self):
+        """
+        Запоминает ключи, полученные в зафиксированной транзакции.
+        """
+        for known, pending in zip((self._channels, self._videos, self._authors), self._pending):
+            known.update(pending)
+            pending.clear()
+
+        if len(self._channels) + len(self._videos) + len(self._authors) > self.max_entries:
+            self._channels.clear()
+            self._videos.clear()
+            self._authors.clear()
+
+    def rollback(self):
+        """
+        Забывает ключи, полученные в откатанной транзакции.
+        """
+        for pending in self._pending:
+            pending.clear()
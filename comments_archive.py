@@ -0,0 +1,414 @@
+"""
+Модуль архива исходных данных комментариев.
+
+Ветки комментариев в том виде, в каком их вернул YouTube API, дописываются в сжатые
+сегменты JSONL: один сегмент на канал и месяц (`<channel_id>/<YYYY-MM>.jsonl.gz`).
+Каждая пачка записей сжимается отдельным блоком (gzip member или zstd frame), поэтому
+файл сегмента только дописывается и остаётся корректным сжатым потоком. Таблица
+`archive_index` хранит для каждой версии ветки смещение её блока: по нему ветка
+находится без распаковки всего сегмента. Таблица `thread_hashes` хранит хэш последней
+сохранённой версии каждой ветки; хэши видео загружаются в память один раз, поэтому
+неизменившиеся ветки отсеиваются без обращения к архиву и без запросов на каждую ветку.
+
+Краткое описание:
+- get_compression: Выбирает доступный формат сжатия.
+- get_content_hash: Вычисляет хэш содержимого ветки, по которому определяются изменения.
+- ThreadHashCache: Хэши последних сохранённых версий веток, загружаемые по видео.
+- get_segment_path: Формирует относительный путь сегмента канала за месяц.
+- append_threads_to_archive: Дописывает новые и изменившиеся ветки в архив.
+- read_archived_thread: Находит последнюю сохранённую версию ветки по идентификатору.
+- iter_segment_records: Последовательно читает все записи сегмента.
+"""
+import os
+import gzip
+import json
+import hashlib
+import threading
+
+from datetime import datetime, timezone
+
+from get_video_comments import get_thread_last_activity
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Расширения файлов сегментов для поддерживаемых форматов сжатия
+SEGMENT_EXTENSIONS = {
+    "gzip": ".jsonl.gz",
+    "zstd": ".jsonl.zst"
+}
+
+# Запись в файлы сегментов из потоков обработки каналов выполняется по очереди
+_write_lock = threading.Lock()
+
+
+def get_compression(compression: str, logger) -> str:
+    """
+    Выбирает формат сжатия: zstd доступен только при установленном пакете zstandard.
+
+    Args:
+        compression (str): Запрошенный формат ("gzip" или "zstd").
+        logger (logging.Logger): Логгер.
+
+    Returns:
+        str: Используемый формат сжатия.
+    """
+    if compression == "zstd" and zstandard is None:
+        logger.warning("Пакет zstandard не установлен, архив комментариев сжимается gzip.")
+
+        return "gzip"
+
+    return compression if compression in SEGMENT_EXTENSIONS else "gzip"
+
+
+def compress_block(data: bytes, compression: str) -> bytes:
+    """
+    Сжимает пачку записей в самостоятельный блок.
+
+    Args:
+        data (bytes): Строки JSONL.
+        compression (str): Формат сжатия.
+
+    Returns:
+        bytes: Сжатый блок.
+    """
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress_block(data: bytes, segment_path: str) -> bytes:
+    """
+    Распаковывает один блок сегмента. Формат определяется по расширению файла.
+
+    Args:
+        data (bytes): Сжатый блок.
+        segment_path (str): Путь к файлу сегмента.
+
+    Returns:
+        bytes: Строки JSONL.
+    """
+    if segment_path.endswith(SEGMENT_EXTENSIONS["zstd"]):
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    return gzip.decompress(data)
+
+
+def get_content_hash(comment_thread: dict) -> str:
+    """
+    Вычисляет хэш содержимого ветки, по которому определяются изменения.
+
+    Как и в прежнем хранении по файлам, новой версией ветки считается изменение даты
+    обновления основного комментария или списка ответов. Счётчики (лайки, число ответов)
+    в хэш не входят, чтобы их постоянный рост не создавал новых версий: у ответов перед
+    хэшированием удаляются `likeCount` и `etag`, который меняется вместе со счётчиками.
+    Ключи сериализуются в отсортированном порядке, поэтому хэш не зависит от порядка
+    полей в ответе API.
+
+    Args:
+        comment_thread (dict): Ветка комментариев из ответа commentThreads.list.
+
+    Returns:
+        str: Шестнадцатеричный хэш SHA-256.
+    """
+    replies = comment_thread.get('replies', {}).get('comments')
+
+    if replies is not None:
+        replies = [
+            {
+                **{key: value for key, value in reply.items() if key != 'etag'},
+                "snippet": {key: value for key, value in reply.get('snippet', {}).items() if key != 'likeCount'}
+            }
+            for reply in replies
+        ]
+
+    content = {
+        "updatedAt": comment_thread['snippet']['topLevelComment']['snippet']['updatedAt'],
+        "replies": replies
+    }
+
+    return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class ThreadHashCache:
+    """
+    Хэши последних сохранённых в архив версий веток, сгруппированные по видео.
+
+    Хэши видео загружаются из таблицы `thread_hashes` одним запросом при первом
+    обращении и затем проверяются в памяти. Экземпляр используется одним потоком
+    (например, на время обработки одного канала).
+    """
+
+    def __init__(self, conn):
+        """
+        Args:
+            conn (sqlite3.Connection): Соединение с базой данных.
+        """
+        self.conn = conn
+        self._hashes = {}
+
+    def get(self, video_id: str) -> dict:
+        """
+        Args:
+            video_id (str): Идентификатор видео.
+
+        Returns:
+            dict: Хэши веток видео {идентификатор ветки: хэш}.
+        """
+        if video_id not in self._hashes:
+            cursor = self.conn.execute('''
+                SELECT comment_id, content_hash
+                FROM thread_hashes
+                WHERE youtube_video_id = ?
+            ''', (video_id,))
+
+            self._hashes[video_id] = dict(cursor.fetchall())
+
+        return self._hashes[video_id]
+
+    def is_unchanged(self, video_id: str, comment_id: str, content_hash: str) -> bool:
+        """
+        Returns:
+            bool: True, если эта версия ветки уже сохранена в архиве.
+        """
+        return self.get(video_id).get(comment_id) == content_hash
+
+    def update(self, video_id: str, comment_id: str, content_hash: str):
+        """
+        Запоминает хэш сохранённой версии ветки (после фиксации транзакции).
+        """
+        self.get(video_id)[comment_id] = content_hash
+
+
+def get_segment_path(channel_id: str, moment: datetime, compression: str) -> str:
+    """
+    Формирует относительный путь сегмента канала за месяц.
+
+    Args:
+        channel_id (str): Идентификатор канала.
+        moment (datetime): Момент записи, определяющий месяц сегмента.
+        compression (str): Формат сжатия.
+
+    Returns:
+        str: Путь относительно папки архива.
+    """
+    return os.path.join(channel_id, f"{moment.strftime('%Y-%m')}{SEGMENT_EXTENSIONS[compression]}")
+
+
+def append_threads_to_archive(conn, comment_threads, archive_dir, compression, logger, archived_at=None, hash_cache=None, use_thread_dates=False) -> int:
+    """
+    Дописывает новые и изменившиеся ветки комментариев в архив.
+
+    Ветки, хэш которых совпадает с хэшем последней сохранённой версии, пропускаются
+    проверкой в памяти (см. ThreadHashCache). Остальные ветки одного канала сжимаются
+    одним блоком и дописываются в конец сегмента, после чего смещение блока и новые
+    хэши сохраняются в одной транзакции. Хэшем последней версии ветки становится
+    хэш версии с самой поздней датой сохранения (archived_date), поэтому перенесённые
+    старые версии не заменяют уже сохранённые более новые.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        comment_threads (list): Ветки комментариев из ответа commentThreads.list.
+        archive_dir (str): Папка архива.
+        compression (str): Формат сжатия ("gzip" или "zstd").
+        logger (logging.Logger): Логгер.
+        archived_at (datetime, optional): Момент записи (определяет месяц сегмента). По умолчанию текущий.
+        hash_cache (ThreadHashCache, optional): Кэш хэшей, переиспользуемый между вызовами.
+            По умолчанию создаётся на время вызова.
+        use_thread_dates (bool, optional): Сохранять версии с датой последней активности ветки
+            вместо текущей (для переноса старых версий). По умолчанию False.
+
+    Returns:
+        int: Количество записанных веток.
+    """
+    compression = get_compression(compression, logger)
+    archived_at = archived_at or datetime.now(timezone.utc)
+    archived_date = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    hash_cache = hash_cache or ThreadHashCache(conn)
+
+    records = {}
+    record_dates = {}
+
+    for comment_thread in comment_threads:
+        try:
+            comment_id = comment_thread['id']
+            content_hash = get_content_hash(comment_thread)
+
+            if not hash_cache.is_unchanged(comment_thread['snippet']['videoId'], comment_id, content_hash):
+                record_date = get_thread_last_activity(comment_thread) if use_thread_dates else archived_date
+
+                records[(comment_id, content_hash)] = comment_thread
+                record_dates[(comment_id, content_hash)] = record_date
+        except KeyError as err:
+            logger.error("Отсутствует ожидаемый ключ в данных ветки для архива: %s", err)
+
+    if not records:
+        return 0
+
+    # Новые версии группируются по каналам: у каждого канала свои сегменты
+    threads_by_channel = {}
+
+    for (comment_id, content_hash), comment_thread in records.items():
+        channel_id = comment_thread['snippet']['channelId']
+        threads_by_channel.setdefault(channel_id, []).append((comment_id, content_hash, comment_thread))
+
+    written = 0
+
+    for channel_id, channel_threads in threads_by_channel.items():
+        segment_path = get_segment_path(channel_id, archived_at, compression)
+        full_path = os.path.join(archive_dir, segment_path)
+
+        lines = "".join(
+            json.dumps(comment_thread, ensure_ascii=False, separators=(',', ':')) + "\n"
+            for _, _, comment_thread in channel_threads
+        )
+        block = compress_block(lines.encode('utf-8'), compression)
+
+        with _write_lock:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+            with open(full_path, 'ab') as file:
+                block_offset = file.seek(0, os.SEEK_END)
+                file.write(block)
+
+        # Если программа завершится до записи индекса, ветка будет дописана повторно
+        # в следующем запуске, а индекс укажет на последнюю копию
+        with conn:
+            conn.executemany('''
+                INSERT INTO archive_index (
+                    comment_id, channel_id, youtube_video_id, updated_date, content_hash,
+                    segment_path, block_offset, block_length, archived_date
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (comment_id, content_hash) DO UPDATE SET
+                    segment_path = excluded.segment_path,
+                    block_offset = excluded.block_offset,
+                    block_length = excluded.block_length,
+                    archived_date = MAX(archived_date, excluded.archived_date)
+            ''', [
+                (
+                    comment_id,
+                    channel_id,
+                    comment_thread['snippet']['videoId'],
+                    comment_thread['snippet']['topLevelComment']['snippet']['updatedAt'],
+                    content_hash,
+                    segment_path,
+                    block_offset,
+                    len(block),
+                    record_dates[(comment_id, content_hash)]
+                )
+                for comment_id, content_hash, comment_thread in channel_threads
+            ])
+            # Хэш последней версии — хэш версии, сохранённой позже остальных (как в read_archived_thread)
+            conn.executemany('''
+                INSERT INTO thread_hashes (comment_id, youtube_video_id, content_hash)
+                VALUES (?, ?, ?)
+                ON CONFLICT (comment_id) DO UPDATE SET content_hash = (
+                    SELECT content_hash
+                    FROM archive_index
+                    WHERE archive_index.comment_id = excluded.comment_id
+                    ORDER BY archived_date DESC, id DESC
+                    LIMIT 1
+                )
+            ''', [
+                (comment_id, comment_thread['snippet']['videoId'], content_hash)
+                for comment_id, content_hash, comment_thread in channel_threads
+            ])
+
+            latest_hashes = {}
+
+            # Перенесённая версия может быть старше сохранённой: в кэш попадает хэш из таблицы
+            if use_thread_dates:
+                for comment_id, _, _ in channel_threads:
+                    cursor = conn.execute('SELECT content_hash FROM thread_hashes WHERE comment_id = ?', (comment_id,))
+                    latest_hashes[comment_id] = cursor.fetchone()[0]
+
+        for comment_id, content_hash, comment_thread in channel_threads:
+            hash_cache.update(comment_thread['snippet']['videoId'], comment_id, latest_hashes.get(comment_id, content_hash))
+
+        written += len(channel_threads)
+
+    return written
+
+
+def read_archived_thread(conn, archive_dir, comment_id):
+    """
+    Находит последнюю сохранённую версию ветки комментариев по её идентификатору.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        archive_dir (str): Папка архива.
+        comment_id (str): Идентификатор ветки (основного комментария).
+
+    Returns:
+        dict | None: Данные ветки или None, если ветки нет в архиве.
+    """
+    cursor = conn.execute('''
+        SELECT segment_path, block_offset, block_length
+        FROM archive_index
+        WHERE comment_id = ?
+        ORDER BY archived_date DESC, id DESC
+        LIMIT 1
+    ''', (comment_id,))
+
+    row = cursor.fetchone()
+
+    if row is None:
+        return None
+
+    segment_path, block_offset, block_length = row
+
+    with open(os.path.join(archive_dir, segment_path), 'rb') as file:
+        file.seek(block_offset)
+        block = file.read(block_length)
+
+    for line in decompress_block(block, segment_path).decode('utf-8').splitlines():
+        comment_thread = json.loads(line)
+
+        if comment_thread.get('id') == comment_id:
+            return comment_thread
+
+    return None
+
+
+def iter_segment_records(segment_path: str):
+    """
+    Последовательно читает все записи сегмента (все блоки подряд).
+
+    Args:
+        segment_path (str): Путь к файлу сегмента.
+
+    Yields:
+        dict: Ветка комментариев.
+    """
+    if segment_path.endswith(SEGMENT_EXTENSIONS["zstd"]):
+        with open(segment_path, 'rb') as raw_file:
+            reader = zstandard.ZstdDecompressor().stream_reader(raw_file, read_across_frames=True)
+            buffer = b""
+
+            while True:
+                chunk = reader.read(1 << 20)
+
+                if not chunk:
+                    break
+
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+
+                for line in lines:
+                    if line:
+                        yield json.loads(line)
+
+            if buffer.strip():
+                yield json.loads(buffer)
+
+        return
+
+    with gzip.open(segment_path, 'rt', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,349 @@
+"""
+Модуль полнотекстового поиска по сохранённым комментариям (SQLite FTS5).
+
+Индекс `comments_fts` — внешняя таблица FTS5 над текстом и автором комментариев
+представления `comments`. Индекс необязателен (включается `config.comments_search_index`
+или командой build) и поддерживается в актуальном состоянии триггерами таблицы
+`comment_rows`. Уже сохранённые комментарии добавляются в индекс при его создании.
+
+Пример:
+    python comments_search.py build
+    python comments_search.py query "спам ссылка" --channel UC... --since 2024-01-01 --limit 20
+    python comments_search.py query "промокод*" --raw
+    python comments_search.py drop
+
+Краткое описание:
+- is_fts5_available: Проверяет, собран ли SQLite с поддержкой FTS5.
+- search_index_exists: Проверяет, создан ли индекс поиска.
+- create_search_index: Создаёт индекс и триггеры и заполняет индекс комментариями.
+- drop_search_index: Удаляет индекс и триггеры.
+- build_match_query: Преобразует строку поиска в запрос FTS5 из слов в кавычках.
+- search_comments: Ищет комментарии с фильтрами, упорядочивая по релевантности (bm25).
+"""
+import sqlite3
+import argparse
+
+import config
+
+from set_logger import set_logger
+from utils_database import connect_database
+
+
+# Веса столбцов индекса (text, author) для bm25: совпадение в тексте важнее совпадения в имени автора
+BM25_WEIGHTS = (1.0, 0.5)
+
+# Имя автора строки comment_rows (для триггеров индекса)
+AUTHOR_NAME = '(SELECT author FROM dim_authors WHERE id = {row}.author_key)'
+
+SEARCH_INDEX_STATEMENTS = [
+    # Внешняя таблица FTS5: текст хранится только в comment_rows, индекс ссылается на id
+    # строк и читает текст и автора через представление comments
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(
+        text,
+        author,
+        content='comments',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS comments_fts_after_insert AFTER INSERT ON comment_rows BEGIN
+        INSERT INTO comments_fts (rowid, text, author) VALUES (new.id, new.text, {AUTHOR_NAME.format(row="new")});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS comments_fts_after_delete AFTER DELETE ON comment_rows BEGIN
+        INSERT INTO comments_fts (comments_fts, rowid, text, author)
+        VALUES ('delete', old.id, old.text, {AUTHOR_NAME.format(row="old")});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS comments_fts_after_update AFTER UPDATE OF text, author_key ON comment_rows BEGIN
+        INSERT INTO comments_fts (comments_fts, rowid, text, author)
+        VALUES ('delete', old.id, old.text, {AUTHOR_NAME.format(row="old")});
+        INSERT INTO comments_fts (rowid, text, author) VALUES (new.id, new.text, {AUTHOR_NAME.format(row="new")});
+    END
+    '''
+]
+
+
+def is_fts5_available(conn) -> bool:
+    """
+    Проверяет, собран ли SQLite с поддержкой FTS5.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+
+    Returns:
+        bool: True, если FTS5 доступен.
+    """
+    try:
+        conn.execute('CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5(text)')
+        conn.execute('DROP TABLE temp.fts5_probe')
+    except sqlite3.OperationalError:
+        return False
+
+    return True
+
+
+def search_index_exists(conn) -> bool:
+    """
+    Проверяет, создан ли индекс поиска.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+
+    Returns:
+        bool: True, если таблица comments_fts существует.
+    """
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'comments_fts'").fetchone()
+
+    return row is not None
+
+
+def create_search_index(conn, logger) -> bool:
+    """
+    Создаёт индекс поиска и триггеры синхронизации с таблицей comment_rows.
+
+    Если индекс создаётся впервые, в него добавляются все уже сохранённые комментарии
+    (на больших базах это занимает время). Повторный вызов создаёт только недостающие триггеры.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        logger (logging.Logger): Логгер.
+
+    Returns:
+        bool: True, если индекс создан или уже существовал, False, если FTS5 недоступен.
+    """
+    if not is_fts5_available(conn):
+        logger.error("SQLite собран без поддержки FTS5, индекс поиска комментариев не создан.")
+
+        return False
+
+    created = not search_index_exists(conn)
+
+    # Точка сохранения работает и в режиме autocommit (init_database): индекс без
+    # заполнения или без триггеров не остаётся в базе при ошибке
+    conn.execute('SAVEPOINT create_search_index')
+
+    try:
+        for statement in SEARCH_INDEX_STATEMENTS:
+            conn.execute(statement)
+
+        if created:
+            logger.info("Заполнение индекса поиска сохранёнными комментариями.")
+            conn.execute("INSERT INTO comments_fts (comments_fts) VALUES ('rebuild')")
+    except Exception:
+        conn.execute('ROLLBACK TO create_search_index')
+        conn.execute('RELEASE create_search_index')
+
+        raise
+
+    conn.execute('RELEASE create_search_index')
+
+    if created:
+        indexed = conn.execute('SELECT COUNT(*) FROM comment_rows').fetchone()[0]
+        logger.info("Индекс поиска комментариев создан, проиндексировано записей: %d", indexed)
+
+    return True
+
+
+def drop_search_index(conn, logger):
+    """
+    Удаляет индекс поиска и триггеры синхронизации.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        logger (logging.Logger): Логгер.
+    """
+    with conn:
+        conn.execute('DROP TRIGGER IF EXISTS comments_fts_after_insert')
+        conn.execute('DROP TRIGGER IF EXISTS comments_fts_after_delete')
+        conn.execute('DROP TRIGGER IF EXISTS comments_fts_after_update')
+        conn.execute('DROP TABLE IF EXISTS comments_fts')
+
+    logger.info("Индекс поиска комментариев удалён.")
+
+
+def build_match_query(text: str) -> str:
+    """
+    Преобразует строку поиска в запрос FTS5: каждое слово берётся в кавычки,
+    поэтому символы синтаксиса FTS5 (кавычки, звёздочки, дефисы) не вызывают ошибок.
+
+    Args:
+        text (str): Строка поиска.
+
+    Returns:
+        str: Запрос FTS5 (все слова должны встречаться в комментарии).
+    """
+    words = text.split()
+
+    return " ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+
+def search_comments(
+    conn,
+    query: str,
+    channel_id: str = None,
+    video_id: str = None,
+    author: str = None,
+    date_from: str = None,
+    date_to: str = None,
+    limit: int = 50,
+    raw: bool = False
+) -> list:
+    """
+    Ищет комментарии по индексу поиска, упорядочивая их по релевантности (bm25).
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        query (str): Строка поиска.
+        channel_id (str, optional): Идентификатор канала.
+        video_id (str, optional): Идентификатор видео.
+        author (str, optional): Имя автора или идентификатор его канала.
+        date_from (str, optional): Дата публикации от (включительно), например 2024-01-01.
+        date_to (str, optional): Дата публикации до (не включительно).
+        limit (int, optional): Максимальное количество результатов. По умолчанию 50.
+        raw (bool, optional): Передать `query` в FTS5 без изменений (префиксы `слово*`,
+            OR, NEAR и т. д.). По умолчанию False.
+
+    Returns:
+        list: Словари найденных комментариев (поля таблицы comments, snippet и rank).
+
+    Raises:
+        sqlite3.OperationalError: Если индекс не создан или запрос FTS5 некорректен.
+    """
+    match_query = query if raw else build_match_query(query)
+
+    if not match_query:
+        return []
+
+    conditions = ["comments_fts MATCH ?"]
+    params = [match_query]
+
+    if channel_id:
+        conditions.append("c.channel_id = ?")
+        params.append(channel_id)
+
+    if video_id:
+        conditions.append("c.youtube_video_id = ?")
+        params.append(video_id)
+
+    if author:
+        conditions.append("(c.author = ? OR c.author_channel_id = ?)")
+        params.extend([author, author])
+
+    if date_from:
+        conditions.append("c.publish_date >= ?")
+        params.append(date_from)
+
+    if date_to:
+        conditions.append("c.publish_date < ?")
+        params.append(date_to)
+
+    params.append(limit)
+
+    cursor = conn.execute(f'''
+        SELECT
+            c.comment_id,
+            c.youtube_video_id,
+            c.channel_id,
+            c.channel_name,
+            c.author,
+            c.author_channel_id,
+            c.text,
+            c.publish_date,
+            c.updated_date,
+            c.reply_to,
+            snippet(comments_fts, 0, '[', ']', '…', 16) AS snippet,
+            bm25(comments_fts, {BM25_WEIGHTS[0]}, {BM25_WEIGHTS[1]}) AS rank
+        FROM comments_fts
+        JOIN comments AS c ON c.id = comments_fts.rowid
+        WHERE {" AND ".join(conditions)}
+        ORDER BY rank
+        LIMIT ?
+    ''', params)
+
+    columns = [description[0] for description in cursor.description]
+
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def parse_args():
+    """
+    Разбирает аргументы командной строки.
+
+    Returns:
+        argparse.Namespace: Аргументы.
+    """
+    parser = argparse.ArgumentParser(description="Полнотекстовый поиск по сохранённым комментариям.")
+    parser.add_argument("--database", default=config.database_path, help="Путь к базе данных SQLite.")
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("build", help="Создать индекс поиска и добавить в него сохранённые комментарии.")
+    subparsers.add_parser("drop", help="Удалить индекс поиска.")
+
+    query_parser = subparsers.add_parser("query", help="Найти комментарии.")
+    query_parser.add_argument("text", help="Строка поиска (все слова должны встречаться в комментарии).")
+    query_parser.add_argument("--channel", help="Идентификатор канала.")
+    query_parser.add_argument("--video", help="Идентификатор видео.")
+    query_parser.add_argument("--author", help="Имя автора или идентификатор его канала.")
+    query_parser.add_argument("--since", help="Дата публикации от (включительно), например 2024-01-01.")
+    query_parser.add_argument("--until", help="Дата публикации до (не включительно).")
+    query_parser.add_argument("--limit", type=int, default=50, help="Максимальное количество результатов.")
+    query_parser.add_argument("--raw", action="store_true", help="Запрос в синтаксисе FTS5 (слово*, OR, NEAR).")
+
+    return parser.parse_args()
+
+
+def main():
+    """
+    Выполняет команду build, drop или query.
+    """
+    args = parse_args()
+    logger = set_logger(config.log_folder)
+    conn = connect_database(args.database)
+
+    try:
+        if args.command == "build":
+            create_search_index(conn, logger)
+        elif args.command == "drop":
+            drop_search_index(conn, logger)
+        else:
+            if not search_index_exists(conn):
+                logger.error("Индекс поиска не создан: python comments_search.py build")
+
+                return
+
+            try:
+                results = search_comments(
+                    conn=conn,
+                    query=args.text,
+                    channel_id=args.channel,
+                    video_id=args.video,
+                    author=args.author,
+                    date_from=args.since,
+                    date_to=args.until,
+                    limit=args.limit,
+                    raw=args.raw
+                )
+            except sqlite3.OperationalError as err:
+                logger.error("Ошибка запроса поиска: %s", err)
+
+                return
+
+            for result in results:
+                print(
+                    f"{result['publish_date']} | {result['channel_name']} | {result['youtube_video_id']} | "
+                    f"{result['author']}: {result['snippet']}"
+                )
+
+            print(f"Найдено: {len(results)}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -44,12 +44,19 @@ thread_id = None
 # Токен для Telegram бота (замените на свой)
 telegram_bot_token = "your_telegram_bot_token_here"
 
-# Параметр, указывающий, нужно ли сохранять данные комментариев в файлах json
+# Параметр, указывающий, нужно ли сохранять исходные данные комментариев в архив
 save_comments_data_to_json = False
 
-# Путь к папке для сохранения данных комментариев в файлах json
+# Путь к папке прежнего хранения данных комментариев (по файлу json на комментарий).
+# Используется только для переноса в архив: python migrate_comments_archive.py
 path_to_comments_data_storage_dir = "comments_data"
 
+# Путь к папке архива: сжатые сегменты JSONL по каналам и месяцам
+path_to_comments_archive_dir = "comments_archive"
+
+# Формат сжатия архива: "gzip" или "zstd" (нужен пакет zstandard)
+comments_archive_compression = "gzip"
+
 # Список каналов для работы с YouTube API
 channels = [
     {
@@ -61,3 +68,134 @@ channels = [
         "client_secret_path": "client_secret_2.json"
     }
 ]
+
+# Пропускать видео, у которых количество комментариев не изменилось с прошлого запуска
+# (проверяется пачками по 50 видео через videos.list, 1 единица квоты на пачку)
+skip_unchanged_videos = True
+
+# Каждый N-й запуск обходить все видео канала, независимо от статистики
+# (0 — никогда не выполнять принудительный полный обход)
+full_crawl_every_n_runs = 10
+
+# Инкрементальная загрузка комментариев: ветки запрашиваются от новых к старым, и обход
+# страниц видео прекращается на первой странице без новых веток. В полных запусках
+# (см. full_crawl_every_n_runs) всегда загружаются все страницы
+incremental_comment_fetch = True
+
+# Количество каналов, обрабатываемых параллельно
+channel_workers = 4
+
+# Время ожидания блокировки базы данных (в секундах) при одновременной записи из нескольких потоков
+database_timeout = 30
+
+# Асинхронная загрузка комментариев: несколько видео канала загружаются одновременно
+# через httpx, сохранение и уведомления выполняются по мере готовности видео
+async_comment_fetch = False
+
+# Максимальное количество видео канала, загружаемых одновременно
+async_fetch_concurrency = 8
+
+# Базовый адрес YouTube Data API v3 для всех запросов (можно указать локальный
+# тестовый сервер, см. fake_youtube_api.py и benchmark_fetcher.py)
+youtube_api_base_url = "https://www.googleapis.com/youtube/v3"
+
+# Дневной лимит квоты YouTube Data API (в единицах) для одного проекта (client_secret).
+# Квота обнуляется в полночь по тихоокеанскому времени
+quota_daily_limit = 10000
+
+# Часть квоты, которая не расходуется на комментарии и остаётся для проверок
+# плейлистов и статистики видео в следующих запусках
+quota_reserve_units = 200
+
+# Ограничение частоты запросов к YouTube API, общее для всех каналов и потоков:
+# средняя частота (запросов в секунду) и количество запросов, допустимых подряд без ожидания
+youtube_requests_per_second = 10
+youtube_burst_requests = 20
+
+# Количество попыток запроса к YouTube API при временных ошибках (429, 5xx, сетевые ошибки)
+youtube_max_attempts = 6
+
+# Базовая и максимальная задержка экспоненциального отката между попытками (в секундах)
+youtube_backoff_base_seconds = 1
+youtube_backoff_max_seconds = 120
+
+# Режим сводок в Telegram:
+# None      — отдельное сообщение на каждый новый комментарий;
+# "video"   — новые комментарии видео упаковываются в минимальное число сообщений;
+# "channel" — то же для всех новых комментариев канала за запуск
+telegram_digest_mode = None
+
+# Уведомления сначала записываются в таблицу notification_outbox вместе с комментариями.
+# True — отправлять их отдельным процессом (python notification_outbox.py),
+# False — в фоновом потоке основной программы
+notification_outbox_separate_sender = False
+
+# Пауза между проверками пустой очереди уведомлений (в секундах)
+notification_outbox_poll_seconds = 5
+
+# Количество попыток отправки уведомления и задержки между ними (в секундах)
+notification_outbox_max_attempts = 10
+notification_outbox_backoff_base_seconds = 30
+notification_outbox_backoff_max_seconds = 3600
+
+# Сколько дней хранить доставленные уведомления
+notification_outbox_keep_days = 7
+
+# Загружать все ответы веток через comments.list, если вместе с веткой пришли не все
+# (API возвращает в ветке только несколько ответов). Ответы ветки загружаются повторно
+# только при изменении их количества; каждая страница ответов стоит 1 единицу квоты
+sync_all_replies = True
+
+# Сколько запросов comments.list в среднем приходится на один новый комментарий
+# (ответы загружаются для веток, где их больше 5, поэтому доля не превышает ~0.15).
+# Используется при планировании обхода в пределах квоты, если включена sync_all_replies
+quota_reply_fetch_ratio = 0.05
+
+# Режим наблюдения (python youtube_chanells_comments_fetcher.py --watch):
+# минимальный и максимальный интервал опроса видео (в секундах). Новые видео и видео
+# с новыми комментариями опрашиваются чаще, интервал видео без комментариев растёт
+watch_min_interval_seconds = 300
+watch_max_interval_seconds = 86400
+
+# Во сколько раз увеличивается интервал опроса видео без новых комментариев
+watch_interval_backoff = 2.0
+
+# Как часто проверять появление новых видео на каналах (в секундах)
+watch_uploads_check_seconds = 900
+
+# Сколько видео опрашивать за один цикл (50 — максимум одного запроса videos.list)
+watch_batch_size = 50
+
+# Метрики в текстовом формате Prometheus (запросы и квота по методам API,
+# длительности запросов, сохранения в базу и отправки в Telegram, очереди уведомлений).
+# Файл для textfile-коллектора node_exporter, None — не записывать
+metrics_textfile_path = None
+
+# Порт HTTP-сервера метрик (http://<адрес>:<порт>/metrics), None — не запускать.
+# Отдельному отправителю уведомлений (notification_outbox.py) нужен другой порт
+metrics_http_port = None
+metrics_http_address = "127.0.0.1"
+
+# Папка для отчётов профилирования (python youtube_chanells_comments_fetcher.py --profile):
+# время этапов обработки, профиль cProfile (--profile-cpu) и память (--profile-memory)
+profile_output_dir = "logs/profile"
+
+# Контрольные точки обхода: после прерванного запуска следующий запуск продолжает обход
+# канала с того видео и той страницы, на которых он остановился. Незавершённый обход
+# старше указанного числа часов начинается заново (токены страниц API устаревают)
+crawl_checkpoint_max_age_hours = 24
+
+# Полнотекстовый индекс поиска по комментариям (SQLite FTS5), обновляемый триггерами.
+# При включении уже сохранённые комментарии добавляются в индекс при следующем запуске.
+# Поиск: python comments_search.py query "текст" --channel ... --since 2024-01-01
+comments_search_index = False
+
+# Инкрементальная выгрузка комментариев для аналитики (python export_comments.py, нужен pyarrow):
+# папка выгрузки, формат ("parquet" или "arrow") и количество строк, читаемых за раз
+export_output_dir = "exports"
+export_format = "parquet"
+export_batch_rows = 50000
+
+# Максимальное количество ключей каналов, видео и авторов, запоминаемых в памяти при сохранении
+# комментариев (см. comment_dimensions); при превышении кэш очищается и заполняется заново
+dimension_cache_max_entries = 100000
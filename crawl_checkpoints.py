@@ -0,0 +1,177 @@
+"""
+Модуль контрольных точек обхода видео канала.
+
+Обход канала (pass) — это проход по списку видео, отобранных для обновления. Пока обход
+не завершён, для каждого начатого видео хранится его номер в обходе и токен следующей
+страницы веток (nextPageToken). Контрольная точка записывается в той же транзакции,
+что и комментарии страницы, поэтому после прерванного запуска следующий запуск
+продолжает обход: пропускает завершённые видео и догружает начатые с сохранённой
+страницы. После завершения обхода все его контрольные точки удаляются.
+
+Краткое описание:
+- get_crawl_pass: Возвращает незавершённый обход канала (устаревший удаляется).
+- start_crawl_pass: Начинает новый обход канала.
+- finish_crawl_pass: Завершает обход канала и удаляет его контрольные точки.
+- get_crawl_checkpoints: Возвращает завершённые видео и токены страниц начатых видео.
+- save_crawl_checkpoint: Сохраняет контрольную точку видео (внутри транзакции вызывающего).
+- complete_crawl_checkpoint: Отмечает видео обхода завершённым (внутри транзакции вызывающего).
+"""
+from datetime import datetime, timedelta, timezone
+
+
+def get_utc_timestamp() -> str:
+    """
+    Returns:
+        str: Текущее время UTC в формате YYYY-MM-DDTHH:MM:SSZ.
+    """
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def get_crawl_pass(conn, channel_id: str, max_age_hours: float):
+    """
+    Возвращает незавершённый обход канала.
+
+    Обход, начатый раньше `max_age_hours` часов назад, считается устаревшим (токены страниц
+    API действуют ограниченное время) и удаляется вместе с контрольными точками.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        channel_id (str): Идентификатор канала.
+        max_age_hours (float): Максимальный возраст обхода в часах.
+
+    Returns:
+        dict | None: Обход (channel_id, full_crawl, started_date) или None, если его нет.
+    """
+    row = conn.execute(
+        'SELECT full_crawl, started_date FROM crawl_passes WHERE channel_id = ?',
+        (channel_id,)
+    ).fetchone()
+
+    if row is None:
+        return None
+
+    full_crawl, started_date = row
+    threshold = (datetime.now(timezone.utc) - timedelta(hours=max_age_hours)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    if started_date < threshold:
+        finish_crawl_pass(conn=conn, channel_id=channel_id)
+
+        return None
+
+    return {"channel_id": channel_id, "full_crawl": bool(full_crawl), "started_date": started_date}
+
+
+def start_crawl_pass(conn, channel_id: str, full_crawl: bool) -> dict:
+    """
+    Начинает новый обход канала, удаляя контрольные точки прежнего.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        channel_id (str): Идентификатор канала.
+        full_crawl (bool): Полный ли это обход.
+
+    Returns:
+        dict: Обход (channel_id, full_crawl, started_date).
+    """
+    started_date = get_utc_timestamp()
+
+    with conn:
+        conn.execute('DELETE FROM crawl_checkpoints WHERE channel_id = ?', (channel_id,))
+        conn.execute('''
+            INSERT INTO crawl_passes (channel_id, full_crawl, started_date)
+            VALUES (?, ?, ?)
+            ON CONFLICT(channel_id) DO UPDATE SET
+                full_crawl = excluded.full_crawl,
+                started_date = excluded.started_date
+        ''', (channel_id, int(full_crawl), started_date))
+
+    return {"channel_id": channel_id, "full_crawl": full_crawl, "started_date": started_date}
+
+
+def finish_crawl_pass(conn, channel_id: str):
+    """
+    Завершает обход канала: удаляет его запись и все контрольные точки.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        channel_id (str): Идентификатор канала.
+    """
+    with conn:
+        conn.execute('DELETE FROM crawl_checkpoints WHERE channel_id = ?', (channel_id,))
+        conn.execute('DELETE FROM crawl_passes WHERE channel_id = ?', (channel_id,))
+
+
+def get_crawl_checkpoints(conn, channel_id: str) -> tuple:
+    """
+    Возвращает состояние видео незавершённого обхода канала.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        channel_id (str): Идентификатор канала.
+
+    Returns:
+        tuple: (множество завершённых видео, словарь {идентификатор видео: (номер видео в обходе,
+               токен следующей страницы)} начатых видео с непустым токеном).
+    """
+    completed_video_ids = set()
+    page_tokens = {}
+
+    rows = conn.execute('''
+        SELECT youtube_video_id, video_position, page_token, completed
+        FROM crawl_checkpoints
+        WHERE channel_id = ?
+    ''', (channel_id,))
+
+    for video_id, video_position, page_token, completed in rows:
+        if completed:
+            completed_video_ids.add(video_id)
+        elif page_token:
+            page_tokens[video_id] = (video_position, page_token)
+
+    return completed_video_ids, page_tokens
+
+
+def save_crawl_checkpoint(cursor, channel_id: str, video_id: str, video_position: int, page_token):
+    """
+    Сохраняет контрольную точку видео.
+
+    Функция не фиксирует транзакцию: она вызывается внутри транзакции сохранения
+    комментариев страницы.
+
+    Args:
+        cursor (sqlite3.Cursor): Курсор соединения с открытой транзакцией.
+        channel_id (str): Идентификатор канала.
+        video_id (str): Идентификатор видео.
+        video_position (int): Номер видео в обходе.
+        page_token (str | None): Токен следующей страницы (None после последней страницы).
+    """
+    cursor.execute('''
+        INSERT INTO crawl_checkpoints (channel_id, youtube_video_id, video_position, page_token, completed, updated_date)
+        VALUES (?, ?, ?, ?, 0, ?)
+        ON CONFLICT(channel_id, youtube_video_id) DO UPDATE SET
+            video_position = excluded.video_position,
+            page_token = excluded.page_token,
+            updated_date = excluded.updated_date
+    ''', (channel_id, video_id, video_position, page_token, get_utc_timestamp()))
+
+
+def complete_crawl_checkpoint(cursor, channel_id: str, video_id: str, video_position: int):
+    """
+    Отмечает видео обхода завершённым: при продолжении обхода оно будет пропущено.
+
+    Функция не фиксирует транзакцию.
+
+    Args:
+        cursor (sqlite3.Cursor): Курсор соединения с открытой транзакцией.
+        channel_id (str): Идентификатор канала.
+        video_id (str): Идентификатор видео.
+        video_position (int): Номер видео в обходе.
+    """
+    cursor.execute('''
+        INSERT INTO crawl_checkpoints (channel_id, youtube_video_id, video_position, page_token, completed, updated_date)
+        VALUES (?, ?, ?, NULL, 1, ?)
+        ON CONFLICT(channel_id, youtube_video_id) DO UPDATE SET
+            page_token = NULL,
+            completed = 1,
+            updated_date = excluded.updated_date
+    ''', (channel_id, video_id, video_position, get_utc_timestamp()))
@@ -0,0 +1,375 @@
+"""
+Инкрементальная выгрузка комментариев в колоночные файлы (Parquet или Arrow IPC).
+
+Выгружаются строки `comments` (представление над comment_rows и справочниками каналов,
+видео и авторов), добавленные после предыдущей выгрузки: номер последней выгруженной
+строки (id) хранится в таблице `export_watermarks` под именем выгрузки. Строки читаются
+пачками по `--batch-size` в порядке id, поэтому таблица не загружается в память целиком. Новая версия изменённого комментария записывается
+в comments с новым id, поэтому тоже попадает в следующую выгрузку (последняя версия
+комментария — строка с наибольшим id).
+
+Файлы разбиваются по каналу и месяцу публикации комментария в стиле Hive:
+
+    <папка>/channel_id=<id>/month=<YYYY-MM>/part-<первый id>-<последний id>.parquet
+
+Столбцы channel_id и month в файлах не дублируются: их восстанавливает чтение набора
+с разбиением hive, например `pyarrow.dataset.dataset(path, partitioning="hive")`.
+Каждая выгрузка создаёт новые файлы и не меняет прежние. Файлы пишутся под временными
+именами и переименовываются после записи, затем сохраняется номер последней строки:
+прерванная выгрузка повторяется следующим запуском целиком.
+
+Нужен пакет pyarrow.
+
+Пример:
+    python export_comments.py --format parquet --output-dir exports
+    python export_comments.py --format arrow --name analytics --batch-size 20000
+
+Краткое описание:
+- get_export_watermark: Возвращает номер последней выгруженной строки.
+- save_export_watermark: Сохраняет номер последней выгруженной строки.
+- get_partition_path: Формирует путь к файлу раздела канала за месяц.
+- PartitionWriters: Открытые на время выгрузки файлы разделов.
+- iter_comment_batches: Читает новые строки comments пачками ограниченного размера.
+- export_comments: Выгружает новые строки и сдвигает отметку выгрузки.
+"""
+import os
+import argparse
+
+from datetime import datetime, timezone
+
+import config
+
+from set_logger import set_logger
+from init_database import init_database
+from utils_database import connect_database
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+# Выгружаемые столбцы comments (channel_id задаётся разделом)
+EXPORT_COLUMNS = (
+    "id",
+    "youtube_video_id",
+    "channel_name",
+    "comment_id",
+    "author",
+    "author_channel_id",
+    "text",
+    "publish_date",
+    "updated_date",
+    "reply_to"
+)
+
+# Расширения файлов для поддерживаемых форматов
+EXPORT_EXTENSIONS = {
+    "parquet": ".parquet",
+    "arrow": ".arrow"
+}
+
+
+def get_export_schema():
+    """
+    Returns:
+        pyarrow.Schema: Схема выгружаемых файлов.
+    """
+    return pyarrow.schema(
+        [pyarrow.field("id", pyarrow.int64(), nullable=False)]
+        + [pyarrow.field(column, pyarrow.string()) for column in EXPORT_COLUMNS[1:]]
+    )
+
+
+def get_export_watermark(conn, export_name: str) -> int:
+    """
+    Возвращает номер последней выгруженной строки comments.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        export_name (str): Имя выгрузки.
+
+    Returns:
+        int: id последней выгруженной строки (0, если выгрузок ещё не было).
+    """
+    row = conn.execute('SELECT last_rowid FROM export_watermarks WHERE export_name = ?', (export_name,)).fetchone()
+
+    return row[0] if row else 0
+
+
+def save_export_watermark(conn, export_name: str, last_rowid: int, export_format: str, output_dir: str):
+    """
+    Сохраняет номер последней выгруженной строки comments.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        export_name (str): Имя выгрузки.
+        last_rowid (int): id последней выгруженной строки.
+        export_format (str): Формат файлов.
+        output_dir (str): Папка выгрузки.
+    """
+    exported_date = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    with conn:
+        conn.execute('''
+            INSERT INTO export_watermarks (export_name, last_rowid, export_format, output_dir, exported_date)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(export_name) DO UPDATE SET
+                last_rowid = excluded.last_rowid,
+                export_format = excluded.export_format,
+                output_dir = excluded.output_dir,
+                exported_date = excluded.exported_date
+        ''', (export_name, last_rowid, export_format, output_dir, exported_date))
+
+
+def get_partition_path(output_dir: str, channel_id: str, month: str, first_rowid: int, last_rowid: int, export_format: str) -> str:
+    """
+    Формирует путь к файлу раздела канала за месяц.
+
+    Args:
+        output_dir (str): Папка выгрузки.
+        channel_id (str): Идентификатор канала.
+        month (str): Месяц публикации (YYYY-MM или unknown).
+        first_rowid (int): Первый id диапазона выгрузки.
+        last_rowid (int): Последний id диапазона выгрузки.
+        export_format (str): Формат файлов.
+
+    Returns:
+        str: Путь к файлу.
+    """
+    file_name = f"part-{first_rowid:012d}-{last_rowid:012d}{EXPORT_EXTENSIONS[export_format]}"
+
+    return os.path.join(output_dir, f"channel_id={channel_id}", f"month={month}", file_name)
+
+
+class PartitionWriters:
+    """
+    Открытые на время выгрузки файлы разделов (канал, месяц).
+
+    Каждая пачка строк дописывается в файл своего раздела отдельной группой строк
+    (Parquet) или пачкой записей (Arrow IPC), поэтому в памяти находится не больше
+    одной пачки. Файлы пишутся под временными именами и переименовываются в close().
+    """
+
+    def __init__(self, output_dir: str, export_format: str, first_rowid: int, last_rowid: int):
+        """
+        Args:
+            output_dir (str): Папка выгрузки.
+            export_format (str): Формат файлов ("parquet" или "arrow").
+            first_rowid (int): Первый id диапазона выгрузки.
+            last_rowid (int): Последний id диапазона выгрузки.
+        """
+        self.output_dir = output_dir
+        self.export_format = export_format
+        self.first_rowid = first_rowid
+        self.last_rowid = last_rowid
+        self.schema = get_export_schema()
+
+        self._writers = {}
+
+    def _open(self, partition: tuple):
+        path = get_partition_path(self.output_dir, *partition, self.first_rowid, self.last_rowid, self.export_format)
+        temp_path = f"{path}.tmp"
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if self.export_format == "parquet":
+            writer = pyarrow.parquet.ParquetWriter(temp_path, self.schema, compression="zstd")
+        else:
+            writer = pyarrow.ipc.new_file(temp_path, self.schema)
+
+        self._writers[partition] = (writer, temp_path, path)
+
+        return writer
+
+    def write(self, partition: tuple, rows: list):
+        """
+        Дописывает строки в файл раздела.
+
+        Args:
+            partition (tuple): (channel_id, месяц).
+            rows (list): Строки в порядке столбцов EXPORT_COLUMNS.
+        """
+        writer = self._writers[partition][0] if partition in self._writers else self._open(partition)
+        columns = list(zip(*rows))
+        batch = pyarrow.RecordBatch.from_arrays(
+            [pyarrow.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema
+        )
+
+        writer.write_batch(batch)
+
+    def close(self, commit: bool = True) -> list:
+        """
+        Закрывает файлы разделов.
+
+        Args:
+            commit (bool, optional): Переименовать файлы в постоянные (True) или удалить их (False).
+
+        Returns:
+            list: Пути к записанным файлам.
+        """
+        paths = []
+
+        for writer, temp_path, path in self._writers.values():
+            writer.close()
+
+            if commit:
+                os.replace(temp_path, path)
+                paths.append(path)
+            elif os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self._writers = {}
+
+        return paths
+
+
+def iter_comment_batches(conn, after_rowid: int, until_rowid: int, batch_size: int):
+    """
+    Читает строки comments с id в диапазоне (after_rowid, until_rowid] пачками.
+
+    Каждая пачка читается отдельным запросом от последнего прочитанного id (по первичному
+    ключу), поэтому в памяти находится не больше одной пачки.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        after_rowid (int): id, после которого начинается чтение.
+        until_rowid (int): Последний читаемый id.
+        batch_size (int): Количество строк в пачке.
+
+    Yields:
+        list: Строки (channel_id, месяц, затем столбцы EXPORT_COLUMNS).
+    """
+    columns = ", ".join(EXPORT_COLUMNS)
+
+    while after_rowid < until_rowid:
+        rows = conn.execute(f'''
+            SELECT channel_id, COALESCE(substr(publish_date, 1, 7), 'unknown'), {columns}
+            FROM comments
+            WHERE id > ? AND id <= ?
+            ORDER BY id
+            LIMIT ?
+        ''', (after_rowid, until_rowid, batch_size)).fetchall()
+
+        if not rows:
+            return
+
+        yield rows
+
+        after_rowid = rows[-1][2]
+
+
+def export_comments(conn, output_dir: str, export_format: str, export_name: str, batch_size: int, logger) -> dict:
+    """
+    Выгружает строки comments, добавленные после предыдущей выгрузки, и сдвигает её отметку.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        output_dir (str): Папка выгрузки.
+        export_format (str): Формат файлов ("parquet" или "arrow").
+        export_name (str): Имя выгрузки (у каждой выгрузки своя отметка).
+        batch_size (int): Количество строк, читаемых и записываемых за раз.
+        logger (logging.Logger): Логгер.
+
+    Returns:
+        dict: Итог выгрузки: rows, files, first_rowid, last_rowid.
+
+    Raises:
+        RuntimeError: Если пакет pyarrow не установлен.
+    """
+    if pyarrow is None:
+        raise RuntimeError("Для выгрузки комментариев нужен пакет pyarrow (pip install pyarrow).")
+
+    after_rowid = get_export_watermark(conn, export_name)
+    until_rowid = conn.execute('SELECT COALESCE(MAX(id), 0) FROM comment_rows').fetchone()[0]
+    result = {"rows": 0, "files": 0, "first_rowid": after_rowid + 1, "last_rowid": until_rowid}
+
+    if until_rowid <= after_rowid:
+        logger.info("Выгрузка %s: новых строк нет (последняя выгруженная строка %d).", export_name, after_rowid)
+
+        return result
+
+    writers = PartitionWriters(output_dir, export_format, after_rowid + 1, until_rowid)
+
+    try:
+        for rows in iter_comment_batches(conn, after_rowid, until_rowid, batch_size):
+            partitions = {}
+
+            for row in rows:
+                partitions.setdefault((row[0], row[1]), []).append(row[2:])
+
+            for partition, partition_rows in partitions.items():
+                writers.write(partition, partition_rows)
+
+            result["rows"] += len(rows)
+            logger.info("Выгрузка %s: записано строк %d", export_name, result["rows"])
+    except BaseException:
+        writers.close(commit=False)
+
+        raise
+
+    result["files"] = len(writers.close())
+
+    # Отметка сдвигается только после записи всех файлов
+    save_export_watermark(conn, export_name, until_rowid, export_format, output_dir)
+
+    logger.info(
+        "Выгрузка %s завершена: строк %d (id %d–%d), файлов %d",
+        export_name, result["rows"], result["first_rowid"], until_rowid, result["files"]
+    )
+
+    return result
+
+
+def parse_args():
+    """
+    Разбирает аргументы командной строки.
+
+    Returns:
+        argparse.Namespace: Аргументы.
+    """
+    parser = argparse.ArgumentParser(description="Инкрементальная выгрузка комментариев в Parquet или Arrow IPC.")
+
+    parser.add_argument("--database", default=config.database_path, help="Путь к базе данных SQLite.")
+    parser.add_argument("--output-dir", default=config.export_output_dir, help="Папка выгрузки.")
+    parser.add_argument("--format", default=config.export_format, choices=sorted(EXPORT_EXTENSIONS), help="Формат файлов.")
+    parser.add_argument("--name", default="default", help="Имя выгрузки: у каждой выгрузки своя отметка.")
+    parser.add_argument("--batch-size", type=int, default=config.export_batch_rows, help="Количество строк в пачке.")
+    parser.add_argument("--reset", action="store_true", help="Выгрузить все строки заново (сбросить отметку).")
+
+    return parser.parse_args()
+
+
+def main():
+    """
+    Выгружает новые комментарии.
+    """
+    args = parse_args()
+    logger = set_logger(config.log_folder)
+
+    init_database(database_path=args.database, main_logger=logger)
+    conn = connect_database(args.database)
+
+    try:
+        if args.reset:
+            save_export_watermark(conn, args.name, 0, args.format, args.output_dir)
+
+        export_comments(
+            conn=conn,
+            output_dir=args.output_dir,
+            export_format=args.format,
+            export_name=args.name,
+            batch_size=args.batch_size,
+            logger=logger
+        )
+    except RuntimeError as err:
+        logger.error("%s", err)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
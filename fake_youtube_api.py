@@ -0,0 +1,557 @@
+"""
+Локальный HTTP-сервер, имитирующий YouTube Data API v3 для бенчмарков и отладки.
+
+Данные генерируются детерминированно по номерам каналов, видео, веток и ответов
+и не хранятся в памяти, поэтому сервер выдерживает каналы с миллионами комментариев.
+Поддерживаются методы, которые использует программа: channels.list (mine=true),
+playlistItems.list, videos.list, commentThreads.list и comments.list (parentId).
+Канал определяется по OAuth-токену запроса: токен `fake-token-<номер канала>`.
+
+Сервер может вносить ошибки: 429, 403 rateLimitExceeded, а также quotaExceeded
+после заданного количества запросов. Так можно проверить повторы и остановку по квоте.
+
+Пример:
+    python fake_youtube_api.py --port 8090 --videos 200 --threads 300
+    # config.youtube_api_base_url = "http://127.0.0.1:8090/youtube/v3"
+
+Краткое описание:
+- FakeYouTubeData: Генератор данных и обработчик запросов API.
+- FakeYouTubeServer: HTTP-сервер в фоновом потоке.
+- get_fake_token: Возвращает токен канала для учётных данных.
+"""
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+import urllib.parse
+
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Дата публикации первого видео каждого канала
+BASE_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+# Префикс OAuth-токена, по которому сервер определяет канал
+TOKEN_PREFIX = "fake-token-"
+
+
+def get_fake_token(channel_index: int) -> str:
+    """
+    Возвращает OAuth-токен, по которому сервер узнаёт канал.
+
+    Args:
+        channel_index (int): Номер канала (с нуля).
+
+    Returns:
+        str: Токен доступа.
+    """
+    return f"{TOKEN_PREFIX}{channel_index}"
+
+
+def format_date(date: datetime) -> str:
+    """
+    Форматирует дату так же, как YouTube API.
+    """
+    return date.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class FakeApiError(Exception):
+    """
+    Ошибка, которую сервер возвращает клиенту в формате YouTube API.
+    """
+
+    def __init__(self, status: int, reason: str, message: str):
+        super().__init__(message)
+
+        self.status = status
+        self.reason = reason
+
+    def to_json(self) -> dict:
+        return {
+            "error": {
+                "code": self.status,
+                "message": f"{self.reason}: {self}",
+                "errors": [{"reason": self.reason, "message": str(self)}]
+            }
+        }
+
+
+class FakeYouTubeData:
+    """
+    Синтетические каналы и обработчик запросов к ним.
+
+    Ветка с порядковым номером `n` (от самой старой) получает идентификатор
+    `<video_id>.t<n>`, поэтому после `add_threads` старые ветки сохраняют свои
+    идентификаторы, а новые появляются в начале выдачи `order=time`.
+    """
+
+    def __init__(
+        self,
+        channels: int = 1,
+        videos: int = 20,
+        threads: int = 100,
+        replies: int = 2,
+        inline_replies: int = 5,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        quota_exceeded_after: int = None,
+        latency_ms: float = 0.0,
+        seed: int = 0
+    ):
+        """
+        Args:
+            channels (int, optional): Количество каналов.
+            videos (int, optional): Количество видео на канале.
+            threads (int, optional): Количество веток комментариев у видео.
+            replies (int, optional): Количество ответов в каждой ветке.
+            inline_replies (int, optional): Сколько ответов возвращается вместе с веткой
+                (YouTube возвращает не больше 5, остальные доступны через comments.list).
+            error_rate (float, optional): Доля запросов, завершающихся ошибкой 429.
+            rate_limit_rate (float, optional): Доля запросов, завершающихся ошибкой 403 rateLimitExceeded.
+            quota_exceeded_after (int, optional): После скольких запросов отвечать 403 quotaExceeded.
+            latency_ms (float, optional): Искусственная задержка ответа в миллисекундах.
+            seed (int, optional): Начальное значение генератора случайных ошибок.
+        """
+        self.channels = channels
+        self.videos = videos
+        self.threads = threads
+        self.replies = replies
+        self.inline_replies = inline_replies
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.quota_exceeded_after = quota_exceeded_after
+        self.latency_ms = latency_ms
+
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._extra_threads = 0
+        self.requests = {}
+        self.injected_errors = {}
+
+    def add_threads(self, count: int):
+        """
+        Добавляет каждому видео новые ветки комментариев (имитация активности между запусками).
+
+        Args:
+            count (int): Количество новых веток на видео.
+        """
+        with self._lock:
+            self._extra_threads += count
+
+    def reset_stats(self):
+        """
+        Обнуляет счётчики запросов и внесённых ошибок.
+        """
+        with self._lock:
+            self.requests = {}
+            self.injected_errors = {}
+
+    def get_stats(self) -> dict:
+        """
+        Returns:
+            dict: Количество запросов по методам и внесённых ошибок по причинам.
+        """
+        with self._lock:
+            return {"requests": dict(self.requests), "injected_errors": dict(self.injected_errors)}
+
+    # Генерация данных
+
+    def total_threads(self) -> int:
+        return self.threads + self._extra_threads
+
+    def get_channel_id(self, channel_index: int) -> str:
+        return f"UCfake{channel_index:06d}"
+
+    def get_video_id(self, channel_index: int, video_number: int) -> str:
+        return f"v{channel_index:04d}x{video_number:06d}"
+
+    def parse_video_id(self, video_id: str):
+        """
+        Returns:
+            tuple | None: (номер канала, номер видео) или None для неизвестного видео.
+        """
+        try:
+            channel_part, video_part = video_id[1:].split("x")
+            channel_index, video_number = int(channel_part), int(video_part)
+        except ValueError:
+            return None
+
+        if channel_index >= self.channels or video_number >= self.videos:
+            return None
+
+        return channel_index, video_number
+
+    def get_video_date(self, video_number: int) -> datetime:
+        return BASE_DATE + timedelta(hours=video_number)
+
+    def get_thread_date(self, video_number: int, thread_number: int) -> datetime:
+        return self.get_video_date(video_number) + timedelta(minutes=thread_number + 1)
+
+    def build_comment(self, comment_id: str, channel_id: str, video_id: str, date: datetime, text: str, parent_id=None) -> dict:
+        author_number = zlib.crc32(comment_id.encode("utf-8")) % 1000
+        snippet = {
+            "channelId": channel_id,
+            "videoId": video_id,
+            "textDisplay": text,
+            "textOriginal": text,
+            "authorDisplayName": f"@user{author_number}",
+            "authorChannelId": {"value": f"UCuser{author_number:06d}"},
+            "likeCount": 0,
+            "publishedAt": format_date(date),
+            "updatedAt": format_date(date)
+        }
+
+        if parent_id is not None:
+            snippet["parentId"] = parent_id
+
+        return {"kind": "youtube#comment", "id": comment_id, "snippet": snippet}
+
+    def build_reply(self, channel_id: str, video_id: str, thread_id: str, thread_date: datetime, reply_number: int) -> dict:
+        return self.build_comment(
+            comment_id=f"{thread_id}.r{reply_number}",
+            channel_id=channel_id,
+            video_id=video_id,
+            date=thread_date + timedelta(seconds=reply_number + 1),
+            text=f"Ответ {reply_number} в ветке {thread_id}",
+            parent_id=thread_id
+        )
+
+    def build_thread(self, channel_index: int, video_number: int, thread_number: int) -> dict:
+        channel_id = self.get_channel_id(channel_index)
+        video_id = self.get_video_id(channel_index, video_number)
+        thread_id = f"{video_id}.t{thread_number}"
+        thread_date = self.get_thread_date(video_number, thread_number)
+
+        thread = {
+            "kind": "youtube#commentThread",
+            "id": thread_id,
+            "snippet": {
+                "channelId": channel_id,
+                "videoId": video_id,
+                "topLevelComment": self.build_comment(
+                    thread_id, channel_id, video_id, thread_date, f"Комментарий {thread_number} к видео {video_id}"
+                ),
+                "totalReplyCount": self.replies,
+                "canReply": True,
+                "isPublic": True
+            }
+        }
+
+        if self.replies:
+            thread["replies"] = {
+                "comments": [
+                    self.build_reply(channel_id, video_id, thread_id, thread_date, reply_number)
+                    for reply_number in range(min(self.replies, self.inline_replies))
+                ]
+            }
+
+        return thread
+
+    # Обработка запросов
+
+    def paginate(self, total: int, params: dict, default_size: int, max_size: int):
+        """
+        Returns:
+            tuple: (начальный индекс, конечный индекс, токен следующей страницы или None).
+        """
+        size = min(int(params.get("maxResults", default_size)), max_size)
+        start = int(params.get("pageToken") or 0)
+        end = min(total, start + size)
+
+        return start, end, str(end) if end < total else None
+
+    def handle_channels(self, params: dict, channel_index: int) -> dict:
+        if params.get("mine") != "true" or channel_index is None:
+            return {"items": []}
+
+        comment_count = self.videos * self.total_threads() * (1 + self.replies)
+
+        return {
+            "items": [{
+                "kind": "youtube#channel",
+                "id": self.get_channel_id(channel_index),
+                "snippet": {"title": f"Тестовый канал {channel_index}"},
+                "contentDetails": {"relatedPlaylists": {"uploads": f"UUfake{channel_index:06d}"}},
+                "statistics": {"videoCount": str(self.videos), "commentCount": str(comment_count)}
+            }]
+        }
+
+    def handle_playlist_items(self, params: dict, channel_index: int) -> dict:
+        playlist_id = params.get("playlistId", "")
+
+        if not playlist_id.startswith("UUfake"):
+            raise FakeApiError(404, "playlistNotFound", f"Плейлист {playlist_id} не найден.")
+
+        channel_index = int(playlist_id[len("UUfake"):])
+        start, end, next_page_token = self.paginate(self.videos, params, 5, 50)
+        items = []
+
+        # Плейлист загрузок отдаётся от новых видео к старым
+        for position in range(start, end):
+            video_number = self.videos - 1 - position
+            items.append({
+                "kind": "youtube#playlistItem",
+                "contentDetails": {
+                    "videoId": self.get_video_id(channel_index, video_number),
+                    "videoPublishedAt": format_date(self.get_video_date(video_number))
+                }
+            })
+
+        response = {"items": items, "pageInfo": {"totalResults": self.videos}}
+
+        if next_page_token:
+            response["nextPageToken"] = next_page_token
+
+        return response
+
+    def handle_videos(self, params: dict, channel_index: int) -> dict:
+        items = []
+        comment_count = self.total_threads() * (1 + self.replies)
+
+        for video_id in params.get("id", "").split(",")[:50]:
+            if self.parse_video_id(video_id) is None:
+                continue
+
+            items.append({
+                "kind": "youtube#video",
+                "id": video_id,
+                "statistics": {"commentCount": str(comment_count)}
+            })
+
+        return {"items": items}
+
+    def handle_comment_threads(self, params: dict, channel_index: int) -> dict:
+        video_id = params.get("videoId", "")
+        parsed = self.parse_video_id(video_id)
+
+        if parsed is None:
+            raise FakeApiError(404, "videoNotFound", f"Видео {video_id} не найдено.")
+
+        video_channel, video_number = parsed
+        total = self.total_threads()
+        start, end, next_page_token = self.paginate(total, params, 20, 100)
+
+        # order=time: сначала новые ветки (с большим порядковым номером)
+        response = {
+            "items": [
+                self.build_thread(video_channel, video_number, total - 1 - position)
+                for position in range(start, end)
+            ]
+        }
+
+        if next_page_token:
+            response["nextPageToken"] = next_page_token
+
+        return response
+
+    def handle_comments(self, params: dict, channel_index: int) -> dict:
+        thread_id = params.get("parentId", "")
+        video_id, _, thread_part = thread_id.partition(".t")
+        parsed = self.parse_video_id(video_id)
+
+        if parsed is None or not thread_part.isdigit():
+            raise FakeApiError(404, "commentNotFound", f"Комментарий {thread_id} не найден.")
+
+        video_channel, video_number = parsed
+        thread_date = self.get_thread_date(video_number, int(thread_part))
+        channel_id = self.get_channel_id(video_channel)
+        start, end, next_page_token = self.paginate(self.replies, params, 20, 100)
+
+        response = {
+            "items": [
+                self.build_reply(channel_id, video_id, thread_id, thread_date, reply_number)
+                for reply_number in range(start, end)
+            ]
+        }
+
+        if next_page_token:
+            response["nextPageToken"] = next_page_token
+
+        return response
+
+    def handle(self, method: str, params: dict, token: str) -> dict:
+        """
+        Обрабатывает запрос к методу API.
+
+        Args:
+            method (str): Последний сегмент пути (например, "commentThreads").
+            params (dict): Параметры запроса.
+            token (str): OAuth-токен из заголовка Authorization.
+
+        Returns:
+            dict: Тело ответа.
+
+        Raises:
+            FakeApiError: Ошибка API (в том числе внесённая намеренно).
+        """
+        handlers = {
+            "channels": self.handle_channels,
+            "playlistItems": self.handle_playlist_items,
+            "videos": self.handle_videos,
+            "commentThreads": self.handle_comment_threads,
+            "comments": self.handle_comments
+        }
+
+        if method not in handlers:
+            raise FakeApiError(404, "notFound", f"Метод {method} не поддерживается.")
+
+        if not token.startswith(TOKEN_PREFIX):
+            raise FakeApiError(401, "authError", "Недействительный токен доступа.")
+
+        channel_index = int(token[len(TOKEN_PREFIX):])
+
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+            total_requests = sum(self.requests.values())
+            roll = self._random.random()
+
+            if self.quota_exceeded_after is not None and total_requests > self.quota_exceeded_after:
+                error = FakeApiError(403, "quotaExceeded", "Дневная квота проекта исчерпана.")
+            elif roll < self.error_rate:
+                error = FakeApiError(429, "rateLimitExceeded", "Слишком много запросов.")
+            elif roll < self.error_rate + self.rate_limit_rate:
+                error = FakeApiError(403, "rateLimitExceeded", "Превышена частота запросов.")
+            else:
+                error = None
+
+            if error is not None:
+                self.injected_errors[error.reason] = self.injected_errors.get(error.reason, 0) + 1
+
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        if error is not None:
+            raise error
+
+        return handlers[method](params, channel_index)
+
+
+class FakeYouTubeServer:
+    """
+    HTTP-сервер FakeYouTubeData в фоновом потоке.
+    """
+
+    def __init__(self, data: FakeYouTubeData, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            data (FakeYouTubeData): Данные и обработчик запросов.
+            host (str, optional): Адрес. По умолчанию только локальные подключения.
+            port (int, optional): Порт. По умолчанию 0 — свободный порт.
+        """
+        self.data = data
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            # HTTP/1.1, чтобы клиенты переиспользовали соединения
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                params = {key: values[0] for key, values in urllib.parse.parse_qs(url.query).items()}
+                token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+
+                try:
+                    status, body = 200, data.handle(url.path.rstrip("/").rsplit("/", 1)[-1], params, token)
+                except FakeApiError as err:
+                    status, body = err.status, err.to_json()
+
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), RequestHandler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """
+        Returns:
+            str: Базовый адрес API для `config.youtube_api_base_url`.
+        """
+        host, port = self._server.server_address[:2]
+
+        return f"http://{host}:{port}/youtube/v3"
+
+    def start(self) -> str:
+        """
+        Запускает сервер в фоновом потоке.
+
+        Returns:
+            str: Базовый адрес API.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-youtube-api", daemon=True)
+        self._thread.start()
+
+        return self.base_url
+
+    def stop(self):
+        """
+        Останавливает сервер.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def parse_args():
+    """
+    Разбирает аргументы командной строки.
+
+    Returns:
+        argparse.Namespace: Аргументы.
+    """
+    parser = argparse.ArgumentParser(description="Локальный сервер, имитирующий YouTube Data API v3.")
+
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--channels", type=int, default=1, help="Количество каналов.")
+    parser.add_argument("--videos", type=int, default=20, help="Количество видео на канале.")
+    parser.add_argument("--threads", type=int, default=100, help="Количество веток у видео.")
+    parser.add_argument("--replies", type=int, default=2, help="Количество ответов в ветке.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 429.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Доля ответов 403 rateLimitExceeded.")
+    parser.add_argument("--quota-exceeded-after", type=int, default=None, help="Ответ quotaExceeded после N запросов.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Задержка ответа в миллисекундах.")
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    server = FakeYouTubeServer(
+        FakeYouTubeData(
+            channels=args.channels,
+            videos=args.videos,
+            threads=args.threads,
+            replies=args.replies,
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate,
+            quota_exceeded_after=args.quota_exceeded_after,
+            latency_ms=args.latency_ms
+        ),
+        host=args.host,
+        port=args.port
+    )
+
+    print(f"Сервер запущен: {server.start()}")
+    print(f"Токены каналов: {', '.join(get_fake_token(index) for index in range(args.channels))}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
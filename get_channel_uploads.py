@@ -0,0 +1,73 @@
+import googleapiclient.errors
+
+from utils_youtube import execute_request
+from quota_scheduler import QuotaExceededError
+
+
+def get_channel_uploads(youtube_service, upload_playlist_id, channel_name, logger, known_video_ids=None, quota_tracker=None):
+    """
+    Получает видео из плейлиста загрузок канала вместе с датами публикации.
+
+    Плейлист загрузок отдаётся от новых видео к старым, поэтому если передан набор
+    `known_video_ids`, обход прекращается на первом уже известном видео — всё, что дальше,
+    уже есть в каталоге.
+
+    Args:
+        youtube_service (googleapiclient.discovery.build): Авторизованный клиент YouTube API.
+        upload_playlist_id (str): Идентификатор плейлиста.
+        channel_name (str): Название канала.
+        logger (logging.Logger): Логгер для записи логов.
+        known_video_ids (set, optional): Идентификаторы уже известных видео канала.
+            По умолчанию None — загружается весь плейлист.
+        quota_tracker (QuotaTracker, optional): Счётчик квоты проекта.
+
+    Returns:
+        list: Список кортежей (идентификатор видео, дата публикации), если запрос успешен.
+        None: Если возникла ошибка (например, превышение квоты или ошибка API).
+    """
+    page_count = 0
+    videos = []
+
+    request = youtube_service.playlistItems().list(
+        part="contentDetails",
+        playlistId=upload_playlist_id,
+        maxResults=50
+    )
+
+    while request:
+        try:
+            response = execute_request(request, "playlistItems.list", quota_tracker, logger)
+            page_count += 1
+            reached_known_video = False
+
+            for item in response['items']:
+                video_id = item['contentDetails']['videoId']
+
+                if known_video_ids and video_id in known_video_ids:
+                    reached_known_video = True
+
+                    break
+
+                videos.append((video_id, item['contentDetails'].get('videoPublishedAt')))
+
+            logger.info("Канал: %s | Страница: %d | Новых видео: %d", channel_name, page_count, len(videos))
+
+            if reached_known_video:
+                break
+
+            request = youtube_service.playlistItems().list_next(request, response)
+        except QuotaExceededError:
+            logger.error("Достигнут лимит квоты API YouTube. Попробуйте позже.")
+
+            return None
+        except googleapiclient.errors.HttpError as err:
+            logger.error("Ошибка при получении данных: %s", err)
+
+            return None
+        except Exception as err:
+            logger.error("Неизвестная ошибка: %s", err)
+
+            return None
+
+    return videos
+
@@ -1,55 +1,141 @@
 from googleapiclient.errors import HttpError
 
+from utils_youtube import execute_request
+from quota_scheduler import QuotaExceededError
 
-def get_video_comments(youtube_service, video_id, logger):
+
+class CommentFetchError(Exception):
+    """
+    Комментарии видео загружены не полностью (ошибка API после всех повторов).
+
+    Видео с такой ошибкой не считается обработанным: его количество комментариев
+    и отметка о завершении в обходе не сохраняются, поэтому оно будет загружено снова.
+    Отключённые комментарии и ненайденное видео ошибкой не считаются.
+    """
+
+
+def get_thread_last_activity(comment_thread):
+    """
+    Возвращает время последней активности в ветке комментариев.
+
+    Учитываются дата публикации и изменения верхнего комментария, а также даты изменения
+    ответов, вернувшихся вместе с веткой.
+
+    Args:
+        comment_thread (dict): Ветка комментариев (commentThread) из ответа YouTube API.
+
+    Returns:
+        str: Дата в формате UTC ("2025-12-31T12:00:00Z").
+    """
+    top_level_snippet = comment_thread['snippet']['topLevelComment']['snippet']
+    dates = [top_level_snippet['publishedAt'], top_level_snippet.get('updatedAt') or '']
+
+    for reply in comment_thread.get('replies', {}).get('comments', []):
+        dates.append(reply['snippet'].get('updatedAt') or reply['snippet']['publishedAt'])
+
+    return max(dates)
+
+
+def page_has_only_known_threads(page_items, known_watermark):
+    """
+    Проверяет, что все ветки страницы уже были сохранены ранее.
+
+    Ветка считается известной, если её последняя активность не новее самой поздней даты
+    публикации или изменения комментария, уже сохранённого для видео.
+
+    Args:
+        page_items (list): Ветки комментариев одной страницы ответа.
+        known_watermark (str): Самая поздняя известная дата в формате UTC.
+
+    Returns:
+        bool: True, если на странице нет новых или изменённых веток.
+    """
+    return all(
+        get_thread_last_activity(comment_thread) <= known_watermark
+        for comment_thread in page_items
+    )
+
+
+def iter_video_comment_pages(youtube_service, video_id, logger, known_watermark=None, quota_tracker=None, page_token=None):
     """
-    Получает комментарии к видео с YouTube, включая ответы на них.
+    Загружает ветки комментариев видео (включая ответы) и отдаёт их постранично.
+
+    Страницы отдаются по мере загрузки, поэтому вызывающий код может сохранять
+    их сразу и не держать в памяти все комментарии видео.
 
-    Функция делает запрос к YouTube API, получает комментарии и ответы на них.
+    Если передан `known_watermark`, включается инкрементальный режим: ветки запрашиваются
+    в порядке `order=time` (сначала новые), и обход страниц прекращается, как только
+    страница содержит только уже известные ветки. Новые ответы в старых ветках в этом
+    режиме могут быть пропущены — их подхватывает периодический полный обход.
+
+    Если передан `page_token`, обход начинается с этой страницы (продолжение прерванной
+    загрузки видео, см. crawl_checkpoints).
 
     Args:
         youtube_service (googleapiclient.discovery.Resource): Авторизованный клиент YouTube API.
         video_id (str): Идентификатор видео, для которого нужно получить комментарии.
         logger (logging.Logger): Логгер.
+        known_watermark (str, optional): Самая поздняя дата уже сохранённых комментариев видео.
+            По умолчанию None — загружаются все страницы.
+        quota_tracker (QuotaTracker, optional): Счётчик квоты проекта.
+        page_token (str, optional): Токен страницы, с которой начать обход.
 
-    Returns:
-        list: Список всех комментариев (items) и ответов.
+    Yields:
+        tuple: (ветки комментариев (items) одной страницы ответа, токен следующей страницы или None).
+
+    Raises:
+        QuotaExceededError: Если квота проекта исчерпана.
+        CommentFetchError: Если страницу не удалось загрузить (кроме отключённых комментариев
+            и ненайденного видео, при которых обход просто завершается).
     """
-    items = []
+    loaded_threads = 0
+    params = {"pageToken": page_token} if page_token else {}
 
     request = youtube_service.commentThreads().list(
         part="snippet,replies",
         videoId=video_id,
         maxResults=100,
-        textFormat="plainText"
+        order="time",
+        textFormat="plainText",
+        **params
     )
 
     while request:
         try:
-            response = request.execute()
-
-            items.extend(response.get('items', []))  # Добавляем все комментарии и ответы
-
-            # Переход к следующей странице, если она есть
-            request = youtube_service.commentThreads().list_next(request, response)
+            response = execute_request(request, "commentThreads.list", quota_tracker, logger)
+        except QuotaExceededError:
+            raise
         except HttpError as err:
             error_message = str(err)
 
-            if err.resp.status == 401:
-                logger.warning("Ошибка 401: Недействительный API-ключ или истекший токен доступа.")
-
-                break
-            elif err.resp.status == 403 and "commentsDisabled" in error_message:
+            if err.resp.status == 403 and "commentsDisabled" in error_message:
                 logger.warning("Комментарии отключены для видео %s, пропускаем...", video_id)
 
-                break
-            elif err.resp.status == 404:
+                return
+
+            if err.resp.status == 404:
                 logger.error("Ошибка 404: Видео %s не найдено.", video_id)
 
-                break
-            else:
-                logger.error("Ошибка при получении комментариев для видео %s: %s", video_id, error_message)
+                return
+
+            if err.resp.status == 401:
+                raise CommentFetchError("Ошибка 401: Недействительный API-ключ или истекший токен доступа.") from err
+
+            # Временные ошибки уже повторены в execute_request
+            raise CommentFetchError(f"Ошибка при получении комментариев для видео {video_id}: {error_message}") from err
         except Exception as err:
-            logger.error("Ошибка при обновлении комментариев видео %s: %s", video_id, err)
+            raise CommentFetchError(f"Ошибка при обновлении комментариев видео {video_id}: {err}") from err
+
+        page_items = response.get('items', [])
+        loaded_threads += len(page_items)
+
+        yield page_items, response.get('nextPageToken')
+
+        if known_watermark and page_has_only_known_threads(page_items, known_watermark):
+            logger.info("Видео %s: новых комментариев дальше нет, загружено веток: %d", video_id, loaded_threads)
+
+            return
+
+        # Переход к следующей странице, если она есть
+        request = youtube_service.commentThreads().list_next(request, response)
 
-    return items
@@ -0,0 +1,59 @@
+import googleapiclient.errors
+
+from utils_youtube import execute_request
+from quota_scheduler import QuotaExceededError
+
+
+def get_videos_comment_counts(youtube_service, video_ids, channel_name, logger, quota_tracker=None):
+    """
+    Получает количество комментариев для списка видео через videos.list(part=statistics).
+
+    Запросы выполняются пачками по 50 идентификаторов (максимум для одного запроса),
+    поэтому проверка канала с тысячами видео стоит десятки единиц квоты вместо
+    полного обхода комментариев каждого видео.
+
+    Args:
+        youtube_service (googleapiclient.discovery.Resource): Авторизованный клиент YouTube API.
+        video_ids (list): Список идентификаторов видео.
+        channel_name (str): Название канала.
+        logger (logging.Logger): Логгер для записи логов.
+        quota_tracker (QuotaTracker, optional): Счётчик квоты проекта.
+
+    Returns:
+        dict: Словарь {идентификатор видео: количество комментариев}. Для видео с отключёнными
+              комментариями значение равно None.
+        None: Если возникла ошибка (например, превышение квоты или ошибка API).
+    """
+    comment_counts = {}
+    batch_size = 50
+
+    for start in range(0, len(video_ids), batch_size):
+        batch = video_ids[start:start + batch_size]
+
+        request = youtube_service.videos().list(
+            part="statistics",
+            id=",".join(batch)
+        )
+
+        try:
+            response = execute_request(request, "videos.list", quota_tracker, logger)
+        except QuotaExceededError:
+            logger.error("Достигнут лимит квоты API YouTube. Попробуйте позже.")
+
+            return None
+        except googleapiclient.errors.HttpError as err:
+            logger.error("Ошибка при получении статистики видео: %s", err)
+
+            return None
+        except Exception as err:
+            logger.error("Неизвестная ошибка: %s", err)
+
+            return None
+
+        for item in response.get('items', []):
+            comment_count = item.get('statistics', {}).get('commentCount')
+            comment_counts[item['id']] = int(comment_count) if comment_count is not None else None
+
+    logger.info("Канал: %s | Получена статистика для %d видео", channel_name, len(comment_counts))
+
+    return comment_counts
@@ -3,14 +3,564 @@ import sqlite3
 import config
 
 from set_logger import set_logger
+from comments_search import create_search_index, search_index_exists
+
+
+# Версионированные миграции схемы базы данных.
+# Номер последней применённой миграции хранится в PRAGMA user_version,
+# поэтому существующие базы обновляются на месте, начиная со следующей миграции.
+MIGRATIONS = [
+    (1, "Базовые таблицы", [
+        '''
+        CREATE TABLE IF NOT EXISTS comments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+
+            youtube_video_id TEXT NOT NULL,
+            channel_name TEXT NOT NULL,
+            channel_id TEXT NOT NULL,
+
+            comment_id TEXT NOT NULL,
+            author TEXT NOT NULL,
+            author_channel_id TEXT NOT NULL,
+
+            text TEXT NOT NULL,
+            publish_date TEXT,
+            updated_date TEXT,
+            reply_to TEXT
+        )
+        ''',
+        # Последнее известное количество комментариев видео (для пропуска неизменившихся видео)
+        '''
+        CREATE TABLE IF NOT EXISTS video_statistics (
+            youtube_video_id TEXT PRIMARY KEY,
+            channel_id TEXT NOT NULL,
+            comment_count INTEGER,
+            checked_date TEXT
+        )
+        ''',
+        # Счётчик запусков обработки канала (для периодического полного обхода)
+        '''
+        CREATE TABLE IF NOT EXISTS channel_runs (
+            channel_id TEXT PRIMARY KEY,
+            run_count INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        # Каталог видео каналов (для инкрементальной синхронизации плейлиста загрузок)
+        '''
+        CREATE TABLE IF NOT EXISTS videos (
+            youtube_video_id TEXT PRIMARY KEY,
+            channel_id TEXT NOT NULL,
+            publish_date TEXT
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_videos_channel_id ON videos (channel_id)
+        ''',
+        # Расход квоты YouTube API по проектам, суткам и методам
+        '''
+        CREATE TABLE IF NOT EXISTS quota_usage (
+            project TEXT NOT NULL,
+            usage_date TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            units INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (project, usage_date, endpoint)
+        )
+        '''
+    ]),
+    (2, "Индексы таблицы comments", [
+        # Перед созданием уникального индекса удаляем дубликаты, оставляя первую запись
+        '''
+        DELETE FROM comments
+        WHERE id NOT IN (
+            SELECT MIN(id)
+            FROM comments
+            GROUP BY comment_id, updated_date
+        )
+        ''',
+        # Индекс также обслуживает поиск по одному comment_id (левый префикс)
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_comments_comment_id_updated_date
+        ON comments (comment_id, updated_date)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_comments_youtube_video_id ON comments (youtube_video_id)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_comments_channel_id ON comments (channel_id)
+        '''
+    ]),
+    (3, "Очередь уведомлений notification_outbox", [
+        # Уведомления о новых комментариях, записываемые в одной транзакции с комментариями.
+        # status: held (ждёт окончания обработки канала), pending, delivered, failed
+        '''
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+
+            channel_id TEXT NOT NULL,
+            youtube_video_id TEXT NOT NULL,
+            comment_id TEXT NOT NULL,
+            digest_group TEXT,
+
+            message TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+
+            created_date TEXT NOT NULL,
+            delivered_date TEXT
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_notification_outbox_pending
+        ON notification_outbox (id) WHERE status = 'pending'
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_notification_outbox_digest_group
+        ON notification_outbox (digest_group) WHERE status = 'held'
+        '''
+    ]),
+    (4, "Индекс архива исходных данных комментариев", [
+        # Положение каждой версии ветки в сжатых сегментах архива (см. comments_archive)
+        '''
+        CREATE TABLE IF NOT EXISTS archive_index (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+
+            comment_id TEXT NOT NULL,
+            channel_id TEXT NOT NULL,
+            youtube_video_id TEXT NOT NULL,
+            updated_date TEXT,
+            content_hash TEXT NOT NULL,
+
+            segment_path TEXT NOT NULL,
+            block_offset INTEGER NOT NULL,
+            block_length INTEGER NOT NULL,
+            archived_date TEXT NOT NULL,
+
+            UNIQUE (comment_id, content_hash)
+        )
+        '''
+    ]),
+    (5, "Хэши последних версий веток в архиве", [
+        # Хэш последней сохранённой версии ветки (загружается в память по видео)
+        '''
+        CREATE TABLE IF NOT EXISTS thread_hashes (
+            comment_id TEXT PRIMARY KEY,
+            youtube_video_id TEXT NOT NULL,
+            content_hash TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_thread_hashes_youtube_video_id ON thread_hashes (youtube_video_id)
+        ''',
+        # Уже заархивированные ветки переносятся из индекса архива (последняя версия каждой ветки)
+        '''
+        INSERT INTO thread_hashes (comment_id, youtube_video_id, content_hash)
+        SELECT comment_id, youtube_video_id, content_hash
+        FROM archive_index
+        WHERE true
+        ORDER BY id
+        ON CONFLICT (comment_id) DO UPDATE SET content_hash = excluded.content_hash
+        '''
+    ]),
+    (6, "Количество ответов в ветках с полностью загруженными ответами", [
+        # totalReplyCount ветки на момент последней полной загрузки её ответов через comments.list
+        '''
+        CREATE TABLE IF NOT EXISTS thread_reply_counts (
+            comment_id TEXT PRIMARY KEY,
+            youtube_video_id TEXT NOT NULL,
+            reply_count INTEGER NOT NULL,
+            synced_date TEXT
+        )
+        '''
+    ]),
+    (7, "Расписание опроса видео в режиме наблюдения", [
+        # Время следующего опроса и текущий интервал каждого видео (см. watch_scheduler)
+        '''
+        CREATE TABLE IF NOT EXISTS video_schedule (
+            youtube_video_id TEXT PRIMARY KEY,
+            channel_id TEXT NOT NULL,
+            next_poll_at REAL NOT NULL,
+            interval_seconds REAL NOT NULL,
+            last_polled_at REAL
+        )
+        '''
+    ]),
+    (8, "Контрольные точки обхода видео каналов", [
+        # Незавершённый обход видео канала (см. crawl_checkpoints)
+        '''
+        CREATE TABLE IF NOT EXISTS crawl_passes (
+            channel_id TEXT PRIMARY KEY,
+            full_crawl INTEGER NOT NULL,
+            started_date TEXT NOT NULL
+        )
+        ''',
+        # Номер видео в обходе и токен следующей страницы веток (NULL у завершённых видео)
+        '''
+        CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+            channel_id TEXT NOT NULL,
+            youtube_video_id TEXT NOT NULL,
+            video_position INTEGER NOT NULL,
+            page_token TEXT,
+            completed INTEGER NOT NULL DEFAULT 0,
+            updated_date TEXT,
+            PRIMARY KEY (channel_id, youtube_video_id)
+        )
+        '''
+    ]),
+    (9, "Отметки инкрементальной выгрузки комментариев", [
+        # id последней выгруженной строки comments по имени выгрузки (см. export_comments)
+        '''
+        CREATE TABLE IF NOT EXISTS export_watermarks (
+            export_name TEXT PRIMARY KEY,
+            last_rowid INTEGER NOT NULL,
+            export_format TEXT,
+            output_dir TEXT,
+            exported_date TEXT
+        )
+        '''
+    ]),
+    (10, "Прежние версии комментариев в comment_revisions", [
+        # Прежние версии изменённых комментариев: только текст и дата изменения,
+        # остальные поля совпадают с текущей версией в comments
+        '''
+        CREATE TABLE IF NOT EXISTS comment_revisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            comment_id TEXT NOT NULL,
+            updated_date TEXT,
+            text TEXT NOT NULL,
+            UNIQUE (comment_id, updated_date)
+        )
+        ''',
+        # В comments остаётся только последняя версия каждого комментария
+        # (освободившееся место возвращается файлу базы после VACUUM)
+        '''
+        INSERT INTO comment_revisions (comment_id, updated_date, text)
+        SELECT comment_id, updated_date, text
+        FROM comments
+        WHERE EXISTS (
+            SELECT 1
+            FROM comments AS newer
+            WHERE newer.comment_id = comments.comment_id AND newer.updated_date > comments.updated_date
+        )
+        ORDER BY id
+        ''',
+        '''
+        DELETE FROM comments
+        WHERE EXISTS (
+            SELECT 1
+            FROM comments AS newer
+            WHERE newer.comment_id = comments.comment_id AND newer.updated_date > comments.updated_date
+        )
+        ''',
+        '''
+        DROP INDEX IF EXISTS idx_comments_comment_id_updated_date
+        ''',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_comments_comment_id ON comments (comment_id)
+        ''',
+        # Все версии комментариев в прежнем виде таблицы comments (строка на версию)
+        '''
+        CREATE VIEW IF NOT EXISTS comment_versions AS
+        SELECT
+            id,
+            youtube_video_id,
+            channel_name,
+            channel_id,
+            comment_id,
+            author,
+            author_channel_id,
+            text,
+            publish_date,
+            updated_date,
+            reply_to,
+            1 AS is_current
+        FROM comments
+        UNION ALL
+        SELECT
+            comments.id,
+            comments.youtube_video_id,
+            comments.channel_name,
+            comments.channel_id,
+            comments.comment_id,
+            comments.author,
+            comments.author_channel_id,
+            comment_revisions.text,
+            comments.publish_date,
+            comment_revisions.updated_date,
+            comments.reply_to,
+            0 AS is_current
+        FROM comment_revisions
+        JOIN comments ON comments.comment_id = comment_revisions.comment_id
+        '''
+    ]),
+    (11, "Справочники каналов, видео и авторов комментариев", [
+        # Справочники с целочисленными ключами: строки комментариев хранят ключи вместо
+        # повторяющихся в каждой строке идентификаторов и имён (см. comment_dimensions)
+        '''
+        CREATE TABLE IF NOT EXISTS dim_channels (
+            id INTEGER PRIMARY KEY,
+            channel_id TEXT NOT NULL UNIQUE,
+            channel_name TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS dim_videos (
+            id INTEGER PRIMARY KEY,
+            youtube_video_id TEXT NOT NULL UNIQUE,
+            channel_key INTEGER NOT NULL
+        )
+        ''',
+        # Автор — пара (канал автора, отображаемое имя): имя сохраняется на момент загрузки комментария
+        '''
+        CREATE TABLE IF NOT EXISTS dim_authors (
+            id INTEGER PRIMARY KEY,
+            author_channel_id TEXT NOT NULL,
+            author TEXT NOT NULL,
+            UNIQUE (author_channel_id, author)
+        )
+        ''',
+        # Название канала — последнее сохранённое
+        '''
+        INSERT INTO dim_channels (channel_id, channel_name)
+        SELECT channel_id, channel_name
+        FROM comments
+        WHERE true
+        ORDER BY id
+        ON CONFLICT (channel_id) DO UPDATE SET channel_name = excluded.channel_name
+        ''',
+        '''
+        INSERT INTO dim_videos (youtube_video_id, channel_key)
+        SELECT comments.youtube_video_id, dim_channels.id
+        FROM comments
+        JOIN dim_channels ON dim_channels.channel_id = comments.channel_id
+        ORDER BY comments.id
+        ON CONFLICT (youtube_video_id) DO NOTHING
+        ''',
+        '''
+        INSERT INTO dim_authors (author_channel_id, author)
+        SELECT author_channel_id, author
+        FROM comments
+        WHERE true
+        ORDER BY id
+        ON CONFLICT (author_channel_id, author) DO NOTHING
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS comment_rows (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+
+            video_key INTEGER NOT NULL,
+            channel_key INTEGER NOT NULL,
+
+            comment_id TEXT NOT NULL,
+            author_key INTEGER NOT NULL,
+
+            text TEXT NOT NULL,
+            publish_date TEXT,
+            updated_date TEXT,
+            reply_to TEXT
+        )
+        ''',
+        # id строк сохраняются: на них ссылаются индекс поиска и отметки выгрузки
+        '''
+        INSERT INTO comment_rows (
+            id, video_key, channel_key, comment_id, author_key, text, publish_date, updated_date, reply_to
+        )
+        SELECT
+            comments.id,
+            dim_videos.id,
+            dim_channels.id,
+            comments.comment_id,
+            dim_authors.id,
+            comments.text,
+            comments.publish_date,
+            comments.updated_date,
+            comments.reply_to
+        FROM comments
+        JOIN dim_videos ON dim_videos.youtube_video_id = comments.youtube_video_id
+        JOIN dim_channels ON dim_channels.channel_id = comments.channel_id
+        JOIN dim_authors
+            ON dim_authors.author_channel_id = comments.author_channel_id
+            AND dim_authors.author = comments.author
+        ORDER BY comments.id
+        ''',
+        # Счётчик AUTOINCREMENT продолжается с прежнего значения (id удалённых строк не выдаются повторно)
+        '''
+        DELETE FROM sqlite_sequence WHERE name = 'comment_rows'
+        ''',
+        '''
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT 'comment_rows', seq FROM sqlite_sequence WHERE name = 'comments'
+        ''',
+        # Вместе с таблицей удаляются её индексы и триггеры индекса поиска
+        # (init_database создаёт триггеры заново для таблицы comment_rows)
+        '''
+        DROP TABLE comments
+        ''',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_comment_rows_comment_id ON comment_rows (comment_id)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_comment_rows_video_key ON comment_rows (video_key)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_comment_rows_channel_key ON comment_rows (channel_key)
+        ''',
+        # Строки комментариев в прежнем виде таблицы comments (на нём же основаны представление
+        # comment_versions, индекс поиска и выгрузка). Ключи справочников всегда заполнены,
+        # а LEFT JOIN по первичному ключу SQLite пропускает, если столбцы справочника
+        # в запросе не нужны (например, при подсчёте строк видео)
+        '''
+        CREATE VIEW IF NOT EXISTS comments AS
+        SELECT
+            comment_rows.id,
+            dim_videos.youtube_video_id,
+            dim_channels.channel_name,
+            dim_channels.channel_id,
+            comment_rows.comment_id,
+            dim_authors.author,
+            dim_authors.author_channel_id,
+            comment_rows.text,
+            comment_rows.publish_date,
+            comment_rows.updated_date,
+            comment_rows.reply_to
+        FROM comment_rows
+        LEFT JOIN dim_videos ON dim_videos.id = comment_rows.video_key
+        LEFT JOIN dim_channels ON dim_channels.id = comment_rows.channel_key
+        LEFT JOIN dim_authors ON dim_authors.id = comment_rows.author_key
+        ''',
+        # Изменение представления comments (например, из внешних скриптов): канал, видео
+        # и автор добавляются в справочники, строка изменяется в comment_rows
+        '''
+        CREATE TRIGGER IF NOT EXISTS comments_instead_of_insert INSTEAD OF INSERT ON comments BEGIN
+            INSERT INTO dim_channels (channel_id, channel_name)
+            VALUES (new.channel_id, new.channel_name)
+            ON CONFLICT (channel_id) DO UPDATE SET channel_name = excluded.channel_name;
+
+            INSERT INTO dim_videos (youtube_video_id, channel_key)
+            SELECT new.youtube_video_id, id FROM dim_channels WHERE channel_id = new.channel_id
+            ON CONFLICT (youtube_video_id) DO NOTHING;
+
+            INSERT INTO dim_authors (author_channel_id, author)
+            VALUES (new.author_channel_id, new.author)
+            ON CONFLICT (author_channel_id, author) DO NOTHING;
+
+            INSERT INTO comment_rows (
+                id, video_key, channel_key, comment_id, author_key, text, publish_date, updated_date, reply_to
+            )
+            VALUES (
+                new.id,
+                (SELECT id FROM dim_videos WHERE youtube_video_id = new.youtube_video_id),
+                (SELECT id FROM dim_channels WHERE channel_id = new.channel_id),
+                new.comment_id,
+                (SELECT id FROM dim_authors WHERE author_channel_id = new.author_channel_id AND author = new.author),
+                new.text,
+                new.publish_date,
+                new.updated_date,
+                new.reply_to
+            );
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS comments_instead_of_update INSTEAD OF UPDATE ON comments BEGIN
+            INSERT INTO dim_channels (channel_id, channel_name)
+            VALUES (new.channel_id, new.channel_name)
+            ON CONFLICT (channel_id) DO UPDATE SET channel_name = excluded.channel_name;
+
+            INSERT INTO dim_videos (youtube_video_id, channel_key)
+            SELECT new.youtube_video_id, id FROM dim_channels WHERE channel_id = new.channel_id
+            ON CONFLICT (youtube_video_id) DO NOTHING;
+
+            INSERT INTO dim_authors (author_channel_id, author)
+            VALUES (new.author_channel_id, new.author)
+            ON CONFLICT (author_channel_id, author) DO NOTHING;
+
+            UPDATE comment_rows SET
+                id = new.id,
+                video_key = (SELECT id FROM dim_videos WHERE youtube_video_id = new.youtube_video_id),
+                channel_key = (SELECT id FROM dim_channels WHERE channel_id = new.channel_id),
+                comment_id = new.comment_id,
+                author_key = (
+                    SELECT id FROM dim_authors WHERE author_channel_id = new.author_channel_id AND author = new.author
+                ),
+                text = new.text,
+                publish_date = new.publish_date,
+                updated_date = new.updated_date,
+                reply_to = new.reply_to
+            WHERE id = old.id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS comments_instead_of_delete INSTEAD OF DELETE ON comments BEGIN
+            DELETE FROM comment_rows WHERE id = old.id;
+        END
+        '''
+    ]),
+    (12, "Доставленные части уведомлений notification_outbox", [
+        # Количество уже принятых Telegram сообщений, на которые разбито длинное уведомление:
+        # повторная отправка начинается со следующего сообщения (см. notification_outbox)
+        '''
+        ALTER TABLE notification_outbox ADD COLUMN delivered_parts INTEGER NOT NULL DEFAULT 0
+        '''
+    ])
+]
+
+
+def get_schema_version(conn) -> int:
+    """
+    Возвращает номер последней применённой миграции.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+
+    Returns:
+        int: Версия схемы (0 для новой или ещё не версионированной базы).
+    """
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def apply_migrations(conn, logger):
+    """
+    Применяет к базе данных все ещё не применённые миграции.
+
+    Каждая миграция выполняется в отдельной транзакции вместе с обновлением
+    PRAGMA user_version, поэтому прерванная миграция не оставляет базу в промежуточном состоянии.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных в режиме autocommit (isolation_level=None).
+        logger (logging.Logger): Логгер.
+    """
+    current_version = get_schema_version(conn)
+
+    for version, description, statements in MIGRATIONS:
+        if version <= current_version:
+            continue
+
+        logger.info("Применение миграции %d: %s", version, description)
+
+        conn.execute('BEGIN IMMEDIATE')
+
+        try:
+            for statement in statements:
+                conn.execute(statement)
+
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+
+            raise
 
 
 def init_database(database_path: str, main_logger):
     """
-    Инициализирует базу данных SQLite, создавая таблицу `comments`, если она не существует.
+    Инициализирует базу данных SQLite: включает WAL и применяет миграции схемы.
 
-    Функция подключается к указанной базе данных, создаёт таблицу `comments` с нужными полями
-    и закрывает соединение.
+    Функция подключается к указанной базе данных, переводит её в режим журнала WAL
+    (читатели не блокируют запись из параллельных потоков), применяет недостающие
+    миграции из MIGRATIONS, при включённой настройке `config.comments_search_index`
+    создаёт индекс поиска комментариев (у существующего индекса восстанавливает
+    триггеры) и закрывает соединение.
 
     Args:
         database_path (str): Путь к файлу базы данных SQLite.
@@ -20,31 +570,22 @@ def init_database(database_path: str, main_logger):
     logger.info("Инициализация базы данных.")
 
     try:
-        with sqlite3.connect(database_path) as conn:
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS comments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+        conn = sqlite3.connect(database_path, isolation_level=None)
 
-                    youtube_video_id TEXT NOT NULL,
-                    channel_name TEXT NOT NULL,
-                    channel_id TEXT NOT NULL,
+        try:
+            conn.execute('PRAGMA journal_mode = WAL')
 
-                    comment_id TEXT NOT NULL,
-                    author TEXT NOT NULL,
-                    author_channel_id TEXT NOT NULL,
+            apply_migrations(conn=conn, logger=logger)
 
-                    text TEXT NOT NULL,
-                    publish_date TEXT,
-                    updated_date TEXT,
-                    reply_to TEXT
-                )
-            ''')
+            # Существующий индекс тоже проверяется: миграция 11 удаляет его триггеры вместе с прежней таблицей comments
+            if config.comments_search_index or search_index_exists(conn):
+                create_search_index(conn=conn, logger=logger)
 
-            conn.commit()
+            conn.execute('PRAGMA optimize')
+        finally:
+            conn.close()
 
-            logger.info("Инициализация базы данных завершена.")
+        logger.info("Инициализация базы данных завершена.")
     except Exception as err:
         logger.error("Ошибка при инициализации базы данных: %s", err)
 
@@ -0,0 +1,385 @@
+"""
+Модуль метрик работы программы в текстовом формате Prometheus.
+
+Метрики собираются в памяти процесса (потокобезопасно) и выводятся либо в файл
+для textfile-коллектора node_exporter (`config.metrics_textfile_path`), либо по
+HTTP на `http://<адрес>:<порт>/metrics` (`config.metrics_http_port`).
+Зависимость prometheus_client не нужна.
+
+Краткое описание:
+- Counter: Счётчик, который только растёт.
+- Gauge: Значение, которое может расти и уменьшаться.
+- Histogram: Распределение длительностей по корзинам.
+- render_metrics: Выводит все метрики в текстовом формате Prometheus.
+- write_metrics_textfile: Атомарно записывает метрики в файл.
+- start_metrics_server: Запускает HTTP-сервер метрик в фоновом потоке.
+- Метрики программы: API_REQUESTS, API_REQUEST_SECONDS, QUOTA_UNITS, ...
+"""
+import os
+import time
+import threading
+
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Корзины гистограмм длительности в секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Все созданные метрики в порядке создания
+_registry = []
+
+
+def escape_label_value(value) -> str:
+    """
+    Экранирует значение метки для текстового формата Prometheus.
+
+    Args:
+        value: Значение метки.
+
+    Returns:
+        str: Экранированное значение.
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels: tuple) -> str:
+    """
+    Форматирует набор меток метрики.
+
+    Args:
+        labels (tuple): Пары (имя метки, значение).
+
+    Returns:
+        str: Метки в виде `{name="value",...}` или пустая строка.
+    """
+    if not labels:
+        return ""
+
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + "}"
+
+
+def format_value(value: float) -> str:
+    """
+    Форматирует значение метрики.
+    """
+    if value == float('inf'):
+        return "+Inf"
+
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """
+    Базовый класс метрики с метками.
+    """
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        """
+        Args:
+            name (str): Имя метрики.
+            documentation (str): Описание метрики (строка HELP).
+            labelnames (tuple, optional): Имена меток.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+        self._lock = threading.Lock()
+        self._values = {}
+
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}, получены {tuple(labels)}")
+
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def collect(self) -> list:
+        """
+        Returns:
+            list: Строки метрики в текстовом формате Prometheus.
+        """
+        with self._lock:
+            values = sorted(self._values.items(), key=lambda item: [str(value) for _, value in item[0]])
+
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}"
+        ]
+
+        for key, value in values:
+            lines.extend(self._collect_series(key, value))
+
+        return lines
+
+    def _collect_series(self, key, value) -> list:
+        return [f"{self.name}{format_labels(key)} {format_value(value)}"]
+
+
+class Counter(Metric):
+    """
+    Счётчик, который только растёт (например, количество запросов).
+    """
+
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        """
+        Увеличивает счётчик.
+
+        Args:
+            amount (float, optional): Величина увеличения. По умолчанию 1.
+            **labels: Значения меток.
+        """
+        key = self._key(labels)
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    Значение, которое может расти и уменьшаться (например, длина очереди).
+    """
+
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels):
+        """
+        Устанавливает значение.
+
+        Args:
+            value (float): Новое значение.
+            **labels: Значения меток.
+        """
+        key = self._key(labels)
+
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """
+    Распределение наблюдаемых значений (длительностей) по корзинам.
+    """
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Args:
+            name (str): Имя метрики.
+            documentation (str): Описание метрики (строка HELP).
+            labelnames (tuple, optional): Имена меток.
+            buckets (tuple, optional): Верхние границы корзин в порядке возрастания.
+        """
+        super().__init__(name, documentation, labelnames)
+
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        """
+        Добавляет наблюдение.
+
+        Args:
+            value (float): Наблюдаемое значение.
+            **labels: Значения меток.
+        """
+        key = self._key(labels)
+
+        with self._lock:
+            series = self._values.setdefault(key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+
+            for index, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    series["buckets"][index] += 1
+
+                    break
+
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Измеряет длительность блока `with` (в том числе завершившегося ошибкой).
+
+        Args:
+            **labels: Значения меток.
+        """
+        started = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _collect_series(self, key, value) -> list:
+        lines = []
+        cumulative = 0
+
+        for upper_bound, count in zip(self.buckets, value["buckets"]):
+            cumulative += count
+            labels = format_labels(key + (("le", format_value(upper_bound)),))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+
+        lines.append(f"{self.name}_sum{format_labels(key)} {format_value(value['sum'])}")
+        lines.append(f"{self.name}_count{format_labels(key)} {value['count']}")
+
+        return lines
+
+
+def render_metrics() -> str:
+    """
+    Выводит все метрики в текстовом формате Prometheus.
+
+    Returns:
+        str: Текст метрик.
+    """
+    lines = []
+
+    for metric in _registry:
+        lines.extend(metric.collect())
+
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_textfile(path: str):
+    """
+    Записывает метрики в файл для textfile-коллектора node_exporter.
+
+    Файл заменяется атомарно, чтобы коллектор не прочитал его наполовину записанным.
+
+    Args:
+        path (str): Путь к файлу (расширение .prom).
+    """
+    directory = os.path.dirname(path)
+
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write(render_metrics())
+
+    os.replace(temp_path, path)
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик HTTP-запросов к `/metrics`.
+    """
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+
+            return
+
+        body = render_metrics().encode('utf-8')
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Запросы Prometheus не пишутся в лог программы
+        pass
+
+
+def start_metrics_server(port: int, address: str = "127.0.0.1", logger=None):
+    """
+    Запускает HTTP-сервер метрик в фоновом потоке.
+
+    Args:
+        port (int): Порт.
+        address (str, optional): Адрес. По умолчанию только локальные подключения.
+        logger (logging.Logger, optional): Логгер.
+
+    Returns:
+        ThreadingHTTPServer | None: Запущенный сервер или None, если порт занят.
+    """
+    try:
+        server = ThreadingHTTPServer((address, port), MetricsRequestHandler)
+    except OSError as err:
+        if logger is not None:
+            logger.error("Не удалось запустить сервер метрик на %s:%d: %s", address, port, err)
+
+        return None
+
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+
+    if logger is not None:
+        logger.info("Метрики доступны на http://%s:%d/metrics", address, port)
+
+    return server
+
+
+# Метрики программы
+
+API_REQUESTS = Counter(
+    "youtube_api_requests_total",
+    "Запросы к YouTube Data API (включая повторы) по методу и результату.",
+    ("endpoint", "status")
+)
+API_REQUEST_SECONDS = Histogram(
+    "youtube_api_request_seconds",
+    "Длительность одного запроса к YouTube Data API.",
+    ("endpoint",)
+)
+QUOTA_UNITS = Counter(
+    "youtube_quota_units_total",
+    "Списанные единицы квоты YouTube Data API по проекту и методу (локальная оценка).",
+    ("project", "endpoint")
+)
+QUOTA_REMAINING = Gauge(
+    "youtube_quota_remaining_units",
+    "Остаток дневной квоты проекта по локальному учёту.",
+    ("project",)
+)
+DB_SAVE_SECONDS = Histogram(
+    "comments_db_save_seconds",
+    "Длительность сохранения пачки комментариев в базу данных (save_comments_to_db)."
+)
+PAGES_PROCESSED = Counter(
+    "crawler_comment_pages_total",
+    "Обработанные страницы веток комментариев по каналу.",
+    ("channel",)
+)
+NEW_COMMENTS = Counter(
+    "crawler_new_comments_total",
+    "Новые сохранённые комментарии по каналу.",
+    ("channel",)
+)
+CHANNEL_DURATION_SECONDS = Gauge(
+    "crawler_channel_duration_seconds",
+    "Длительность последней обработки канала.",
+    ("channel",)
+)
+TELEGRAM_SEND_SECONDS = Histogram(
+    "telegram_send_seconds",
+    "Длительность одного запроса sendMessage к Telegram."
+)
+TELEGRAM_MESSAGES = Counter(
+    "telegram_messages_total",
+    "Сообщения Telegram по результату отправки (delivered, failed).",
+    ("result",)
+)
+TELEGRAM_QUEUE_SIZE = Gauge(
+    "telegram_queue_messages",
+    "Сообщения в очереди отправителя Telegram."
+)
+OUTBOX_MESSAGES = Gauge(
+    "notification_outbox_messages",
+    "Записи очереди уведомлений notification_outbox по статусу.",
+    ("status",)
+)
@@ -0,0 +1,184 @@
+"""
+Разовый перенос данных комментариев из папки с файлами json в сжатый архив.
+
+Прежнее хранение создавало по файлу на каждую версию ветки комментариев
+(`<папка>/<channel_id>/<channel_id> - <video_id> - <comment_id> - <дата>.json`).
+Скрипт дописывает их в сегменты архива (см. comments_archive) по месяцу обновления
+ветки. Датой сохранения версии считается дата последней активности ветки, поэтому
+перенесённые версии не становятся новее уже заархивированных. Файлы упорядочиваются
+по месяцу из даты в имени и читаются порциями по `--batch-size`, поэтому в памяти
+не держится вся папка канала. Повторный запуск безопасен: уже перенесённые версии
+пропускаются по индексу.
+
+Пример:
+    python migrate_comments_archive.py --delete-source
+"""
+import os
+import argparse
+
+from datetime import datetime, timezone
+
+import config
+
+from set_logger import set_logger
+from init_database import init_database
+from utils_json import load_json
+from utils_database import connect_database
+from get_video_comments import get_thread_last_activity
+from comments_archive import ThreadHashCache, append_threads_to_archive, get_content_hash
+
+
+def parse_args():
+    """
+    Разбирает аргументы командной строки.
+
+    Returns:
+        argparse.Namespace: Аргументы.
+    """
+    parser = argparse.ArgumentParser(description="Перенос файлов json с комментариями в сжатый архив.")
+
+    parser.add_argument("--source", default=config.path_to_comments_data_storage_dir, help="Папка с файлами json.")
+    parser.add_argument("--archive-dir", default=config.path_to_comments_archive_dir, help="Папка архива.")
+    parser.add_argument("--database", default=config.database_path, help="Путь к базе данных SQLite.")
+    parser.add_argument("--compression", default=config.comments_archive_compression, choices=["gzip", "zstd"])
+    parser.add_argument("--batch-size", type=int, default=500, help="Количество файлов, читаемых за раз (и веток в одном сжатом блоке).")
+    parser.add_argument("--delete-source", action="store_true", help="Удалять перенесённые файлы json.")
+
+    return parser.parse_args()
+
+
+def get_thread_month(comment_thread: dict) -> datetime:
+    """
+    Возвращает месяц обновления ветки, определяющий сегмент архива.
+
+    Args:
+        comment_thread (dict): Ветка комментариев.
+
+    Returns:
+        datetime: Первый день месяца (UTC).
+    """
+    updated_date = comment_thread['snippet']['topLevelComment']['snippet']['updatedAt']
+
+    return datetime.strptime(updated_date[:7], "%Y-%m").replace(tzinfo=timezone.utc)
+
+
+def get_file_month(file_name: str) -> str:
+    """
+    Возвращает месяц из даты в имени файла ветки (`... - YYYY-MM-DD HH-MM-SS.json`).
+
+    Дата в имени записана в местном времени, поэтому на границе месяцев она может
+    не совпадать с месяцем сегмента: месяц из имени служит только для упорядочивания файлов.
+
+    Args:
+        file_name (str): Имя файла json.
+
+    Returns:
+        str: Месяц в формате YYYY-MM (для имени другого вида — начало его последней части).
+    """
+    return file_name[:-len(".json")].rsplit(" - ", 1)[-1][:7]
+
+
+def migrate_channel_folder(conn, channel_folder, args, logger) -> dict:
+    """
+    Переносит в архив файлы json одного канала.
+
+    Файлы читаются порциями по `args.batch_size` в порядке месяца из имени, поэтому
+    ветки одной порции почти всегда попадают в один сегмент архива.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        channel_folder (str): Папка канала с файлами json.
+        args (argparse.Namespace): Аргументы командной строки.
+        logger (logging.Logger): Логгер.
+
+    Returns:
+        dict: Количество прочитанных файлов, записанных веток и ошибок.
+    """
+    stats = {"files": 0, "written": 0, "errors": 0}
+    hash_cache = ThreadHashCache(conn)
+
+    file_names = sorted(
+        (file_name for file_name in os.listdir(channel_folder) if file_name.endswith(".json")),
+        key=lambda file_name: (get_file_month(file_name), file_name)
+    )
+
+    for start in range(0, len(file_names), args.batch_size):
+        threads_by_month = {}
+
+        for file_name in file_names[start:start + args.batch_size]:
+            file_path = os.path.join(channel_folder, file_name)
+            comment_thread = load_json(file_path=file_path, default_type=None, logger=logger)
+            stats["files"] += 1
+
+            # Ветка проверяется заранее: отклонённая архивом ветка не должна удаляться с файлом
+            try:
+                get_content_hash(comment_thread)
+                get_thread_last_activity(comment_thread)
+                month = get_thread_month(comment_thread)
+            except (KeyError, TypeError, ValueError) as err:
+                logger.error("Файл %s пропущен: некорректные данные ветки (%s)", file_path, err)
+                stats["errors"] += 1
+
+                continue
+
+            threads_by_month.setdefault(month, []).append((file_path, comment_thread))
+
+        for month, batch in sorted(threads_by_month.items()):
+            stats["written"] += append_threads_to_archive(
+                conn=conn,
+                comment_threads=[comment_thread for _, comment_thread in batch],
+                archive_dir=args.archive_dir,
+                compression=args.compression,
+                logger=logger,
+                archived_at=month,
+                hash_cache=hash_cache,
+                use_thread_dates=True
+            )
+
+            # Файлы удаляются только после записи блока и индекса
+            if args.delete_source:
+                for file_path, _ in batch:
+                    os.remove(file_path)
+
+    return stats
+
+
+def main():
+    """
+    Переносит в архив файлы json всех каналов из папки `--source`.
+    """
+    args = parse_args()
+    logger = set_logger(config.log_folder)
+
+    if not os.path.isdir(args.source):
+        logger.error("Папка %s не найдена.", args.source)
+
+        return
+
+    init_database(database_path=args.database, main_logger=logger)
+    conn = connect_database(args.database)
+
+    try:
+        for channel_id in sorted(os.listdir(args.source)):
+            channel_folder = os.path.join(args.source, channel_id)
+
+            if not os.path.isdir(channel_folder):
+                continue
+
+            stats = migrate_channel_folder(conn, channel_folder, args, logger)
+
+            logger.info(
+                "Канал %s: прочитано файлов %d, записано веток %d, ошибок %d",
+                channel_id, stats["files"], stats["written"], stats["errors"]
+            )
+
+            if args.delete_source and not os.listdir(channel_folder):
+                os.rmdir(channel_folder)
+    finally:
+        conn.close()
+
+    logger.info("Перенос архива комментариев завершён.")
+
+
+if __name__ == "__main__":
+    main()
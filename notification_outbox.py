@@ -0,0 +1,482 @@
+"""
+Модуль очереди уведомлений (outbox) в базе данных SQLite.
+
+Уведомления о новых комментариях записываются в таблицу `notification_outbox` в той же
+транзакции, что и сами комментарии, поэтому падение программы или ошибка Telegram не
+теряют уведомление. Отправитель забирает готовые записи по порядку, отмечает
+доставленные и повторяет неудачные с экспоненциальным откатом. Отправитель работает
+в фоновом потоке основной программы или отдельным процессом:
+
+    python notification_outbox.py
+
+Краткое описание:
+- get_digest_group: Определяет группу сводки уведомления по config.telegram_digest_mode.
+- enqueue_notifications: Добавляет уведомления в очередь (внутри транзакции вызывающего).
+- release_held_notifications: Открывает для отправки отложенную сводку канала.
+- claim_notifications: Забирает готовые к отправке записи на время отправки.
+- mark_notifications_delivered: Отмечает записи доставленными.
+- mark_notifications_failed: Планирует повтор или отмечает записи неотправляемыми.
+- purge_delivered_notifications: Удаляет старые доставленные записи.
+- count_notifications_by_status: Возвращает количество записей очереди по статусу.
+- group_notifications: Объединяет записи одной сводки в сообщения Telegram.
+- OutboxSender: Отправитель уведомлений из очереди.
+"""
+import sys
+import time
+import threading
+
+from datetime import datetime, timedelta, timezone
+
+import config
+
+from set_logger import set_logger
+from stage_profiler import profiler
+from metrics import OUTBOX_MESSAGES, start_metrics_server
+from init_database import init_database
+from rate_limiter import compute_backoff_delay
+from utils_database import connect_database
+from telegram_notification import (
+    TelegramNotifier,
+    pack_telegram_messages,
+    telegram_length,
+    DIGEST_SEPARATOR,
+    MENTION_RESERVE,
+    TELEGRAM_MESSAGE_LIMIT
+)
+
+
+def get_utc_timestamp() -> str:
+    """
+    Returns:
+        str: Текущее время UTC в формате YYYY-MM-DDTHH:MM:SSZ.
+    """
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def get_digest_group(channel_id: str, video_id: str):
+    """
+    Определяет группу сводки уведомления по режиму config.telegram_digest_mode.
+
+    Args:
+        channel_id (str): Идентификатор канала.
+        video_id (str): Идентификатор видео.
+
+    Returns:
+        str | None: Ключ группы ("video:<id>" или "channel:<id>") или None, если сводки отключены.
+    """
+    if config.telegram_digest_mode == "video":
+        return f"video:{video_id}"
+
+    if config.telegram_digest_mode == "channel":
+        return f"channel:{channel_id}"
+
+    return None
+
+
+def enqueue_notifications(cursor, notifications):
+    """
+    Добавляет уведомления в очередь.
+
+    Функция не фиксирует транзакцию: её вызывают внутри транзакции сохранения
+    комментариев, чтобы комментарий и уведомление о нём записывались атомарно.
+    В режиме сводки по каналу записи создаются со статусом held и становятся
+    доступны отправителю после release_held_notifications.
+
+    Args:
+        cursor (sqlite3.Cursor): Курсор базы данных (внутри открытой транзакции).
+        notifications (list): Кортежи (channel_id, video_id, comment_id, message).
+    """
+    created_date = get_utc_timestamp()
+    status = "held" if config.telegram_digest_mode == "channel" else "pending"
+
+    cursor.executemany('''
+        INSERT INTO notification_outbox (
+            channel_id, youtube_video_id, comment_id, digest_group, message, status, created_date
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (channel_id, video_id, comment_id, get_digest_group(channel_id, video_id), message, status, created_date)
+        for channel_id, video_id, comment_id, message in notifications
+    ])
+
+
+def release_held_notifications(conn, channel_id: str) -> int:
+    """
+    Открывает для отправки уведомления канала, отложенные до конца его обработки.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        channel_id (str): Идентификатор канала.
+
+    Returns:
+        int: Количество открытых записей.
+    """
+    with conn:
+        cursor = conn.execute('''
+            UPDATE notification_outbox
+            SET status = 'pending'
+            WHERE status = 'held' AND digest_group = ?
+        ''', (f"channel:{channel_id}",))
+
+    return cursor.rowcount
+
+
+def claim_notifications(conn, limit: int, lease_seconds: float) -> list:
+    """
+    Забирает готовые к отправке записи в порядке добавления.
+
+    Время следующей попытки забранных записей сдвигается на `lease_seconds`, поэтому
+    несколько отправителей не получают одни и те же записи, а записи отправителя,
+    прервавшегося на середине, снова станут доступны по истечении этого времени.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        limit (int): Максимальное количество записей.
+        lease_seconds (float): На сколько секунд записи закрепляются за отправителем.
+
+    Returns:
+        list: Кортежи (id, digest_group, message, attempts, delivered_parts), упорядоченные по id.
+    """
+    now = time.time()
+
+    with conn:
+        cursor = conn.execute('''
+            UPDATE notification_outbox
+            SET next_attempt_at = ?
+            WHERE id IN (
+                SELECT id
+                FROM notification_outbox
+                WHERE status = 'pending' AND next_attempt_at <= ?
+                ORDER BY id
+                LIMIT ?
+            )
+            RETURNING id, digest_group, message, attempts, delivered_parts
+        ''', (now + lease_seconds, now, limit))
+
+        rows = cursor.fetchall()
+
+    return sorted(rows)
+
+
+def mark_notifications_delivered(conn, notification_ids):
+    """
+    Отмечает записи доставленными.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        notification_ids (list): Идентификаторы записей.
+    """
+    delivered_date = get_utc_timestamp()
+
+    with conn:
+        conn.executemany('''
+            UPDATE notification_outbox
+            SET status = 'delivered', delivered_date = ?, last_error = NULL
+            WHERE id = ?
+        ''', [(delivered_date, notification_id) for notification_id in notification_ids])
+
+
+def mark_notifications_failed(conn, notification_ids, attempts: int, error: str, max_attempts: int, delivered_parts: int = 0):
+    """
+    Планирует повтор отправки с экспоненциальным откатом.
+
+    После `max_attempts` неудачных попыток записи получают статус failed и больше
+    не отправляются (их можно вернуть в очередь, установив status = 'pending').
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        notification_ids (list): Идентификаторы записей.
+        attempts (int): Номер неудачной попытки (начиная с 1).
+        error (str): Описание ошибки.
+        max_attempts (int): Максимальное количество попыток.
+        delivered_parts (int, optional): Сколько первых сообщений пачки Telegram уже принял
+            (при повторе они не отправляются).
+    """
+    status = "failed" if attempts >= max_attempts else "pending"
+    next_attempt_at = time.time() + compute_backoff_delay(
+        attempts, config.notification_outbox_backoff_base_seconds, config.notification_outbox_backoff_max_seconds
+    )
+
+    with conn:
+        conn.executemany('''
+            UPDATE notification_outbox
+            SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, delivered_parts = ?
+            WHERE id = ?
+        ''', [
+            (status, attempts, next_attempt_at, error, delivered_parts, notification_id)
+            for notification_id in notification_ids
+        ])
+
+
+def purge_delivered_notifications(conn, keep_days: int) -> int:
+    """
+    Удаляет доставленные записи старше `keep_days` дней.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        keep_days (int): Сколько дней хранить доставленные записи.
+
+    Returns:
+        int: Количество удалённых записей.
+    """
+    threshold = (datetime.now(timezone.utc) - timedelta(days=keep_days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    with conn:
+        cursor = conn.execute('''
+            DELETE FROM notification_outbox
+            WHERE status = 'delivered' AND delivered_date < ?
+        ''', (threshold,))
+
+    return cursor.rowcount
+
+
+def count_notifications_by_status(conn) -> dict:
+    """
+    Возвращает количество записей очереди по статусу.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+
+    Returns:
+        dict: Количество записей по статусам held, pending, delivered и failed.
+    """
+    counts = dict.fromkeys(("held", "pending", "delivered", "failed"), 0)
+    cursor = conn.execute('SELECT status, COUNT(*) FROM notification_outbox GROUP BY status')
+
+    counts.update(cursor.fetchall())
+
+    return counts
+
+
+def group_notifications(rows, limit: int = TELEGRAM_MESSAGE_LIMIT - MENTION_RESERVE) -> list:
+    """
+    Объединяет записи одной сводки в сообщения Telegram.
+
+    Подряд идущие записи с одинаковой группой сводки собираются в пачку, пока их
+    общий текст помещается в одно сообщение. Записи без группы отправляются по одной.
+    Сообщение длиннее лимита делится функцией pack_telegram_messages; сообщения,
+    которые Telegram уже принял при прошлой попытке, в пачку не включаются.
+
+    Args:
+        rows (list): Кортежи (id, digest_group, message, attempts, delivered_parts), упорядоченные по id.
+        limit (int, optional): Максимальная длина сообщения.
+
+    Returns:
+        list: Кортежи (идентификаторы записей, номер попытки, количество уже доставленных
+            сообщений, тексты ещё не доставленных сообщений).
+    """
+    batches = []
+    batch_rows = []
+    batch_length = 0
+
+    def flush():
+        if batch_rows:
+            # Несколько сообщений бывает только у пачки из одной длинной записи
+            delivered_parts = min(row[4] for row in batch_rows)
+
+            batches.append((
+                [row[0] for row in batch_rows],
+                max(row[3] for row in batch_rows) + 1,
+                delivered_parts,
+                pack_telegram_messages([row[2] for row in batch_rows], limit)[delivered_parts:]
+            ))
+
+    for row in rows:
+        digest_group, message = row[1], row[2]
+        message_length = telegram_length(message)
+
+        fits = batch_length + telegram_length(DIGEST_SEPARATOR) + message_length <= limit
+
+        if batch_rows and digest_group is not None and digest_group == batch_rows[-1][1] and fits:
+            batch_rows.append(row)
+            batch_length += telegram_length(DIGEST_SEPARATOR) + message_length
+
+            continue
+
+        flush()
+        batch_rows = [row]
+        batch_length = message_length
+
+    flush()
+
+    return batches
+
+
+class OutboxSender:
+    """
+    Отправитель уведомлений из таблицы notification_outbox.
+
+    Записи забираются пачками и передаются в TelegramNotifier, который соблюдает
+    ограничения частоты Telegram. Запись отмечается доставленной только после того,
+    как Telegram принял все сообщения её пачки. Сообщения пачки отправляются по порядку,
+    и после первого непринятого следующие не отправляются; количество принятых
+    сохраняется в записи, и повтор начинается с первого недоставленного сообщения.
+    """
+
+    def __init__(
+        self,
+        database_path,
+        notifier,
+        main_logger,
+        batch_size=200,
+        lease_seconds=1800,
+        poll_interval=config.notification_outbox_poll_seconds,
+        max_attempts=config.notification_outbox_max_attempts,
+        keep_days=config.notification_outbox_keep_days
+    ):
+        """
+        Args:
+            database_path (str): Путь к базе данных SQLite.
+            notifier (TelegramNotifier): Запущенный отправитель сообщений в Telegram.
+            main_logger (logging.Logger): Основной логгер.
+            batch_size (int, optional): Сколько записей забирать за раз. По умолчанию 200.
+            lease_seconds (float, optional): На сколько секунд записи закрепляются за отправителем.
+            poll_interval (float, optional): Пауза между проверками пустой очереди в секундах.
+            max_attempts (int, optional): Максимальное количество попыток отправки записи.
+            keep_days (int, optional): Сколько дней хранить доставленные записи.
+        """
+        self.database_path = database_path
+        self.notifier = notifier
+        self.logger = main_logger.getChild('notification_outbox')
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.keep_days = keep_days
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def send_due(self, conn) -> int:
+        """
+        Отправляет одну пачку готовых записей.
+
+        Args:
+            conn (sqlite3.Connection): Соединение с базой данных.
+
+        Returns:
+            int: Количество обработанных записей (0, если очередь пуста).
+        """
+        with profiler.stage("outbox.claim_notifications"):
+            rows = claim_notifications(conn, limit=self.batch_size, lease_seconds=self.lease_seconds)
+
+        if not rows:
+            return 0
+
+        # Все сообщения пачек ставятся в очередь сразу, а результаты проверяются по порядку.
+        # Каждое следующее сообщение пачки отправляется, только если принято предыдущее
+        batches = []
+
+        for notification_ids, attempts, delivered_parts, messages in group_notifications(rows):
+            results = []
+
+            for message in messages:
+                results.append(self.notifier.send(
+                    message=message, mention_user=True, depends_on=results[-1] if results else None
+                ))
+
+            batches.append((notification_ids, attempts, delivered_parts, results))
+
+        for notification_ids, attempts, delivered_parts, results in batches:
+            with profiler.stage("outbox.wait_telegram"):
+                # Принятые сообщения всегда идут подряд с начала пачки
+                accepted = sum(result.result() for result in results)
+
+            if accepted == len(results):
+                mark_notifications_delivered(conn, notification_ids)
+            else:
+                mark_notifications_failed(
+                    conn,
+                    notification_ids,
+                    attempts=attempts,
+                    error="Telegram не принял сообщение",
+                    max_attempts=self.max_attempts,
+                    delivered_parts=delivered_parts + accepted
+                )
+
+                if attempts >= self.max_attempts:
+                    self.logger.error("Уведомления %s не отправлены после %d попыток.", notification_ids, attempts)
+
+        return len(rows)
+
+    def run(self, stop_when_idle=False):
+        """
+        Отправляет записи из очереди до вызова stop().
+
+        Args:
+            stop_when_idle (bool, optional): Завершиться, как только готовых записей не останется.
+        """
+        conn = connect_database(self.database_path, timeout=config.database_timeout)
+
+        try:
+            purged = purge_delivered_notifications(conn, self.keep_days)
+
+            if purged:
+                self.logger.info("Удалено доставленных уведомлений: %d", purged)
+
+            while True:
+                try:
+                    sent = self.send_due(conn)
+                except Exception as err:
+                    self.logger.error("Ошибка отправки уведомлений из очереди: %s", err)
+                    sent = 0
+
+                try:
+                    for status, count in count_notifications_by_status(conn).items():
+                        OUTBOX_MESSAGES.set(count, status=status)
+                except Exception as err:
+                    self.logger.error("Ошибка подсчёта записей очереди уведомлений: %s", err)
+
+                if sent:
+                    continue
+
+                if stop_when_idle or self._stop_event.is_set():
+                    break
+
+                self._stop_event.wait(self.poll_interval)
+        finally:
+            conn.close()
+
+    def start(self):
+        """
+        Запускает отправку в фоновом потоке.
+        """
+        self._thread = threading.Thread(target=self.run, name="notification-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Отправляет оставшиеся готовые записи и останавливает фоновый поток.
+
+        Записи, ожидающие повтора после ошибки, остаются в очереди до следующего запуска.
+        """
+        self._stop_event.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+if __name__ == "__main__":
+    logger = set_logger(config.log_folder)
+
+    init_database(database_path=config.database_path, main_logger=logger)
+
+    notifier = TelegramNotifier(main_logger=logger)
+
+    if not notifier.start():
+        sys.exit(1)
+
+    sender = OutboxSender(database_path=config.database_path, notifier=notifier, main_logger=logger)
+
+    if config.metrics_http_port:
+        start_metrics_server(port=config.metrics_http_port, address=config.metrics_http_address, logger=logger)
+
+    logger.info("Отправитель уведомлений запущен.")
+
+    try:
+        sender.run()
+    except KeyboardInterrupt:
+        logger.info("Отправитель уведомлений остановлен.")
+    finally:
+        notifier.stop()
@@ -0,0 +1,434 @@
+"""
+Модуль для учёта квоты YouTube Data API и планирования обхода в пределах бюджета.
+
+Квота YouTube выделяется на проект Google Cloud (client_secret) и обнуляется в полночь
+по тихоокеанскому времени. Каждый вызов API списывает единицы квоты в зависимости от
+метода, в том числе вызовы, завершившиеся ошибкой.
+
+Краткое описание:
+- API_UNIT_COSTS: Стоимость вызовов API в единицах квоты.
+- QuotaExceededError: Исключение при исчерпании квоты проекта.
+- get_quota_project: Определяет проект (client_id) по файлу client_secret.
+- get_quota_day: Возвращает текущие «сутки квоты».
+- QuotaTracker: Потокобезопасный счётчик расхода квоты проекта с сохранением в SQLite.
+- QuotaReservation: Часть квоты проекта, зарезервированная под обход одного канала.
+- estimate_video_cost: Оценивает стоимость обновления комментариев видео.
+- plan_videos_within_budget: Отбирает видео, укладывающиеся в бюджет запуска.
+"""
+import json
+import math
+import threading
+
+from datetime import datetime, timedelta, timezone
+
+from metrics import QUOTA_UNITS, QUOTA_REMAINING
+from utils_database import connect_database
+
+try:
+    from zoneinfo import ZoneInfo
+
+    QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+except Exception:
+    # На системах без базы часовых поясов (tzdata) используем стандартное смещение PST
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+
+# Стоимость вызовов API в единицах квоты
+API_UNIT_COSTS = {
+    "channels.list": 1,
+    "playlistItems.list": 1,
+    "videos.list": 1,
+    "commentThreads.list": 1,
+    "comments.list": 1
+}
+
+
+class QuotaExceededError(Exception):
+    """
+    Квота YouTube Data API проекта исчерпана (по локальному учёту или по ответу API).
+    """
+
+
+def get_quota_project(client_secret_path: str) -> str:
+    """
+    Определяет проект, на который списывается квота, по файлу client_secret.
+
+    Args:
+        client_secret_path (str): Путь к файлу client_secret.json.
+
+    Returns:
+        str: client_id проекта или путь к файлу, если его не удалось прочитать.
+    """
+    try:
+        with open(client_secret_path, 'r', encoding='utf-8') as file:
+            client_secret = json.load(file)
+
+        client_info = client_secret.get('installed') or client_secret.get('web') or {}
+
+        return client_info.get('client_id') or client_secret_path
+    except (OSError, ValueError):
+        return client_secret_path
+
+
+def get_quota_day(now: datetime = None) -> str:
+    """
+    Возвращает дату «суток квоты» (квота обнуляется в полночь по тихоокеанскому времени).
+
+    Args:
+        now (datetime, optional): Момент времени с часовым поясом. По умолчанию текущий.
+
+    Returns:
+        str: Дата в формате YYYY-MM-DD.
+    """
+    now = now or datetime.now(timezone.utc)
+
+    return now.astimezone(QUOTA_TIMEZONE).strftime('%Y-%m-%d')
+
+
+class QuotaTracker:
+    """
+    Счётчик расхода квоты одного проекта за текущие сутки.
+
+    Один экземпляр разделяется всеми каналами, использующими один client_secret,
+    в том числе из разных потоков. Расход по каждому методу API сохраняется в таблицу
+    `quota_usage`, поэтому при следующем запуске в те же сутки учёт продолжается.
+
+    Каналы, обрабатываемые параллельно, планируют обход по `available()` и резервируют
+    запланированные единицы (см. reserve), поэтому не рассчитывают на одну и ту же квоту.
+    """
+
+    def __init__(self, database_path: str, project: str, daily_limit: int, logger):
+        """
+        Args:
+            database_path (str): Путь к базе данных SQLite.
+            project (str): Идентификатор проекта (client_id).
+            daily_limit (int): Дневной лимит квоты проекта в единицах.
+            logger (logging.Logger): Логгер.
+        """
+        self.project = project
+        self.daily_limit = daily_limit
+        self.logger = logger.getChild('quota')
+
+        self._lock = threading.Lock()
+        self._conn = connect_database(database_path, check_same_thread=False)
+        self._day = None
+        self._used = 0
+        self._reserved = 0
+        self._exhausted = False
+
+        self._load_usage()
+
+    def _load_usage(self):
+        """
+        Загружает расход квоты за текущие сутки из базы данных.
+        """
+        self._day = get_quota_day()
+        self._exhausted = False
+
+        cursor = self._conn.execute('''
+            SELECT COALESCE(SUM(units), 0)
+            FROM quota_usage
+            WHERE project = ? AND usage_date = ?
+        ''', (self.project, self._day))
+
+        self._used = cursor.fetchone()[0]
+
+    def _check_day(self):
+        """
+        Сбрасывает учёт при наступлении новых суток квоты.
+        """
+        if get_quota_day() != self._day:
+            self._load_usage()
+
+    def _add_units(self, endpoint: str, units: int):
+        """
+        Увеличивает расход квоты по методу API и сохраняет его в базу данных.
+        """
+        self._used += units
+
+        with self._conn:
+            self._conn.execute('''
+                INSERT INTO quota_usage (project, usage_date, endpoint, units)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(project, usage_date, endpoint) DO UPDATE SET units = units + excluded.units
+            ''', (self.project, self._day, endpoint, units))
+
+    def remaining(self) -> int:
+        """
+        Returns:
+            int: Остаток квоты на текущие сутки в единицах.
+        """
+        with self._lock:
+            self._check_day()
+
+            if self._exhausted:
+                return 0
+
+            return max(0, self.daily_limit - self._used)
+
+    def available(self) -> int:
+        """
+        Returns:
+            int: Остаток квоты на текущие сутки за вычетом единиц, зарезервированных каналами.
+        """
+        with self._lock:
+            self._check_day()
+
+            if self._exhausted:
+                return 0
+
+            return max(0, self.daily_limit - self._used - self._reserved)
+
+    def reserve(self, units: int) -> "QuotaReservation":
+        """
+        Резервирует единицы квоты под запланированный обход канала.
+
+        Args:
+            units (int): Запланированный расход в единицах.
+
+        Returns:
+            QuotaReservation: Резерв (не больше незарезервированного остатка квоты).
+        """
+        with self._lock:
+            self._check_day()
+
+            free_units = 0 if self._exhausted else self.daily_limit - self._used - self._reserved
+            units = max(0, min(units, free_units))
+            self._reserved += units
+
+        return QuotaReservation(self, units)
+
+    def release(self, reservation: "QuotaReservation"):
+        """
+        Возвращает неизрасходованный остаток резерва.
+
+        Args:
+            reservation (QuotaReservation): Резерв канала.
+        """
+        with self._lock:
+            self._reserved -= reservation.units
+            reservation.units = 0
+
+    def ensure_available(self, endpoint: str):
+        """
+        Проверяет, что на вызов метода API хватает квоты.
+
+        Args:
+            endpoint (str): Метод API (например, "commentThreads.list").
+
+        Raises:
+            QuotaExceededError: Если квоты на вызов не осталось.
+        """
+        if self.remaining() < API_UNIT_COSTS.get(endpoint, 1):
+            raise QuotaExceededError(f"Квота проекта {self.project} на {self._day} исчерпана.")
+
+    def charge(self, endpoint: str, reservation: "QuotaReservation" = None):
+        """
+        Списывает стоимость вызова метода API.
+
+        Args:
+            endpoint (str): Метод API (например, "commentThreads.list").
+            reservation (QuotaReservation, optional): Резерв, из которого оплачивается вызов.
+        """
+        units = API_UNIT_COSTS.get(endpoint, 1)
+
+        with self._lock:
+            self._check_day()
+            self._add_units(endpoint, units)
+
+            if reservation is not None:
+                reserved_units = min(units, reservation.units)
+                reservation.units -= reserved_units
+                self._reserved -= reserved_units
+
+            QUOTA_UNITS.inc(units, project=self.project, endpoint=endpoint)
+            QUOTA_REMAINING.set(max(0, self.daily_limit - self._used), project=self.project)
+
+    def mark_exhausted(self):
+        """
+        Отмечает квоту исчерпанной до конца суток (API вернул quotaExceeded).
+
+        Неучтённый остаток списывается на служебный метод "quotaExceeded", чтобы
+        следующий запуск в те же сутки не тратил запросы впустую.
+        """
+        with self._lock:
+            self._check_day()
+
+            if not self._exhausted:
+                self.logger.error("API вернул quotaExceeded для проекта %s.", self.project)
+
+                if self._used < self.daily_limit:
+                    self._add_units("quotaExceeded", self.daily_limit - self._used)
+
+                self._exhausted = True
+
+            QUOTA_REMAINING.set(0, project=self.project)
+
+    def usage_by_endpoint(self) -> dict:
+        """
+        Returns:
+            dict: Расход квоты за текущие сутки по методам API.
+        """
+        with self._lock:
+            cursor = self._conn.execute('''
+                SELECT endpoint, units
+                FROM quota_usage
+                WHERE project = ? AND usage_date = ?
+            ''', (self.project, self._day))
+
+            return dict(cursor.fetchall())
+
+    def close(self):
+        """
+        Закрывает соединение с базой данных.
+        """
+        with self._lock:
+            self._conn.close()
+
+
+class QuotaReservation:
+    """
+    Единицы квоты проекта, зарезервированные под запланированный обход одного канала.
+
+    Передаётся в загрузку комментариев вместо QuotaTracker (поддерживает те же
+    методы проверки и списания): вызовы канала оплачиваются сначала из резерва,
+    а неизрасходованный остаток возвращается методом release.
+    """
+
+    def __init__(self, tracker: QuotaTracker, units: int):
+        """
+        Args:
+            tracker (QuotaTracker): Счётчик квоты проекта.
+            units (int): Зарезервированные единицы.
+        """
+        self.tracker = tracker
+        self.units = units
+
+    def remaining(self) -> int:
+        """
+        Returns:
+            int: Остаток квоты проекта на текущие сутки в единицах.
+        """
+        return self.tracker.remaining()
+
+    def ensure_available(self, endpoint: str):
+        """
+        Проверяет, что на вызов метода API хватает квоты проекта (см. QuotaTracker.ensure_available).
+        """
+        self.tracker.ensure_available(endpoint)
+
+    def charge(self, endpoint: str):
+        """
+        Списывает стоимость вызова метода API, уменьшая резерв.
+        """
+        self.tracker.charge(endpoint, reservation=self)
+
+    def mark_exhausted(self):
+        """
+        Отмечает квоту проекта исчерпанной (см. QuotaTracker.mark_exhausted).
+        """
+        self.tracker.mark_exhausted()
+
+    def release(self):
+        """
+        Возвращает неизрасходованный остаток резерва.
+        """
+        self.tracker.release(self)
+
+
+def estimate_video_cost(comment_count, stored_count, incremental: bool, reply_fetch_ratio: float = 0.0) -> int:
+    """
+    Оценивает количество запросов commentThreads.list и comments.list для обновления видео.
+
+    На странице до 100 веток. В инкрементальном режиме загружаются только страницы
+    с новыми комментариями плюс одна страница, на которой обход останавливается.
+    Ответы ветки загружаются через comments.list, когда меняется их количество, поэтому
+    к оценке добавляется доля `reply_fetch_ratio` от числа новых комментариев.
+
+    Args:
+        comment_count (int | None): Текущее количество комментариев видео.
+        stored_count (int | None): Количество комментариев при прошлой обработке.
+        incremental (bool): Используется ли инкрементальная загрузка.
+        reply_fetch_ratio (float, optional): Сколько запросов comments.list приходится
+            на один новый комментарий. По умолчанию 0 — ответы не загружаются.
+
+    Returns:
+        int: Оценка стоимости в единицах квоты (не меньше 1).
+    """
+    if comment_count is None:
+        return 1
+
+    new_comments = comment_count if stored_count is None else max(0, comment_count - stored_count)
+    reply_requests = math.ceil(new_comments * reply_fetch_ratio)
+
+    if incremental and stored_count is not None:
+        return math.ceil(new_comments / 100) + 1 + reply_requests
+
+    return max(1, math.ceil(comment_count / 100)) + reply_requests
+
+
+def plan_videos_within_budget(video_ids, publish_dates, comment_counts, stored_counts, budget_units, incremental, now=None, reply_fetch_ratio=0.0):
+    """
+    Отбирает видео, обновление которых укладывается в бюджет квоты запуска.
+
+    Видео упорядочиваются по приоритету: чем больше новых комментариев и чем новее
+    видео, тем раньше оно обновляется. Видео, не поместившиеся в бюджет, откладываются
+    на следующий запуск (их сохранённое количество комментариев не меняется, поэтому
+    они снова попадут в список изменившихся).
+
+    Args:
+        video_ids (list): Идентификаторы видео для обновления.
+        publish_dates (dict): Даты публикации видео {идентификатор: дата UTC или None}.
+        comment_counts (dict | None): Текущее количество комментариев видео.
+        stored_counts (dict): Количество комментариев при прошлой обработке.
+        budget_units (int): Бюджет квоты на обновление комментариев.
+        incremental (bool): Используется ли инкрементальная загрузка.
+        now (datetime, optional): Текущий момент (для расчёта возраста видео).
+        reply_fetch_ratio (float, optional): Запросов comments.list на новый комментарий (см. estimate_video_cost).
+
+    Returns:
+        tuple: (список видео для обновления, список отложенных видео, оценка расхода
+            квоты на обновление запланированных видео в единицах).
+    """
+    now = now or datetime.now(timezone.utc)
+    comment_counts = comment_counts or {}
+
+    def get_priority(video_id):
+        comment_count = comment_counts.get(video_id)
+        stored_count = stored_counts.get(video_id)
+
+        if comment_count is None:
+            new_comments = 0
+        elif stored_count is None:
+            new_comments = comment_count
+        else:
+            new_comments = max(0, comment_count - stored_count)
+
+        age_days = 365.0
+        publish_date = publish_dates.get(video_id)
+
+        if publish_date:
+            published = datetime.strptime(publish_date[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+            age_days = max(0.0, (now - published).total_seconds() / 86400)
+
+        return (new_comments + 1) / (age_days + 1)
+
+    planned = []
+    deferred = []
+    spent_units = 0
+
+    for video_id in sorted(video_ids, key=get_priority, reverse=True):
+        cost = estimate_video_cost(
+            comment_count=comment_counts.get(video_id),
+            stored_count=stored_counts.get(video_id),
+            incremental=incremental,
+            reply_fetch_ratio=reply_fetch_ratio
+        )
+
+        if spent_units + cost <= budget_units:
+            planned.append(video_id)
+            spent_units += cost
+        else:
+            deferred.append(video_id)
+
+    return planned, deferred, spent_units
@@ -0,0 +1,163 @@
+"""
+Модуль для ограничения частоты запросов и повторов с экспоненциальным откатом.
+
+Краткое описание:
+- TokenBucketRateLimiter: Потокобезопасный адаптивный ограничитель частоты (token bucket).
+- compute_backoff_delay: Задержка перед повтором (экспоненциальный откат с джиттером).
+- parse_retry_after: Разбирает значение заголовка Retry-After.
+"""
+import time
+import random
+import asyncio
+import threading
+
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+
+class TokenBucketRateLimiter:
+    """
+    Ограничитель частоты запросов по алгоритму token bucket.
+
+    Один экземпляр разделяется всеми местами вызова API, в том числе из разных потоков
+    и из асинхронного кода. Частота адаптивная: при ответах «слишком много запросов»
+    она уменьшается вдвое, при успешных ответах возвращается к заданной с шагом, равным
+    доле максимальной частоты. После снижения частоты следующие ответы 429 в течение
+    `cooldown` секунд (или Retry-After) её не снижают: одновременные запросы одной
+    серии получают 429 почти одновременно, и это одна перегрузка, а не несколько.
+    Заголовок Retry-After приостанавливает выдачу токенов всем вызывающим.
+    """
+
+    def __init__(self, rate: float, capacity: int, min_rate: float = 0.5, recovery_fraction: float = 0.05, cooldown: float = 1.0):
+        """
+        Args:
+            rate (float): Максимальная частота запросов в секунду.
+            capacity (int): Размер «корзины» — сколько запросов можно выполнить подряд без ожидания.
+            min_rate (float, optional): Нижняя граница частоты при замедлении. По умолчанию 0.5.
+            recovery_fraction (float, optional): Доля максимальной частоты, прибавляемая к частоте
+                после каждого успешного запроса. По умолчанию 0.05.
+            cooldown (float, optional): Сколько секунд после снижения частоты ответы 429
+                не снижают её повторно. По умолчанию 1.
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min(min_rate, rate)
+        self.recovery_fraction = recovery_fraction
+        self.cooldown = cooldown
+
+        # Количество ответов «слишком много запросов» и снижений частоты (для отчётов)
+        self.throttled_count = 0
+        self.slowdown_count = 0
+
+        self._lock = threading.Lock()
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._cooldown_until = 0.0
+
+    def reserve(self) -> float:
+        """
+        Резервирует токен на один запрос.
+
+        Returns:
+            float: Сколько секунд вызывающему нужно подождать перед запросом.
+        """
+        with self._lock:
+            now = time.monotonic()
+
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+
+            # При нехватке токенов запрос ставится в очередь за уже зарезервированными
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+            return max(delay, self._paused_until - now)
+
+    def acquire(self):
+        """
+        Ожидает разрешения на запрос (для синхронного кода).
+        """
+        delay = self.reserve()
+
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """
+        Ожидает разрешения на запрос, не блокируя цикл событий.
+        """
+        delay = self.reserve()
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self):
+        """
+        Восстанавливает частоту после успешного запроса.
+        """
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery_fraction)
+
+    def on_throttled(self, retry_after: float = None):
+        """
+        Снижает частоту после ответа «слишком много запросов», если она не снижалась
+        в течение последних `cooldown` секунд.
+
+        Args:
+            retry_after (float, optional): Значение Retry-After в секундах — на это время
+                выдача токенов приостанавливается для всех вызывающих.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.throttled_count += 1
+
+            if now >= self._cooldown_until:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.slowdown_count += 1
+                self._cooldown_until = now + max(self.cooldown, retry_after or 0)
+
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+
+def compute_backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """
+    Вычисляет задержку перед повтором: экспоненциальный откат с полным джиттером.
+
+    Args:
+        attempt (int): Номер неудачной попытки (начиная с 1).
+        base_delay (float): Базовая задержка в секундах.
+        max_delay (float): Максимальная задержка в секундах.
+
+    Returns:
+        float: Задержка в секундах.
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+def parse_retry_after(value) -> float:
+    """
+    Разбирает значение заголовка Retry-After (число секунд или HTTP-дата).
+
+    Args:
+        value (str | None): Значение заголовка.
+
+    Returns:
+        float: Количество секунд ожидания или None, если заголовка нет или он некорректен.
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
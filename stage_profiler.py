@@ -0,0 +1,250 @@
+"""
+Модуль профилирования этапов обработки каналов (`--profile`).
+
+Этапы программы (загрузка страниц, ответы веток, архив, база данных, уведомления
+и т. д.) оборачиваются в `profiler.stage(...)`. Пока профилирование выключено, обёртка
+ничего не измеряет. Со включённым профилированием в конце запуска выводится отчёт
+с этапами, упорядоченными по суммарному времени.
+
+Дополнительно для каждого канала можно снять профиль cProfile (сохраняется общий файл
+pstats) и снимок выделений памяти tracemalloc.
+
+Краткое описание:
+- StageProfiler: Потокобезопасный сбор времени этапов, профилей cProfile и снимков памяти.
+- profiler: Общий экземпляр профилировщика программы.
+"""
+import os
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+
+class StageProfiler:
+    """
+    Сборщик времени этапов программы.
+
+    Этапы выполняются в потоках каналов и в фоновых потоках (например, отправка
+    уведомлений), поэтому сумма времени этапов может превышать длительность запуска.
+    Вложенные этапы учитываются и в родительском этапе.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.cpu = False
+        self.memory = False
+
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._profiles = []
+        self._memory_snapshots = []
+        self._started_at = None
+
+    def start(self, cpu: bool = False, memory: bool = False):
+        """
+        Включает профилирование.
+
+        Args:
+            cpu (bool, optional): Снимать профиль cProfile для каждого канала.
+            memory (bool, optional): Отслеживать выделения памяти через tracemalloc.
+        """
+        self.enabled = True
+        self.cpu = cpu
+        self.memory = memory
+        self._started_at = time.perf_counter()
+
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+
+    def stage(self, name: str):
+        """
+        Возвращает контекстный менеджер, измеряющий время этапа.
+
+        Args:
+            name (str): Название этапа.
+
+        Returns:
+            contextmanager: Обёртка для блока `with`.
+        """
+        if not self.enabled:
+            return nullcontext()
+
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name: str):
+        started = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name: str, seconds: float):
+        """
+        Добавляет измерение этапа.
+
+        Args:
+            name (str): Название этапа.
+            seconds (float): Длительность в секундах.
+        """
+        with self._lock:
+            calls, total, longest = self._stages.get(name, (0, 0.0, 0.0))
+            self._stages[name] = (calls + 1, total + seconds, max(longest, seconds))
+
+    def iterate(self, iterable, name: str):
+        """
+        Отдаёт элементы итератора, измеряя время ожидания каждого из них как этап.
+
+        Args:
+            iterable (iterable): Итератор (например, генератор загружаемых страниц).
+            name (str): Название этапа.
+
+        Yields:
+            Элементы итератора.
+        """
+        if not self.enabled:
+            yield from iterable
+
+            return
+
+        iterator = iter(iterable)
+
+        try:
+            while True:
+                started = time.perf_counter()
+
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self.record(name, time.perf_counter() - started)
+
+                yield item
+        finally:
+            # Закрытие обёртки закрывает и исходный генератор (например, останавливает загрузку)
+            if hasattr(iterator, 'close'):
+                iterator.close()
+
+    @contextmanager
+    def channel(self, label: str, logger=None):
+        """
+        Снимает профиль cProfile и снимок памяти для обработки одного канала.
+
+        cProfile учитывает только поток, в котором выполняется блок `with`
+        (асинхронная загрузка работает в отдельном потоке и в профиль не попадает).
+
+        Args:
+            label (str): Название канала для отчёта.
+            logger (logging.Logger, optional): Логгер.
+        """
+        profile = None
+
+        if self.enabled and self.cpu:
+            profile = cProfile.Profile()
+
+            try:
+                profile.enable()
+            except ValueError as err:
+                # Python 3.12+: одновременно может работать только один профилировщик
+                if logger is not None:
+                    logger.warning("Профиль cProfile канала %s не снят: %s", label, err)
+
+                profile = None
+
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+
+                with self._lock:
+                    self._profiles.append(profile)
+
+            if self.enabled and self.memory and tracemalloc.is_tracing():
+                # Сохраняются только крупнейшие места выделения: сам снимок занимает много памяти
+                top_statistics = [str(statistic) for statistic in tracemalloc.take_snapshot().statistics('lineno')[:10]]
+
+                with self._lock:
+                    self._memory_snapshots.append((label, tracemalloc.get_traced_memory()[1], top_statistics))
+
+    def format_report(self) -> str:
+        """
+        Формирует текстовый отчёт по этапам, упорядоченным по суммарному времени.
+
+        Returns:
+            str: Отчёт.
+        """
+        wall = time.perf_counter() - self._started_at if self._started_at is not None else 0.0
+
+        with self._lock:
+            stages = sorted(self._stages.items(), key=lambda item: item[1][1], reverse=True)
+            memory_snapshots = list(self._memory_snapshots)
+
+        lines = [
+            f"Профиль этапов (длительность запуска {wall:.2f} с)",
+            f"{'Этап':<36} {'Вызовов':>8} {'Всего, с':>10} {'Доля':>7} {'Среднее, мс':>12} {'Макс., мс':>10}"
+        ]
+
+        for name, (calls, total, longest) in stages:
+            share = total / wall * 100 if wall else 0.0
+            lines.append(
+                f"{name:<36} {calls:>8} {total:>10.3f} {share:>6.1f}% {total / calls * 1000:>12.2f} {longest * 1000:>10.2f}"
+            )
+
+        for label, peak, top_statistics in memory_snapshots:
+            lines.append("")
+            lines.append(f"Память после канала {label}: пик выделений {peak / 2 ** 20:.1f} МБ, крупнейшие места выделения:")
+            lines.extend(f"  {statistic}" for statistic in top_statistics)
+
+        return "\n".join(lines)
+
+    def dump(self, output_dir: str, logger) -> tuple:
+        """
+        Выводит отчёт в лог и сохраняет его вместе с общим файлом pstats.
+
+        Args:
+            output_dir (str): Папка для отчёта и файла pstats.
+            logger (logging.Logger): Логгер.
+
+        Returns:
+            tuple: Пути к отчёту и к файлу pstats (None, если профиль cProfile не снимался).
+        """
+        os.makedirs(output_dir, exist_ok=True)
+
+        file_prefix = os.path.join(output_dir, datetime.now().strftime('profile %Y-%m-%d %H-%M-%S'))
+        report = self.format_report()
+        report_path = f"{file_prefix}.txt"
+        pstats_path = None
+
+        with open(report_path, 'w', encoding='utf-8') as file:
+            file.write(report + "\n")
+
+        with self._lock:
+            profiles = list(self._profiles)
+
+        if profiles:
+            stats = pstats.Stats(profiles[0])
+
+            for profile in profiles[1:]:
+                stats.add(profile)
+
+            pstats_path = f"{file_prefix}.pstats"
+            stats.dump_stats(pstats_path)
+
+        logger.info("%s", report)
+        logger.info("Отчёт профилирования сохранён: %s", report_path)
+
+        if pstats_path is not None:
+            logger.info("Профиль cProfile сохранён: %s (python -m pstats \"%s\")", pstats_path, pstats_path)
+
+        return report_path, pstats_path
+
+
+# Общий профилировщик программы (выключен, пока не вызван profiler.start())
+profiler = StageProfiler()
@@ -1,96 +1,202 @@
+import re
+import time
+import asyncio
 import logging
+import threading
+import concurrent.futures
+
+from datetime import timedelta
 
 from telegram import Bot
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+from telegram.request import HTTPXRequest
 
 import config
 
+from metrics import TELEGRAM_MESSAGES, TELEGRAM_QUEUE_SIZE, TELEGRAM_SEND_SECONDS
+from stage_profiler import profiler
+
+
+# Максимальная длина сообщения Telegram (в единицах UTF-16)
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Запас под упоминание пользователя, добавляемое к сообщению при отправке
+MENTION_RESERVE = 64
+
+# Разделитель комментариев в сводном сообщении (не требует экранирования в MarkdownV2)
+DIGEST_SEPARATOR = "\n\n" + "➖" * 8 + "\n\n"
+
+# Сущности MarkdownV2, которые нельзя разрезать: экранированный символ, ссылка [текст](url),
+# выделение внутри строки (*жирный*, _курсив_, ~зачёркнутый~, `код`) или отдельный символ
+MARKDOWN_ENTITY_PATTERN = re.compile(
+    r'\\.|\[(?:\\.|[^\]\\])*\]\((?:\\.|[^)\\])*\)|([*_~`])(?:\\.|(?!\1)[^\\])*\1|.',
+    re.DOTALL
+)
+
+# Символы и escape-последовательности
+MARKDOWN_CHAR_PATTERN = re.compile(r'\\.|.', re.DOTALL)
+
+
+def telegram_length(text: str) -> int:
+    """
+    Возвращает длину текста так, как её считает Telegram (в единицах UTF-16).
+
+    Args:
+        text (str): Текст.
+
+    Returns:
+        int: Длина текста.
+    """
+    return len(text.encode('utf-16-le')) // 2
+
 
-async def send_message_to_chat(
-    message,
-    main_logger,
-    pin_message=False,
-    mention_user=False,
-    parse_mode='HTML',
-    telegram_bot_token=config.telegram_bot_token,
-    chat_id=config.chat_id,
-    user_id=config.user_id
-):
+def iter_markdown_entities(line: str, limit: int):
     """
-    Отправляет сообщение в чат Telegram.
+    Разбирает строку MarkdownV2 на сущности, которые нельзя разрезать.
 
-    Если параметр `mention_user` установлен в `True`, добавляется упоминание пользователя в сообщении.
-    Если параметр `pin_message` установлен в `True`, сообщение будет закреплено.
+    Сущность — экранированный символ, ссылка `[текст](url)`, выделение внутри
+    строки (например, `*текст*`) или отдельный символ. Сущность длиннее `limit`
+    не может целиком попасть ни в одну часть и возвращается по символам
+    (экранирование при этом не разрывается).
 
     Args:
-        message (str): Текст сообщения.
-        main_logger (logging.Logger): Основной логгер.
-        pin_message (bool, optional): Если True, сообщение будет закреплено. По умолчанию False.
-        mention_user (bool, optional): Если True, добавляется упоминание пользователя. По умолчанию False.
-        parse_mode (str, optional): Режим форматирования текста (HTML или Markdown). По умолчанию 'HTML'.
-        telegram_bot_token (str, optional): Токен бота Telegram. По умолчанию берется из конфигурации.
-        chat_id (str, optional): Идентификатор чата для отправки сообщения. По умолчанию берется из конфигурации.
-        user_id (str, optional): Идентификатор пользователя для упоминания. По умолчанию берется из конфигурации.
-
-    Raises:
-        Exception: Если возникает ошибка при отправке сообщения.
+        line (str): Строка сообщения.
+        limit (int): Максимальная длина сущности.
+
+    Yields:
+        tuple: Текст сущности и его длина.
     """
-    logging.getLogger("telegram").setLevel(logging.WARNING)
-    logging.getLogger("httpx").setLevel(logging.WARNING)
-    logging.getLogger("urllib3").setLevel(logging.WARNING)
-    logging.getLogger("asyncio").setLevel(logging.WARNING)
-    logging.getLogger("httpcore").setLevel(logging.WARNING)
+    for match in MARKDOWN_ENTITY_PATTERN.finditer(line):
+        entity = match.group()
+        entity_length = telegram_length(entity)
+
+        if entity_length <= limit:
+            yield entity, entity_length
+
+            continue
+
+        for char in MARKDOWN_CHAR_PATTERN.findall(entity):
+            yield char, telegram_length(char)
+
+
+def split_markdown_line(line: str, limit: int) -> list:
+    """
+    Делит слишком длинную строку MarkdownV2 на части не длиннее `limit`.
+
+    Строка делится после пробела, а если в части его нет — между целыми сущностями
+    (см. iter_markdown_entities), поэтому разрез не попадает внутрь ссылки или
+    escape-последовательности. Продолжение цитаты снова начинается с "> ".
+
+    Args:
+        line (str): Строка сообщения.
+        limit (int): Максимальная длина части.
 
-    logger = main_logger.getChild('telegram_notification')
-
-    try:
-        bot = Bot(token=telegram_bot_token)
-
-        if mention_user and user_id:
-            message = f"{message}[\\.](tg://user?id={user_id})"
-
-        sent_message = await bot.send_message(
-            chat_id=chat_id,
-            text=message,
-            parse_mode=parse_mode
-        )
-
-        if pin_message:
-            await bot.pin_chat_message(chat_id=chat_id, message_id=sent_message.message_id)
-    except Exception as err:
-        logger.error("Неизвестная ошибка при открытии URL: %s", err)
-
-
-async def send_message_to_group(
-    message,
-    main_logger,
-    thread_id=None,
-    pin_message=False,
-    mention_user=False,
-    parse_mode='HTML',
-    telegram_bot_token=config.telegram_bot_token,
-    chat_id=config.chat_id,
-    user_id=config.user_id
-):
+    Returns:
+        list: Части строки.
     """
-    Отправляет сообщение в группу Telegram, с возможностью выбора тему (топик).
+    prefix = "> " if line.startswith(">") else ""
+    prefix_length = telegram_length(prefix)
 
-    Если параметр `mention_user` установлен в `True`, добавляется упоминание пользователя в сообщении.
-    Если параметр `pin_message` установлен в `True`, сообщение будет закреплено.
-    Если параметр `thread_id` указан, сообщение будет отправлено в определенныую тему.
+    parts = []
+    entities = []
+    length = 0
+    # Позиция после последнего пробела, перед которым в части уже есть текст
+    break_index = 0
+    has_text = False
+
+    for entity, entity_length in iter_markdown_entities(line, limit - prefix_length):
+        if entities and length + entity_length > limit:
+            head, tail = entities, []
+
+            if break_index:
+                tail_length = sum(tail_entity_length for _, tail_entity_length in entities[break_index:])
+
+                if prefix_length + tail_length + entity_length <= limit:
+                    head, tail = entities[:break_index], entities[break_index:]
+
+            parts.append("".join(head_entity for head_entity, _ in head))
+
+            entities = ([(prefix, prefix_length)] if prefix else []) + tail
+            length = sum(tail_entity_length for _, tail_entity_length in entities)
+            break_index = 0
+            has_text = bool(tail)
+
+        if entity.isspace():
+            if has_text:
+                break_index = len(entities) + 1
+        elif entities or entity != ">":
+            has_text = True
+
+        entities.append((entity, entity_length))
+        length += entity_length
+
+    if entities:
+        parts.append("".join(entity for entity, _ in entities))
+
+    return parts
+
+
+def pack_telegram_messages(blocks: list, limit: int = TELEGRAM_MESSAGE_LIMIT - MENTION_RESERVE) -> list:
+    """
+    Упаковывает готовые блоки MarkdownV2 (например, отформатированные комментарии)
+    в минимальное количество сообщений не длиннее `limit`.
+
+    Блоки не разрываются, пока помещаются в одно сообщение целиком. Блок длиннее
+    лимита делится по границам строк, а слишком длинная строка — с помощью
+    split_markdown_line, поэтому экранирование и разметка строк не ломаются.
 
     Args:
-        message (str): Текст сообщения.
-        main_logger (logging.Logger): Основной логгер.
-        thread_id (str, optional): Идентификатор потока для отправки сообщения. По умолчанию None.
-        pin_message (bool, optional): Если True, сообщение будет закреплено. По умолчанию False.
-        mention_user (bool, optional): Если True, добавляется упоминание пользователя. По умолчанию False.
-        parse_mode (str, optional): Режим форматирования текста (HTML или Markdown). По умолчанию 'HTML'.
-        telegram_bot_token (str, optional): Токен бота Telegram. По умолчанию берется из конфигурации.
-        chat_id (str, optional): Идентификатор чата для отправки сообщения. По умолчанию берется из конфигурации.
-        user_id (str, optional): Идентификатор пользователя для упоминания. По умолчанию берется из конфигурации.
-
-    Raises:
-        Exception: Если возникает ошибка при отправке сообщения.
+        blocks (list): Отформатированные блоки в формате MarkdownV2.
+        limit (int, optional): Максимальная длина сообщения.
+
+    Returns:
+        list: Тексты сообщений.
+    """
+    pieces = []
+
+    for block in blocks:
+        if telegram_length(block) <= limit:
+            pieces.append(block)
+
+            continue
+
+        # Блок не помещается в сообщение: делим по строкам, соединяя их обратно переводом строки
+        chunk = ""
+
+        for line in block.split("\n"):
+            for part in split_markdown_line(line, limit) if telegram_length(line) > limit else [line]:
+                candidate = f"{chunk}\n{part}" if chunk else part
+
+                if telegram_length(candidate) > limit:
+                    pieces.append(chunk)
+                    candidate = part
+
+                chunk = candidate
+
+        if chunk:
+            pieces.append(chunk)
+
+    messages = []
+    current = ""
+
+    for piece in pieces:
+        candidate = f"{current}{DIGEST_SEPARATOR}{piece}" if current else piece
+
+        if current and telegram_length(candidate) > limit:
+            messages.append(current)
+            candidate = piece
+
+        current = candidate
+
+    if current:
+        messages.append(current)
+
+    return messages
+
+
+def quiet_telegram_loggers():
+    """
+    Понижает уровень логирования библиотек Telegram и HTTP-клиента до WARNING.
     """
     logging.getLogger("telegram").setLevel(logging.WARNING)
     logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -98,29 +204,291 @@ async def send_message_to_group(
     logging.getLogger("asyncio").setLevel(logging.WARNING)
     logging.getLogger("httpcore").setLevel(logging.WARNING)
 
-    logger = main_logger.getChild('telegram_notification')
 
-    try:
-        bot = Bot(token=telegram_bot_token)
+class TelegramNotifier:
+    """
+    Долгоживущий отправитель уведомлений в Telegram.
+
+    На всё время работы программы создаётся один поток с циклом событий, один объект Bot
+    и один пул HTTP-соединений. Сообщения из любых потоков ставятся в очередь методом
+    `send` и отправляются по порядку с соблюдением ограничений Telegram: не чаще одного
+    сообщения в `min_interval` секунд в чат и с ожиданием, указанным в ответе RetryAfter.
+
+    Если подключиться к Telegram при запуске не удалось, `start` возвращает False, а `send`
+    сразу возвращает неуспешный результат: уведомления остаются в очереди notification_outbox.
+    """
+
+    # Завершающий элемент очереди
+    _STOP = object()
+
+    def __init__(
+        self,
+        main_logger,
+        telegram_bot_token=config.telegram_bot_token,
+        chat_id=config.chat_id,
+        user_id=config.user_id,
+        thread_id=config.thread_id,
+        min_interval=None,
+        max_attempts=5
+    ):
+        """
+        Args:
+            main_logger (logging.Logger): Основной логгер.
+            telegram_bot_token (str, optional): Токен бота Telegram. По умолчанию берется из конфигурации.
+            chat_id (str, optional): Идентификатор чата. По умолчанию берется из конфигурации.
+            user_id (str, optional): Идентификатор пользователя для упоминания. По умолчанию берется из конфигурации.
+            thread_id (int, optional): Идентификатор темы группы. По умолчанию берется из конфигурации.
+            min_interval (float, optional): Минимальный интервал между сообщениями в чат в секундах.
+                По умолчанию 1 секунда для личного чата и 3 секунды для группы (20 сообщений в минуту).
+            max_attempts (int, optional): Количество попыток отправки одного сообщения
+                и подключения к Telegram при запуске. По умолчанию 5.
+        """
+        self.logger = main_logger.getChild('telegram_notification')
+        self.telegram_bot_token = telegram_bot_token
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.max_attempts = max_attempts
+
+        # В личный чат (user_id совпадает с chat_id) темы не используются
+        is_private_chat = bool(user_id) and str(user_id) == str(chat_id)
+        self.thread_id = None if is_private_chat else thread_id
+
+        if min_interval is None:
+            min_interval = 3.0 if str(chat_id).startswith('-') else 1.0
+
+        self.min_interval = min_interval
+
+        self._loop = None
+        self._queue = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._start_error = None
+        self._closed = False
+        self._last_sent_at = float('-inf')
+
+    def start(self) -> bool:
+        """
+        Запускает поток отправки и ждёт подключения к Telegram.
+
+        Returns:
+            bool: True, если отправитель готов к отправке сообщений.
+        """
+        quiet_telegram_loggers()
+
+        self._thread = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+        if self._start_error is not None:
+            self.logger.error("Не удалось подключиться к Telegram: %s", self._start_error)
+            self._thread.join()
+            self._thread = None
 
-        if mention_user and user_id:
-            message = f"{message}[\\.](tg://user?id={user_id})"
+            return False
 
-        if thread_id:
-            sent_message = await bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                message_thread_id=thread_id,
-                parse_mode=parse_mode
-            )
+        return True
+
+    def is_running(self) -> bool:
+        """
+        Returns:
+            bool: True, если поток отправки работает и принимает сообщения.
+        """
+        return self._thread is not None and self._loop is not None and not self._loop.is_closed()
+
+    def send(self, message, parse_mode='MarkdownV2', mention_user=False, pin_message=False, depends_on=None):
+        """
+        Ставит сообщение в очередь на отправку. Безопасно для вызова из любого потока.
+
+        Args:
+            message (str): Текст сообщения.
+            parse_mode (str, optional): Режим форматирования текста. По умолчанию 'MarkdownV2'.
+            mention_user (bool, optional): Добавить упоминание пользователя. По умолчанию False.
+            pin_message (bool, optional): Закрепить сообщение. По умолчанию False.
+            depends_on (concurrent.futures.Future, optional): Результат отправки предыдущего
+                сообщения этого отправителя: если Telegram его не принял, сообщение не отправляется.
+
+        Returns:
+            concurrent.futures.Future: Результат отправки — True, если Telegram принял сообщение.
+        """
+        if mention_user and self.user_id:
+            message = f"{message}[\\.](tg://user?id={self.user_id})"
+
+        result = concurrent.futures.Future()
+        item = (message, parse_mode, pin_message, depends_on, result)
+
+        try:
+            if not self.is_running():
+                raise RuntimeError("поток отправки не запущен")
+
+            self._loop.call_soon_threadsafe(self._put, item)
+        except RuntimeError as err:
+            # Цикл событий остановлен: сообщение не будет отправлено
+            self.logger.error("Сообщение не поставлено в очередь Telegram: %s", err)
+            result.set_result(False)
+
+        return result
+
+    def queue_size(self) -> int:
+        """
+        Returns:
+            int: Количество сообщений, ожидающих отправки.
+        """
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stop(self):
+        """
+        Дожидается отправки всех сообщений из очереди и останавливает поток.
+        """
+        if self._thread is None:
+            return
+
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, self._STOP)
+        except RuntimeError:
+            # Цикл событий уже завершился (например, после ошибки в потоке отправки)
+            pass
+
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        asyncio.run(self._consume())
+
+    def _put(self, item):
+        # Выполняется в потоке цикла событий: после остановки обработки очереди сообщение не отправляется
+        if self._closed:
+            item[-1].set_result(False)
         else:
-            sent_message = await bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                parse_mode=parse_mode
-            )
-
-        if pin_message:
-            await bot.pin_chat_message(chat_id=chat_id, message_id=sent_message.message_id)
-    except Exception as err:
-        logger.error("Неизвестная ошибка при открытии URL: %s", err)
+            self._queue.put_nowait(item)
+
+    async def _consume(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+
+        try:
+            bot = Bot(token=self.telegram_bot_token, request=HTTPXRequest(connection_pool_size=4))
+
+            await self._initialize_bot(bot)
+        except Exception as err:
+            self._start_error = err
+            self._ready.set()
+
+            return
+
+        self._ready.set()
+
+        try:
+            while True:
+                item = await self._queue.get()
+
+                if item is self._STOP:
+                    break
+
+                message, parse_mode, pin_message, depends_on, result = item
+                TELEGRAM_QUEUE_SIZE.set(self._queue.qsize())
+
+                # Очередь обрабатывается по порядку, поэтому предыдущее сообщение уже отправлено
+                if depends_on is not None and not depends_on.result():
+                    result.set_result(False)
+
+                    continue
+
+                delivered = await self._send_with_retries(bot, message, parse_mode, pin_message)
+                TELEGRAM_MESSAGES.inc(result="delivered" if delivered else "failed")
+
+                result.set_result(delivered)
+        except Exception as err:
+            self.logger.error("Поток отправки сообщений в Telegram остановлен из-за ошибки: %s", err)
+        finally:
+            # Сообщения, оставшиеся в очереди, не будут отправлены
+            self._closed = True
+
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+
+                if item is not self._STOP:
+                    item[-1].set_result(False)
+
+            try:
+                await bot.shutdown()
+            except Exception as err:
+                self.logger.warning("Ошибка при закрытии соединения с Telegram: %s", err)
+
+    async def _initialize_bot(self, bot):
+        """
+        Подключается к Telegram (запрос getMe), повторяя попытку при сетевых ошибках.
+
+        Args:
+            bot (telegram.Bot): Бот Telegram.
+
+        Raises:
+            TelegramError: Если подключиться не удалось после всех попыток или токен неверен.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await bot.initialize()
+
+                return
+            except (BadRequest, Forbidden):
+                raise
+            except TelegramError as err:
+                if attempt == self.max_attempts:
+                    raise
+
+                self.logger.warning("Ошибка подключения к Telegram (попытка %d/%d): %s", attempt, self.max_attempts, err)
+                await asyncio.sleep(2 ** attempt)
+
+    async def _wait_for_slot(self):
+        """
+        Выдерживает минимальный интервал между сообщениями в чат.
+        """
+        delay = self._last_sent_at + self.min_interval - time.monotonic()
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _send_with_retries(self, bot, message, parse_mode, pin_message) -> bool:
+        for attempt in range(1, self.max_attempts + 1):
+            with profiler.stage("telegram.wait_for_slot"):
+                await self._wait_for_slot()
+
+            try:
+                with TELEGRAM_SEND_SECONDS.time(), profiler.stage("telegram.send_message"):
+                    sent_message = await bot.send_message(
+                        chat_id=self.chat_id,
+                        text=message,
+                        message_thread_id=self.thread_id or None,
+                        parse_mode=parse_mode
+                    )
+
+                self._last_sent_at = time.monotonic()
+            except RetryAfter as err:
+                retry_after = err.retry_after
+                retry_after = retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+
+                self.logger.warning("Telegram ограничил частоту отправки, ждём %.0f с.", retry_after)
+                self._last_sent_at = time.monotonic() + retry_after
+            except (BadRequest, Forbidden) as err:
+                self.logger.error("Telegram отклонил сообщение: %s", err)
+
+                return False
+            except TelegramError as err:
+                self.logger.warning("Ошибка отправки сообщения в Telegram (попытка %d/%d): %s", attempt, self.max_attempts, err)
+                self._last_sent_at = time.monotonic() + 2 ** attempt
+            except Exception as err:
+                self.logger.error("Неизвестная ошибка при отправке сообщения в Telegram: %s", err)
+
+                return False
+            else:
+                # Сообщение уже принято: ошибка закрепления не должна приводить к повторной отправке
+                if pin_message:
+                    try:
+                        await bot.pin_chat_message(chat_id=self.chat_id, message_id=sent_message.message_id)
+                    except Exception as err:
+                        self.logger.warning("Не удалось закрепить сообщение в Telegram: %s", err)
+
+                return True
+
+        self.logger.error("Не удалось отправить сообщение в Telegram после %d попыток.", self.max_attempts)
+
+        return False
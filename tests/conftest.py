@@ -0,0 +1,27 @@
+import os
+import sys
+import logging
+
+import pytest
+
+
+# Модули проекта лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger("tests")
+
+
+@pytest.fixture
+def database(tmp_path, logger):
+    """
+    Путь к новой базе данных SQLite с применёнными миграциями.
+    """
+    from init_database import init_database
+
+    database_path = str(tmp_path / "comments.db")
+    init_database(database_path=database_path, main_logger=logger)
+
+    return database_path
@@ -0,0 +1,43 @@
+import copy
+import json
+import argparse
+
+from comments_archive import ThreadHashCache, append_threads_to_archive, get_content_hash, read_archived_thread
+from fake_youtube_api import FakeYouTubeData
+from migrate_comments_archive import migrate_channel_folder
+from utils_database import connect_database
+
+
+def test_migrated_old_version_does_not_replace_latest(tmp_path, database, logger):
+    archive_dir = str(tmp_path / "archive")
+    source_dir = tmp_path / "json" / "channel"
+    source_dir.mkdir(parents=True)
+
+    data = FakeYouTubeData(videos=1, threads=1, replies=3)
+    latest_thread = data.build_thread(channel_index=0, video_number=0, thread_number=0)
+
+    # Прежняя версия ветки (до последнего ответа), оставшаяся в файле json
+    old_thread = copy.deepcopy(latest_thread)
+    old_thread["replies"]["comments"].pop()
+    (source_dir / "channel - video - thread - 2024-01-01 00-00-00.json").write_text(json.dumps(old_thread), encoding="utf-8")
+
+    conn = connect_database(database)
+
+    try:
+        append_threads_to_archive(conn, [latest_thread], archive_dir, "gzip", logger)
+
+        args = argparse.Namespace(archive_dir=archive_dir, compression="gzip", batch_size=100, delete_source=False)
+        stats = migrate_channel_folder(conn, str(source_dir), args, logger)
+
+        stored_hash = conn.execute('SELECT content_hash FROM thread_hashes').fetchone()[0]
+        archived_thread = read_archived_thread(conn, archive_dir, latest_thread["id"])
+
+        # Следующий обход с той же версией ветки ничего не дописывает
+        written = append_threads_to_archive(conn, [latest_thread], archive_dir, "gzip", logger, hash_cache=ThreadHashCache(conn))
+    finally:
+        conn.close()
+
+    assert stats["written"] == 1
+    assert stored_hash == get_content_hash(latest_thread)
+    assert archived_thread == latest_thread
+    assert written == 0
@@ -0,0 +1,29 @@
+import copy
+
+from comments_archive import get_content_hash
+from fake_youtube_api import FakeYouTubeData
+
+
+def build_thread() -> dict:
+    data = FakeYouTubeData(videos=1, threads=1, replies=3)
+
+    return data.build_thread(channel_index=0, video_number=0, thread_number=0)
+
+
+def test_reply_counters_do_not_change_hash():
+    thread = build_thread()
+    liked_thread = copy.deepcopy(thread)
+
+    for reply in liked_thread["replies"]["comments"]:
+        reply["etag"] = "changed"
+        reply["snippet"]["likeCount"] += 10
+
+    assert get_content_hash(liked_thread) == get_content_hash(thread)
+
+
+def test_reply_edit_changes_hash():
+    thread = build_thread()
+    edited_thread = copy.deepcopy(thread)
+    edited_thread["replies"]["comments"][0]["snippet"]["textOriginal"] = "edited"
+
+    assert get_content_hash(edited_thread) != get_content_hash(thread)
@@ -0,0 +1,65 @@
+import httplib2
+
+from googleapiclient.errors import HttpError
+
+import config
+import utils_youtube
+
+from utils_youtube import execute_request
+
+
+class FakeClock:
+    """
+    Часы, которые идут только во время запроса и пауз перед повтором.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+class FakeHistogram:
+    def __init__(self):
+        self.values = []
+
+    def observe(self, value, **labels):
+        self.values.append(value)
+
+
+class FailingOnceRequest:
+    def __init__(self, clock):
+        self.clock = clock
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        self.clock.now += 0.25
+
+        if self.calls == 1:
+            raise HttpError(httplib2.Response({"status": 503}), b"backend error")
+
+        return {"items": []}
+
+
+def test_request_latency_excludes_retry_backoff(monkeypatch):
+    clock = FakeClock()
+    histogram = FakeHistogram()
+
+    monkeypatch.setattr(utils_youtube, "time", clock)
+    monkeypatch.setattr(utils_youtube, "API_REQUEST_SECONDS", histogram)
+    monkeypatch.setattr(config, "youtube_max_attempts", 3)
+    monkeypatch.setattr(config, "youtube_backoff_base_seconds", 5.0)
+
+    request = FailingOnceRequest(clock)
+
+    assert execute_request(request, "commentThreads.list") == {"items": []}
+    assert request.calls == 2
+    assert clock.sleeps and clock.sleeps[0] > 0
+    assert histogram.values == [0.25, 0.25]
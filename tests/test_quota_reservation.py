@@ -0,0 +1,57 @@
+from quota_scheduler import QuotaTracker, estimate_video_cost, plan_videos_within_budget
+
+
+def make_tracker(database, logger, daily_limit=100):
+    return QuotaTracker(database_path=database, project="project", daily_limit=daily_limit, logger=logger)
+
+
+def test_parallel_channels_do_not_plan_the_same_quota(database, logger):
+    tracker = make_tracker(database, logger)
+
+    try:
+        first = tracker.reserve(70)
+        second = tracker.reserve(70)
+
+        assert (first.units, second.units) == (70, 30)
+        assert tracker.available() == 0
+        assert tracker.remaining() == 100
+    finally:
+        tracker.close()
+
+
+def test_reserved_requests_are_charged_once_and_remainder_released(database, logger):
+    tracker = make_tracker(database, logger)
+
+    try:
+        reservation = tracker.reserve(10)
+
+        for _ in range(4):
+            reservation.charge("commentThreads.list")
+
+        assert reservation.units == 6
+        assert (tracker.remaining(), tracker.available()) == (96, 90)
+
+        reservation.release()
+
+        assert tracker.available() == 96
+    finally:
+        tracker.close()
+
+
+def test_video_cost_includes_reply_fetches():
+    assert estimate_video_cost(comment_count=1300, stored_count=300, incremental=True) == 11
+    assert estimate_video_cost(comment_count=1300, stored_count=300, incremental=True, reply_fetch_ratio=0.1) == 111
+
+
+def test_plan_returns_planned_units():
+    planned, deferred, planned_units = plan_videos_within_budget(
+        video_ids=["a", "b"],
+        publish_dates={},
+        comment_counts={"a": 250, "b": 250},
+        stored_counts={},
+        budget_units=7,
+        incremental=False,
+        reply_fetch_ratio=0.01
+    )
+
+    assert (len(planned), len(deferred), planned_units) == (1, 1, 6)
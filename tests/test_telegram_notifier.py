@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+from telegram.error import NetworkError
+
+import telegram_notification
+
+from telegram_notification import TelegramNotifier
+
+
+class FakeBot:
+    initialize_error = None
+
+    def __init__(self, token, request):
+        self.sent = []
+
+    async def initialize(self):
+        if self.initialize_error is not None:
+            raise self.initialize_error
+
+    async def shutdown(self):
+        pass
+
+    async def send_message(self, chat_id, text, message_thread_id, parse_mode):
+        self.sent.append(text)
+
+        return SimpleNamespace(message_id=len(self.sent))
+
+
+def make_notifier(logger):
+    return TelegramNotifier(main_logger=logger, telegram_bot_token="token", chat_id="1", user_id="1", min_interval=0, max_attempts=2)
+
+
+def test_notifier_survives_connection_error_at_start(monkeypatch, logger):
+    monkeypatch.setattr(telegram_notification, "Bot", FakeBot)
+    monkeypatch.setattr(FakeBot, "initialize_error", NetworkError("offline"))
+    monkeypatch.setattr(telegram_notification.asyncio, "sleep", _no_sleep)
+
+    notifier = make_notifier(logger)
+
+    assert notifier.start() is False
+    assert notifier.send("сообщение").result(timeout=5) is False
+
+    notifier.stop()
+
+
+def test_notifier_sends_after_successful_start(monkeypatch, logger):
+    monkeypatch.setattr(telegram_notification, "Bot", FakeBot)
+
+    notifier = make_notifier(logger)
+
+    assert notifier.start() is True
+    assert notifier.send("сообщение").result(timeout=5) is True
+
+    notifier.stop()
+
+    assert notifier.send("после остановки").result(timeout=5) is False
+
+
+async def _no_sleep(delay):
+    pass
@@ -0,0 +1,48 @@
+import copy
+
+import config
+import youtube_chanells_comments_fetcher as fetcher
+
+from comments_archive import ThreadHashCache, read_archived_thread
+from fake_youtube_api import FakeYouTubeData
+from utils_database import connect_database
+
+
+def test_unchanged_busy_thread_is_archived_once(tmp_path, monkeypatch, database, logger):
+    archive_dir = str(tmp_path / "archive")
+
+    monkeypatch.setattr(fetcher, "logger", logger, raising=False)
+    monkeypatch.setattr(config, "save_comments_data_to_json", True)
+    monkeypatch.setattr(config, "send_notification_on_telegram", False)
+    monkeypatch.setattr(config, "path_to_comments_archive_dir", archive_dir)
+
+    # Ветка с 8 ответами, из которых commentThreads.list возвращает только 5
+    data = FakeYouTubeData(videos=1, threads=1, replies=8, inline_replies=5)
+    thread = data.build_thread(channel_index=0, video_number=0, thread_number=0)
+    fetched_threads = []
+
+    def reply_fetcher(thread_ids):
+        fetched_threads.extend(thread_ids)
+
+        return {
+            thread_id: data.handle_comments({"parentId": thread_id, "maxResults": 100}, 0)["items"]
+            for thread_id in thread_ids
+        }
+
+    conn = connect_database(database)
+    hash_cache = ThreadHashCache(conn)
+
+    try:
+        for _ in range(2):
+            fetcher.process_comments_page(
+                conn, [copy.deepcopy(thread)], "Канал", hash_cache=hash_cache, reply_fetcher=reply_fetcher
+            )
+
+        archived_versions = conn.execute('SELECT COUNT(*) FROM archive_index').fetchone()[0]
+        archived_thread = read_archived_thread(conn, archive_dir, thread["id"])
+    finally:
+        conn.close()
+
+    assert fetched_threads == [thread["id"]]
+    assert archived_versions == 1
+    assert len(archived_thread["replies"]["comments"]) == 8
@@ -0,0 +1,253 @@
+"""
+Модуль со вспомогательными функциями для работы с базой данных.
+
+Краткое описание функций:
+- connect_database: Открывает соединение с базой данных с рекомендуемыми настройками.
+- increment_channel_run_count: Увеличивает и возвращает счётчик запусков обработки канала.
+- is_full_crawl_run: Определяет, нужно ли в этом запуске обходить все видео канала.
+- get_stored_comment_counts: Возвращает сохранённое количество комментариев по видео канала.
+- save_video_comment_count: Сохраняет количество комментариев видео после его обработки.
+- get_video_comments_watermark: Возвращает самую позднюю дату сохранённых комментариев видео.
+- get_channel_video_ids: Возвращает идентификаторы видео канала из каталога.
+- save_channel_videos: Добавляет видео канала в каталог.
+- get_channel_video_publish_dates: Возвращает даты публикации видео канала.
+- get_thread_reply_counts: Возвращает количество ответов веток при последней загрузке ответов.
+"""
+import sqlite3
+
+from datetime import datetime, timezone
+
+
+def connect_database(database_path: str, timeout: float = 30, check_same_thread: bool = True):
+    """
+    Открывает соединение с базой данных и применяет настройки соединения.
+
+    Режим журнала WAL включается один раз в init_database и сохраняется в файле базы;
+    здесь задаются настройки, действующие только для текущего соединения.
+
+    Args:
+        database_path (str): Путь к файлу базы данных SQLite.
+        timeout (float, optional): Время ожидания блокировки в секундах. По умолчанию 30.
+        check_same_thread (bool, optional): Запрещать использование соединения из других потоков.
+
+    Returns:
+        sqlite3.Connection: Соединение с базой данных.
+    """
+    conn = sqlite3.connect(database_path, timeout=timeout, check_same_thread=check_same_thread)
+
+    # В режиме WAL синхронизация на каждой транзакции избыточна: NORMAL сохраняет
+    # целостность базы и синхронизирует файл только при контрольных точках
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    conn.execute('PRAGMA cache_size = -65536')
+
+    return conn
+
+
+def increment_channel_run_count(conn, channel_id: str) -> int:
+    """
+    Увеличивает счётчик запусков обработки канала и возвращает его новое значение.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        channel_id (str): Идентификатор канала.
+
+    Returns:
+        int: Номер текущего запуска (начиная с 1).
+    """
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        INSERT INTO channel_runs (channel_id, run_count)
+        VALUES (?, 1)
+        ON CONFLICT(channel_id) DO UPDATE SET run_count = run_count + 1
+    ''', (channel_id,))
+
+    cursor.execute('''
+        SELECT run_count
+        FROM channel_runs
+        WHERE channel_id = ?
+    ''', (channel_id,))
+
+    run_count = cursor.fetchone()[0]
+    conn.commit()
+
+    return run_count
+
+
+def is_full_crawl_run(run_count: int, full_crawl_every_n_runs: int) -> bool:
+    """
+    Определяет, нужно ли в текущем запуске обходить все видео канала без учёта статистики.
+
+    Args:
+        run_count (int): Номер текущего запуска.
+        full_crawl_every_n_runs (int): Период полного обхода. 0 или меньше — полный обход отключён.
+
+    Returns:
+        bool: True, если текущий запуск должен быть полным.
+    """
+    if full_crawl_every_n_runs <= 0:
+        return False
+
+    return run_count % full_crawl_every_n_runs == 0
+
+
+def get_stored_comment_counts(conn, channel_id: str) -> dict:
+    """
+    Возвращает последнее сохранённое количество комментариев для видео канала.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        channel_id (str): Идентификатор канала.
+
+    Returns:
+        dict: Словарь {идентификатор видео: количество комментариев}.
+    """
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT youtube_video_id, comment_count
+        FROM video_statistics
+        WHERE channel_id = ?
+    ''', (channel_id,))
+
+    return dict(cursor.fetchall())
+
+
+def save_video_comment_count(conn, channel_id: str, video_id: str, comment_count):
+    """
+    Сохраняет количество комментариев видео, с которым оно было обработано.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        channel_id (str): Идентификатор канала.
+        video_id (str): Идентификатор видео.
+        comment_count (int | None): Количество комментариев (None, если комментарии отключены).
+    """
+    checked_date = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    conn.execute('''
+        INSERT INTO video_statistics (youtube_video_id, channel_id, comment_count, checked_date)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(youtube_video_id) DO UPDATE SET
+            channel_id = excluded.channel_id,
+            comment_count = excluded.comment_count,
+            checked_date = excluded.checked_date
+    ''', (video_id, channel_id, comment_count, checked_date))
+
+    conn.commit()
+
+
+def get_video_comments_watermark(conn, video_id: str):
+    """
+    Возвращает самую позднюю дату публикации или изменения комментария, сохранённого для видео.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        video_id (str): Идентификатор видео.
+
+    Returns:
+        str: Дата в формате UTC или None, если комментариев видео ещё нет в базе.
+    """
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT MAX(comment_rows.publish_date), MAX(comment_rows.updated_date)
+        FROM comment_rows
+        JOIN dim_videos ON dim_videos.id = comment_rows.video_key
+        WHERE dim_videos.youtube_video_id = ?
+    ''', (video_id,))
+
+    dates = [date for date in cursor.fetchone() if date]
+
+    return max(dates) if dates else None
+
+
+def get_channel_video_ids(conn, channel_id: str) -> list:
+    """
+    Возвращает идентификаторы видео канала из каталога, от новых к старым.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        channel_id (str): Идентификатор канала.
+
+    Returns:
+        list: Список идентификаторов видео.
+    """
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT youtube_video_id
+        FROM videos
+        WHERE channel_id = ?
+        ORDER BY publish_date IS NULL, publish_date DESC
+    ''', (channel_id,))
+
+    return [row[0] for row in cursor.fetchall()]
+
+
+def save_channel_videos(conn, channel_id: str, videos: list):
+    """
+    Добавляет видео канала в каталог. Уже известные видео обновляют дату публикации.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        channel_id (str): Идентификатор канала.
+        videos (list): Список кортежей (идентификатор видео, дата публикации).
+    """
+    conn.executemany('''
+        INSERT INTO videos (youtube_video_id, channel_id, publish_date)
+        VALUES (?, ?, ?)
+        ON CONFLICT(youtube_video_id) DO UPDATE SET
+            channel_id = excluded.channel_id,
+            publish_date = COALESCE(excluded.publish_date, publish_date)
+    ''', [(video_id, channel_id, publish_date) for video_id, publish_date in videos])
+
+    conn.commit()
+
+
+def get_channel_video_publish_dates(conn, channel_id: str) -> dict:
+    """
+    Возвращает даты публикации видео канала из каталога.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        channel_id (str): Идентификатор канала.
+
+    Returns:
+        dict: Словарь {идентификатор видео: дата публикации или None}.
+    """
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT youtube_video_id, publish_date
+        FROM videos
+        WHERE channel_id = ?
+    ''', (channel_id,))
+
+    return dict(cursor.fetchall())
+
+
+def get_thread_reply_counts(conn, comment_ids) -> dict:
+    """
+    Возвращает количество ответов веток на момент последней полной загрузки их ответов.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        comment_ids (list): Идентификаторы веток (основных комментариев).
+
+    Returns:
+        dict: Словарь {идентификатор ветки: количество ответов} для известных веток.
+    """
+    if not comment_ids:
+        return {}
+
+    placeholders = ", ".join("?" for _ in comment_ids)
+
+    cursor = conn.execute(f'''
+        SELECT comment_id, reply_count
+        FROM thread_reply_counts
+        WHERE comment_id IN ({placeholders})
+    ''', list(comment_ids))
+
+    return dict(cursor.fetchall())
@@ -1,4 +1,30 @@
+import time
+import socket
+
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+import config
+
+from metrics import API_REQUESTS, API_REQUEST_SECONDS
+from quota_scheduler import QuotaExceededError
+from rate_limiter import TokenBucketRateLimiter, compute_backoff_delay, parse_retry_after
+
+
+# Общий ограничитель частоты для всех запросов к YouTube API во всех потоках
+youtube_rate_limiter = TokenBucketRateLimiter(
+    rate=config.youtube_requests_per_second,
+    capacity=config.youtube_burst_requests
+)
+
+# Адрес YouTube Data API v3 по умолчанию
+DEFAULT_BASE_URL = "https://www.googleapis.com/youtube/v3"
+
+# Статусы, при которых запрос имеет смысл повторить
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Причины ошибки 403, означающие превышение частоты, а не квоты
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
 
 
 def get_youtube_service(credentials):
@@ -11,17 +37,130 @@ def get_youtube_service(credentials):
     Returns:
         googleapiclient.discovery.Resource: Учётные данные YouTube API для выполнения запросов.
     """
-    youtube_service = build('youtube', 'v3', credentials=credentials, cache_discovery=False)
+    client_options = None
+
+    # Запросы к локальному тестовому серверу (см. fake_youtube_api.py) вместо адреса по умолчанию
+    if config.youtube_api_base_url != DEFAULT_BASE_URL:
+        client_options = {"api_endpoint": config.youtube_api_base_url.rsplit('/youtube/v3', 1)[0] + '/'}
+
+    youtube_service = build(
+        'youtube', 'v3',
+        credentials=credentials,
+        cache_discovery=False,
+        client_options=client_options
+    )
 
     return youtube_service
 
 
-def get_channel_info(youtube_service):
+def is_retryable_error(err) -> bool:
+    """
+    Определяет, имеет ли смысл повторить запрос после ошибки.
+
+    Args:
+        err (Exception): Ошибка выполнения запроса.
+
+    Returns:
+        bool: True для ошибок частоты запросов, ошибок сервера и сетевых ошибок.
+    """
+    if isinstance(err, HttpError):
+        if err.resp.status in RETRYABLE_STATUSES:
+            return True
+
+        return err.resp.status == 403 and any(reason in str(err) for reason in RATE_LIMIT_REASONS)
+
+    return isinstance(err, (socket.timeout, ConnectionError, TimeoutError))
+
+
+def execute_request(request, endpoint, quota_tracker=None, logger=None):
+    """
+    Выполняет запрос к YouTube API с учётом квоты, ограничением частоты и повторами.
+
+    Перед каждой попыткой запрос ждёт разрешения общего ограничителя частоты и
+    проверяет остаток квоты проекта, после попытки её стоимость списывается (API
+    списывает квоту и за запросы, завершившиеся ошибкой). Временные ошибки (429, 5xx,
+    превышение частоты, сетевые ошибки) повторяются с экспоненциальным откатом и
+    джиттером с учётом Retry-After, но не больше `config.youtube_max_attempts` раз.
+
+    Args:
+        request (googleapiclient.http.HttpRequest): Подготовленный запрос.
+        endpoint (str): Метод API (например, "commentThreads.list").
+        quota_tracker (QuotaTracker, optional): Счётчик квоты проекта. По умолчанию None — без учёта.
+        logger (logging.Logger, optional): Логгер для сообщений о повторах.
+
+    Returns:
+        dict: Ответ API.
+
+    Raises:
+        QuotaExceededError: Если квота исчерпана по локальному учёту или по ответу API.
+        googleapiclient.errors.HttpError: При неустранимых ошибках API или после исчерпания попыток.
+    """
+    attempt = 0
+
+    while True:
+        attempt += 1
+        youtube_rate_limiter.acquire()
+
+        if quota_tracker is not None:
+            quota_tracker.ensure_available(endpoint)
+
+        status = "ok"
+        started = time.perf_counter()
+
+        try:
+            # Время запроса измеряется без пауз перед повтором
+            try:
+                response = request.execute()
+            finally:
+                API_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+
+            youtube_rate_limiter.on_success()
+
+            return response
+        except Exception as err:
+            status = str(err.resp.status) if isinstance(err, HttpError) else "error"
+
+            if isinstance(err, HttpError) and err.resp.status == 403 and 'quotaExceeded' in str(err):
+                if quota_tracker is not None:
+                    quota_tracker.mark_exhausted()
+
+                raise QuotaExceededError(str(err)) from err
+
+            if not is_retryable_error(err) or attempt >= config.youtube_max_attempts:
+                raise
+
+            retry_after = parse_retry_after(err.resp.get('retry-after')) if isinstance(err, HttpError) else None
+
+            if isinstance(err, HttpError) and err.resp.status in (403, 429):
+                youtube_rate_limiter.on_throttled(retry_after)
+
+            delay = max(
+                retry_after or 0,
+                compute_backoff_delay(attempt, config.youtube_backoff_base_seconds, config.youtube_backoff_max_seconds)
+            )
+
+            if logger is not None:
+                logger.warning(
+                    "Временная ошибка %s (%s), повтор %d/%d через %.1f с",
+                    endpoint, err, attempt, config.youtube_max_attempts - 1, delay
+                )
+
+            time.sleep(delay)
+        finally:
+            API_REQUESTS.inc(endpoint=endpoint, status=status)
+
+            if quota_tracker is not None:
+                quota_tracker.charge(endpoint)
+
+
+def get_channel_info(youtube_service, quota_tracker=None, logger=None):
     """
     Получает информацию о канале, связанном с учетными данными пользователя.
 
     Args:
         youtube_service (googleapiclient.discovery.Resource): Авторизованный сервис YouTube API.
+        quota_tracker (QuotaTracker, optional): Счётчик квоты проекта.
+        logger (logging.Logger, optional): Логгер.
 
     Returns:
         dict: Информация о канале (id, snippet, contentDetails, statistics),
@@ -31,7 +170,7 @@ def get_channel_info(youtube_service):
         part="id,snippet,contentDetails,statistics",
         mine=True
     )
-    response = request.execute()
+    response = execute_request(request, "channels.list", quota_tracker, logger)
 
     if response.get('items', None):
         return response['items'][0]
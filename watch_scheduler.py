@@ -0,0 +1,241 @@
+"""
+Модуль планировщика опроса видео для режима наблюдения.
+
+Каждое видео опрашивается со своим интервалом: новые и активно комментируемые видео —
+часто, видео без новых комментариев — всё реже (интервал растёт до максимального).
+Расписание хранится в таблице `video_schedule`, поэтому после перезапуска опрос
+продолжается с прежними интервалами.
+
+Краткое описание:
+- get_initial_interval: Начальный интервал опроса видео по его возрасту.
+- compute_next_interval: Следующий интервал опроса по числу новых комментариев.
+- VideoScheduler: Очередь с приоритетом по времени следующего опроса видео.
+"""
+import time
+import heapq
+
+from datetime import datetime, timezone
+
+
+def get_initial_interval(publish_date, min_interval: float, max_interval: float, now: datetime = None) -> float:
+    """
+    Возвращает начальный интервал опроса видео: свежие видео опрашиваются чаще.
+
+    Интервал удваивается с каждым днём возраста видео, начиная с минимального.
+
+    Args:
+        publish_date (str | None): Дата публикации видео в формате UTC.
+        min_interval (float): Минимальный интервал в секундах.
+        max_interval (float): Максимальный интервал в секундах.
+        now (datetime, optional): Текущий момент.
+
+    Returns:
+        float: Интервал в секундах.
+    """
+    if not publish_date:
+        return max_interval
+
+    now = now or datetime.now(timezone.utc)
+    published = datetime.strptime(publish_date[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+    age_days = max(0.0, (now - published).total_seconds() / 86400)
+
+    return min(max_interval, min_interval * 2 ** min(age_days, 30))
+
+
+def compute_next_interval(interval: float, new_comments: int, min_interval: float, max_interval: float, backoff: float) -> float:
+    """
+    Вычисляет следующий интервал опроса видео.
+
+    Если с прошлого опроса появились комментарии, интервал сокращается вдвое,
+    иначе увеличивается в `backoff` раз. Результат ограничен минимальным и
+    максимальным интервалом.
+
+    Args:
+        interval (float): Текущий интервал в секундах.
+        new_comments (int): Количество новых комментариев с прошлого опроса.
+        min_interval (float): Минимальный интервал в секундах.
+        max_interval (float): Максимальный интервал в секундах.
+        backoff (float): Множитель увеличения интервала.
+
+    Returns:
+        float: Новый интервал в секундах.
+    """
+    interval = interval / 2 if new_comments > 0 else interval * backoff
+
+    return min(max_interval, max(min_interval, interval))
+
+
+class VideoScheduler:
+    """
+    Очередь видео с приоритетом по времени следующего опроса (heapq).
+
+    Экземпляр используется одним потоком. Устаревшие элементы кучи не удаляются
+    сразу, а пропускаются при извлечении (время опроса видео хранится отдельно).
+    """
+
+    def __init__(self, conn, min_interval: float, max_interval: float, backoff: float):
+        """
+        Args:
+            conn (sqlite3.Connection): Соединение с базой данных.
+            min_interval (float): Минимальный интервал опроса видео в секундах.
+            max_interval (float): Максимальный интервал опроса видео в секундах.
+            backoff (float): Множитель увеличения интервала для видео без новых комментариев.
+        """
+        self.conn = conn
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+
+        self._heap = []
+        self._videos = {}
+
+        self._load()
+
+    def _load(self):
+        """
+        Загружает расписание из базы данных.
+        """
+        cursor = self.conn.execute('''
+            SELECT youtube_video_id, channel_id, next_poll_at, interval_seconds
+            FROM video_schedule
+        ''')
+
+        for video_id, channel_id, next_poll_at, interval in cursor.fetchall():
+            self._videos[video_id] = {"channel_id": channel_id, "next_poll_at": next_poll_at, "interval": interval}
+            self._heap.append((next_poll_at, video_id))
+
+        heapq.heapify(self._heap)
+
+    def _save(self, video_ids):
+        """
+        Сохраняет расписание видео в базу данных.
+        """
+        with self.conn:
+            self.conn.executemany('''
+                INSERT INTO video_schedule (youtube_video_id, channel_id, next_poll_at, interval_seconds, last_polled_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (youtube_video_id) DO UPDATE SET
+                    next_poll_at = excluded.next_poll_at,
+                    interval_seconds = excluded.interval_seconds,
+                    last_polled_at = COALESCE(excluded.last_polled_at, last_polled_at)
+            ''', [
+                (
+                    video_id,
+                    self._videos[video_id]["channel_id"],
+                    self._videos[video_id]["next_poll_at"],
+                    self._videos[video_id]["interval"],
+                    self._videos[video_id].get("last_polled_at")
+                )
+                for video_id in video_ids
+            ])
+
+    def _schedule(self, video_id: str, next_poll_at: float):
+        self._videos[video_id]["next_poll_at"] = next_poll_at
+        heapq.heappush(self._heap, (next_poll_at, video_id))
+
+    def add_videos(self, channel_id: str, publish_dates: dict) -> int:
+        """
+        Добавляет в расписание видео канала, которых в нём ещё нет.
+
+        Новое видео опрашивается сразу, дальше — с начальным интервалом по его возрасту.
+
+        Args:
+            channel_id (str): Идентификатор канала.
+            publish_dates (dict): Даты публикации видео {идентификатор: дата UTC или None}.
+
+        Returns:
+            int: Количество добавленных видео.
+        """
+        now = time.time()
+        added = [video_id for video_id in publish_dates if video_id not in self._videos]
+
+        for video_id in added:
+            self._videos[video_id] = {
+                "channel_id": channel_id,
+                "interval": get_initial_interval(publish_dates[video_id], self.min_interval, self.max_interval)
+            }
+            self._schedule(video_id, now)
+
+        if added:
+            self._save(added)
+
+        return len(added)
+
+    def pop_due(self, limit: int, now: float = None) -> list:
+        """
+        Извлекает видео, время опроса которых наступило.
+
+        Извлечённые видео нужно вернуть в расписание через record_poll или postpone.
+
+        Args:
+            limit (int): Максимальное количество видео.
+            now (float, optional): Текущее время (time.time()).
+
+        Returns:
+            list: Кортежи (идентификатор канала, идентификатор видео) в порядке срочности.
+        """
+        now = now or time.time()
+        due = []
+
+        while self._heap and len(due) < limit and self._heap[0][0] <= now:
+            next_poll_at, video_id = heapq.heappop(self._heap)
+            video = self._videos.get(video_id)
+
+            # Устаревший элемент кучи: видео уже перепланировано
+            if video is None or video["next_poll_at"] != next_poll_at:
+                continue
+
+            video["next_poll_at"] = None
+            due.append((video["channel_id"], video_id))
+
+        return due
+
+    def next_poll_at(self):
+        """
+        Returns:
+            float | None: Время ближайшего опроса (time.time()) или None, если расписание пусто.
+        """
+        while self._heap:
+            next_poll_at, video_id = self._heap[0]
+            video = self._videos.get(video_id)
+
+            if video is not None and video["next_poll_at"] == next_poll_at:
+                return next_poll_at
+
+            heapq.heappop(self._heap)
+
+        return None
+
+    def record_poll(self, video_new_comments: dict):
+        """
+        Планирует следующий опрос видео по результатам текущего.
+
+        Args:
+            video_new_comments (dict): Количество новых комментариев по опрошенным видео.
+        """
+        now = time.time()
+
+        for video_id, new_comments in video_new_comments.items():
+            video = self._videos[video_id]
+            video["interval"] = compute_next_interval(
+                video["interval"], new_comments, self.min_interval, self.max_interval, self.backoff
+            )
+            video["last_polled_at"] = now
+            self._schedule(video_id, now + video["interval"])
+
+        self._save(list(video_new_comments))
+
+    def postpone(self, video_ids, delay: float):
+        """
+        Откладывает опрос видео без изменения интервала (например, при нехватке квоты).
+
+        Args:
+            video_ids (list): Идентификаторы видео.
+            delay (float): Задержка в секундах.
+        """
+        now = time.time()
+
+        for video_id in video_ids:
+            self._schedule(video_id, now + delay)
+
+        self._save(list(video_ids))
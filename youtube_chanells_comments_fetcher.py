@@ -1,20 +1,58 @@
-import os
 import time
-import asyncio
 import sqlite3
+import argparse
 
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from functools import partial
+
+from datetime import datetime, timedelta, timezone
 
 import config
 
 from set_logger import set_logger
 from init_database import init_database
-from get_video_comments import get_video_comments
+from get_video_comments import CommentFetchError, iter_video_comment_pages
+from async_comment_fetcher import iter_videos_comments, get_threads_replies
 from get_channel_credentials import get_channel_credentials
-from get_all_video_ids_from_channel import get_all_video_ids_from_channel
-from telegram_notification import send_message_to_chat, send_message_to_group
+from get_channel_uploads import get_channel_uploads
+from get_videos_comment_counts import get_videos_comment_counts
+from telegram_notification import TelegramNotifier
+from notification_outbox import OutboxSender, enqueue_notifications, release_held_notifications
 from utils_youtube import get_channel_info, get_youtube_service
-from utils_json import load_json, save_json
+from quota_scheduler import QuotaExceededError, QuotaTracker, get_quota_project, plan_videos_within_budget
+from comments_archive import ThreadHashCache, append_threads_to_archive
+from comment_dimensions import DimensionCache
+from watch_scheduler import VideoScheduler
+from crawl_checkpoints import (
+    get_crawl_pass,
+    start_crawl_pass,
+    finish_crawl_pass,
+    get_crawl_checkpoints,
+    save_crawl_checkpoint,
+    complete_crawl_checkpoint
+)
+from stage_profiler import profiler
+from metrics import (
+    start_metrics_server,
+    write_metrics_textfile,
+    PAGES_PROCESSED,
+    NEW_COMMENTS,
+    DB_SAVE_SECONDS,
+    CHANNEL_DURATION_SECONDS
+)
+from utils_database import (
+    connect_database,
+    increment_channel_run_count,
+    is_full_crawl_run,
+    get_stored_comment_counts,
+    save_video_comment_count,
+    get_video_comments_watermark,
+    get_channel_video_ids,
+    save_channel_videos,
+    get_channel_video_publish_dates,
+    get_thread_reply_counts
+)
 
 
 def escape_markdown(text):
@@ -35,27 +73,27 @@ def escape_markdown(text):
     return ''.join(f'\\{char}' if char in reserved_chars else char for char in text)
 
 
-def get_parent_comment_text(reply_to):
+def get_parent_comment_text(conn, reply_to):
     """
     Получает текст родительского комментария.
 
     Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
         reply_to (str): ID родительского комментария.
 
     Returns:
         str: Текст родительского комментария, отформатированный для Telegram.
     """
     try:
-        with sqlite3.connect(config.database_path) as conn:
-            cursor = conn.cursor()
+        cursor = conn.cursor()
 
-            cursor.execute('''
-                SELECT text
-                FROM comments
-                WHERE comment_id = ?
-            ''', (reply_to,))
+        cursor.execute('''
+            SELECT text
+            FROM comment_rows
+            WHERE comment_id = ?
+        ''', (reply_to,))
 
-            reply_text_row = cursor.fetchone()
+        reply_text_row = cursor.fetchone()
 
         reply_text = escape_markdown(text=reply_text_row[0]) if reply_text_row else "_Комментарий не найден_"
         reply_quoted_text = "\n".join(f"> {line}" for line in reply_text.splitlines())
@@ -67,11 +105,12 @@ def get_parent_comment_text(reply_to):
         return "\n\nОтвет на: _Ошибка при загрузке комментария_"
 
 
-def format_comment_for_telegram(new_comment, channel_name):
+def format_comment_for_telegram(conn, new_comment, channel_name):
     """
     Форматирует текст комментария для отправки в Telegram.
 
     Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
         new_comment (dict): Данные комментария.
         channel_name (str): Название канала.
 
@@ -97,7 +136,11 @@ def format_comment_for_telegram(new_comment, channel_name):
     if is_updated:
         quoted_text += "\n\n_\\(Комментарий изменён\\)_"
 
-    reply_note = get_parent_comment_text(reply_to) if reply_to else ""
+    reply_note = ""
+
+    if reply_to:
+        with profiler.stage("get_parent_comment_text"):
+            reply_note = get_parent_comment_text(conn, reply_to)
 
     return (
         f"{channel_name_with_url}\n\n"
@@ -107,92 +150,75 @@ def format_comment_for_telegram(new_comment, channel_name):
     )
 
 
-def send_comment_to_telegram(new_comment, channel_name):
+def build_comment_notifications(conn, new_comments, channel_name):
     """
-    Отправляет комментарий в Telegram.
+    Форматирует уведомления о новых комментариях для очереди notification_outbox.
 
     Args:
-        new_comment (dict): Данные комментария.
+        conn (sqlite3.Connection): Соединение с базой данных.
+        new_comments (list): Новые комментарии.
         channel_name (str): Название канала.
-    """
-    try:
-        telegram_message = format_comment_for_telegram(new_comment, channel_name)
-        need_mention_user = config.user_id is not None
-
-        try:
-            if config.user_id and config.user_id == config.chat_id:
-                asyncio.run(
-                    send_message_to_chat(
-                        message=telegram_message,
-                        parse_mode='MarkdownV2',
-                        mention_user=need_mention_user,
-                        main_logger=logger
-                    )
-                )
-            else:
-                asyncio.run(
-                    send_message_to_group(
-                        message=telegram_message,
-                        thread_id=config.thread_id,
-                        mention_user=need_mention_user,
-                        parse_mode='MarkdownV2',
-                        main_logger=logger
-                    )
-                )
-
-            time.sleep(5)
-        except Exception as err:
-            logger.error("Ошибка при отправке сообщения в Telegram: %s", err)
-    except KeyError as key_err:
-        logger.error("Ошибка: отсутствует ключ в данных комментария: %s", key_err)
-    except Exception as err:
-        logger.error("Ошибка обработки комментария: %s", err)
-
-
-def comment_exists(cursor, comment_id, updated_date):
-    """
-    Проверяет, существует ли комментарий в базе данных.
-
-    Args:
-        cursor (sqlite3.Cursor): Курсор базы данных.
-        comment_id (str): Идентификатор комментария.
-        updated_date (str): Дата обновления комментария.
 
     Returns:
-        bool: True, если комментарий существует, иначе False.
+        list: Кортежи (channel_id, video_id, comment_id, message) для enqueue_notifications.
     """
-    cursor.execute('''
-        SELECT 1
-        FROM comments
-        WHERE comment_id = ? AND updated_date = ?
-    ''', (comment_id, updated_date))
-
-    return cursor.fetchone() is not None
+    notifications = []
 
-
-def insert_comment(cursor, comment_data, channel_name):
+    for new_comment in new_comments:
+        try:
+            notifications.append((
+                new_comment['snippet']['channelId'],
+                new_comment['snippet']['videoId'],
+                new_comment['id'],
+                format_comment_for_telegram(conn, new_comment, channel_name)
+            ))
+        except KeyError as key_err:
+            logger.error("Ошибка: отсутствует ключ в данных комментария: %s", key_err)
+        except Exception as err:
+            logger.error("Ошибка обработки комментария: %s", err)
+
+    return notifications
+
+
+# Столбцы представления comments в порядке значений, возвращаемых build_comment_row
+COMMENT_COLUMNS = (
+    "channel_name",
+    "youtube_video_id",
+    "channel_id",
+    "comment_id",
+    "author",
+    "author_channel_id",
+    "text",
+    "publish_date",
+    "updated_date",
+    "reply_to"
+)
+
+# Столбцы таблицы comment_rows (канал, видео и автор заменены ключами справочников)
+COMMENT_ROW_COLUMNS = (
+    "video_key",
+    "channel_key",
+    "comment_id",
+    "author_key",
+    "text",
+    "publish_date",
+    "updated_date",
+    "reply_to"
+)
+
+
+def build_comment_row(comment_data, channel_name):
     """
-    Вставляет новый комментарий в базу данных.
+    Формирует строку представления comments из данных комментария.
 
     Args:
-        cursor (sqlite3.Cursor): Курсор базы данных.
         comment_data (dict): Данные комментария.
         channel_name (str): Имя канала.
+
+    Returns:
+        tuple: Значения столбцов в порядке COMMENT_COLUMNS.
     """
-    cursor.execute('''
-        INSERT INTO comments (
-            channel_name,
-            youtube_video_id,
-            channel_id,
-            comment_id,
-            author,
-            author_channel_id,
-            text,
-            publish_date,
-            updated_date,
-            reply_to
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
+    return (
         channel_name,
         comment_data['snippet']['videoId'],
         comment_data['snippet']['channelId'],
@@ -203,94 +229,281 @@ def insert_comment(cursor, comment_data, channel_name):
         comment_data['snippet']['publishedAt'],
         comment_data['snippet']['updatedAt'],
         comment_data['snippet'].get('parentId', None)
-    ))
+    )
 
 
-def save_comments_to_db(database_path, items, channel_name):
+def has_other_comment_versions(cursor) -> bool:
     """
-    Сохраняет новые комментарии и ответы в базу данных.
+    Проверяет, есть ли в загруженной во временную таблицу пачке версии комментариев,
+    отличные от текущих версий в comment_rows.
 
     Args:
-        database_path (str): Путь к базе данных.
-        items (list): Список комментариев (топовых и ответов).
-        channel_name (str): Имя канала.
+        cursor (sqlite3.Cursor): Курсор базы данных (внутри открытой транзакции).
 
     Returns:
-        list: Список новых комментариев и ответов, успешно сохранённых в базу данных.
+        bool: True, если в пачке есть изменённые комментарии.
     """
-    if not items:
-        return []
-
-    new_comments = []
+    cursor.execute('''
+        SELECT EXISTS (
+            SELECT 1
+            FROM staged_comments AS staged
+            JOIN comment_rows ON comment_rows.comment_id = staged.comment_id
+            WHERE staged.updated_date <> comment_rows.updated_date
+        )
+    ''')
 
-    try:
-        with sqlite3.connect(database_path) as conn:
-            cursor = conn.cursor()
+    return bool(cursor.fetchone()[0])
 
-            for comment_data in items:
-                if not comment_data:
-                    continue
 
-                updated_date = comment_data['snippet']['updatedAt']
-                comment_id   = comment_data['id']
-                author       = comment_data['snippet']['authorDisplayName']
-                text         = comment_data['snippet']['textDisplay']
+def save_comment_versions(cursor) -> set:
+    """
+    Сохраняет версии комментариев пачки, отличные от текущих (см. insert_new_comment_rows).
 
-                if comment_exists(cursor=cursor, comment_id=comment_id, updated_date=updated_date):
-                    continue
+    Args:
+        cursor (sqlite3.Cursor): Курсор базы данных (внутри открытой транзакции).
 
-                insert_comment(cursor=cursor, comment_data=comment_data, channel_name=channel_name)
+    Returns:
+        set: Множество кортежей (comment_id, updated_date) добавленных версий.
+    """
+    columns = ", ".join(COMMENT_ROW_COLUMNS)
+
+    # Индекс нужен только запросам ниже: в обычном случае он замедлял бы загрузку пачки
+    cursor.execute('CREATE INDEX temp.idx_staged_comments_comment_id ON staged_comments (comment_id)')
+
+    # Текущие версии, которые заменяются более новыми версиями из пачки
+    replaced_condition = '''
+        comment_id IN (SELECT comment_id FROM staged_comments)
+        AND updated_date < (
+            SELECT MAX(staged.updated_date)
+            FROM staged_comments AS staged
+            WHERE staged.comment_id = comment_rows.comment_id
+        )
+    '''
+
+    cursor.execute(f'''
+        INSERT INTO comment_revisions (comment_id, updated_date, text)
+        SELECT comment_id, updated_date, text
+        FROM comment_rows
+        WHERE {replaced_condition}
+        ORDER BY id
+        ON CONFLICT (comment_id, updated_date) DO NOTHING
+    ''')
+    cursor.execute(f'DELETE FROM comment_rows WHERE {replaced_condition}')
+
+    cursor.execute(f'''
+        INSERT INTO comment_rows ({columns})
+        SELECT {columns}
+        FROM (
+            SELECT
+                *,
+                rowid AS staged_order,
+                ROW_NUMBER() OVER (PARTITION BY comment_id ORDER BY updated_date DESC) AS version_rank
+            FROM staged_comments
+        )
+        WHERE version_rank = 1
+        ORDER BY staged_order
+        ON CONFLICT (comment_id) DO NOTHING
+        RETURNING comment_id, updated_date
+    ''')
 
-                new_comments.append(comment_data)
-                logger.info("Новая запись с комментарием от %s: %s", author, text)
-    except sqlite3.Error as err:
-        logger.error("Ошибка базы данных: %s", err)
-    except Exception as err:
-        logger.error("Ошибка в функции save_comments_to_db: %s", err)
+    inserted_keys = set(cursor.fetchall())
 
-    return new_comments
+    cursor.execute('''
+        INSERT INTO comment_revisions (comment_id, updated_date, text)
+        SELECT staged.comment_id, staged.updated_date, staged.text
+        FROM staged_comments AS staged
+        JOIN comment_rows ON comment_rows.comment_id = staged.comment_id
+        WHERE staged.updated_date < comment_rows.updated_date
+        ORDER BY staged.rowid
+        ON CONFLICT (comment_id, updated_date) DO NOTHING
+        RETURNING comment_id, updated_date
+    ''')
 
+    inserted_keys.update(cursor.fetchall())
 
-def generate_save_path(channel_id, video_id, comment_id, updated_date):
-    """
-    Генерирует путь для сохранения JSON-файла с данными комментария.
+    cursor.execute('DROP INDEX temp.idx_staged_comments_comment_id')
 
-    Создает директорию для хранения данных, если её не существует, и формирует имя файла,
-    включающее идентификаторы канала, видео, комментария и дату обновления.
+    return inserted_keys
 
-    Args:
-        channel_id (str): Идентификатор канала.
-        video_id (str): Идентификатор видео.
-        comment_id (str): Идентификатор комментария.
-        updated_date (str): Отформатированная дата обновления комментария.
 
-    Returns:
-        str: Полный путь к файлу для сохранения данных комментария.
+def insert_new_comment_rows(cursor, rows, dimension_cache):
     """
-    folder_path = os.path.join(config.path_to_comments_data_storage_dir, channel_id)
+    Сохраняет пачку строк комментариев и возвращает ключи действительно новых версий.
+
+    Канал, видео и автор каждой строки заменяются ключами справочников (см. comment_dimensions).
+    Таблица comment_rows хранит одну текущую версию каждого комментария, прежние версии
+    хранятся в comment_revisions только текстом. Строки загружаются одним executemany
+    во временную таблицу и одним запросом INSERT ... ON CONFLICT DO NOTHING RETURNING
+    переносятся в comment_rows. Обычно этого достаточно: новые комментарии вставлены,
+    остальные уже сохранены в той же версии.
 
-    os.makedirs(folder_path, exist_ok=True)
+    Если в пачке есть другие версии уже сохранённых комментариев, они переносятся
+    несколькими запросами на всю пачку:
 
-    return os.path.join(folder_path, f"{channel_id} - {video_id} - {comment_id} - {updated_date}.json")
+    1. текущие версии, для которых в пачке есть более новая, переносятся в comment_revisions
+       и удаляются из comment_rows;
+    2. самая новая версия каждого комментария пачки вставляется в comment_rows (с новым id,
+       поэтому изменённый комментарий попадает в инкрементальную выгрузку как новая строка);
+    3. прочие ещё не сохранённые версии, старее текущей, добавляются в comment_revisions.
 
+    Args:
+        cursor (sqlite3.Cursor): Курсор базы данных (внутри открытой транзакции).
+        rows (list): Строки в порядке столбцов COMMENT_COLUMNS.
+        dimension_cache (DimensionCache): Ключи справочников каналов, видео и авторов.
 
-def comments_have_changed(past_data, current_data):
+    Returns:
+        set: Множество кортежей (comment_id, updated_date) добавленных версий.
+    """
+    columns = ", ".join(COMMENT_ROW_COLUMNS)
+    placeholders = ", ".join("?" for _ in COMMENT_ROW_COLUMNS)
+
+    cursor.execute(f'''
+        CREATE TEMP TABLE IF NOT EXISTS staged_comments ({columns})
+    ''')
+    cursor.execute('DELETE FROM staged_comments')
+
+    # Ключи справочников запрашиваются у базы только для новых каналов, видео и авторов;
+    # каждое такое обращение начинается с записи, как и вставка строк ниже
+    # (чтение перед записью в режиме WAL приводит к ошибке блокировки при записи из других потоков)
+    channel_keys = dimension_cache.get_channel_keys(cursor, {
+        channel_id: channel_name for channel_name, _, channel_id, *_ in rows
+    })
+    video_keys = dimension_cache.get_video_keys(cursor, {
+        video_id: channel_keys[channel_id] for _, video_id, channel_id, *_ in rows
+    })
+    author_keys = dimension_cache.get_author_keys(cursor, {
+        (author_channel_id, author) for _, _, _, _, author, author_channel_id, *_ in rows
+    })
+
+    cursor.executemany(f'''
+        INSERT INTO staged_comments ({columns}) VALUES ({placeholders})
+    ''', [
+        (video_keys[video_id], channel_keys[channel_id], comment_id, author_keys[(author_channel_id, author)], *values)
+        for _, video_id, channel_id, comment_id, author, author_channel_id, *values in rows
+    ])
+
+    cursor.execute(f'''
+        INSERT INTO comment_rows ({columns})
+        SELECT {columns}
+        FROM staged_comments
+        WHERE true
+        ORDER BY rowid
+        ON CONFLICT (comment_id) DO NOTHING
+        RETURNING comment_id, updated_date
+    ''')
+
+    inserted_keys = set(cursor.fetchall())
+
+    if len(inserted_keys) < len(rows) and has_other_comment_versions(cursor):
+        inserted_keys.update(save_comment_versions(cursor))
+
+    cursor.execute('DELETE FROM staged_comments')
+
+    return inserted_keys
+
+
+def save_comments_to_db(conn, items, channel_name, notify=False, reply_counts=None, checkpoint=None, dimension_cache=None):
     """
-    Сравнивает данные комментариев из двух источников и определяет, изменились ли ответы.
+    Сохраняет новые комментарии и ответы в базу данных.
 
-    Функция извлекает список ответов (если они имеются) из прошлых и текущих данных и сравнивает их.
+    Вся пачка записывается за один проход в одной транзакции (см. insert_new_comment_rows)
+    вместо отдельных SELECT и INSERT на каждый комментарий. При `notify` в той же
+    транзакции в очередь notification_outbox добавляются уведомления о новых комментариях,
+    поэтому уведомление не теряется, даже если программа завершится до его отправки.
 
     Args:
-        past_data (dict): Ранее сохранённые данные комментария.
-        current_data (dict): Текущие данные комментария.
+        conn (sqlite3.Connection): Соединение с базой данных.
+        items (list): Список комментариев (топовых и ответов).
+        channel_name (str): Имя канала.
+        notify (bool, optional): Добавлять ли уведомления о новых комментариях в очередь.
+        reply_counts (list, optional): Кортежи (comment_id, video_id, количество ответов) веток,
+            ответы которых загружены полностью. Сохраняются в той же транзакции, поэтому
+            при ошибке сохранения ответы будут загружены повторно.
+        checkpoint (tuple, optional): Контрольная точка обхода (channel_id, video_id, номер видео,
+            токен следующей страницы), сохраняемая в той же транзакции (см. crawl_checkpoints).
+        dimension_cache (DimensionCache, optional): Ключи справочников каналов, видео и авторов.
+            По умолчанию создаётся на один вызов.
 
     Returns:
-        bool: True, если данные ответов отличаются, иначе False.
+        list: Список новых комментариев и ответов, успешно сохранённых в базу данных.
     """
-    past_comments = past_data.get('replies', {}).get('comments')
-    current_comments = current_data.get('replies', {}).get('comments')
+    if not items and checkpoint is None:
+        return []
+
+    if dimension_cache is None:
+        dimension_cache = DimensionCache()
+
+    rows = []
+    staged_comments = []
+
+    for comment_data in items:
+        if not comment_data:
+            continue
+
+        try:
+            rows.append(build_comment_row(comment_data=comment_data, channel_name=channel_name))
+            staged_comments.append(comment_data)
+        except KeyError as err:
+            logger.error("Отсутствует ключ %s в комментарии %s", err, comment_data.get('id', 'неизвестный'))
+
+    new_comments = []
+    started = time.perf_counter()
+
+    try:
+        with conn:
+            cursor = conn.cursor()
+            inserted_keys = insert_new_comment_rows(cursor=cursor, rows=rows, dimension_cache=dimension_cache)
+
+            for comment_data in staged_comments:
+                key = (comment_data['id'], comment_data['snippet']['updatedAt'])
+
+                # Дубликаты внутри пачки вставляются один раз
+                if key not in inserted_keys:
+                    continue
 
-    return past_comments != current_comments
+                inserted_keys.discard(key)
+                new_comments.append(comment_data)
+
+            if notify and new_comments:
+                with profiler.stage("build_comment_notifications"):
+                    notifications = build_comment_notifications(conn, new_comments, channel_name)
+
+                enqueue_notifications(cursor, notifications)
+
+            if reply_counts:
+                synced_date = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+                cursor.executemany('''
+                    INSERT INTO thread_reply_counts (comment_id, youtube_video_id, reply_count, synced_date)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (comment_id) DO UPDATE SET
+                        reply_count = excluded.reply_count,
+                        synced_date = excluded.synced_date
+                ''', [(comment_id, video_id, reply_count, synced_date) for comment_id, video_id, reply_count in reply_counts])
+
+            if checkpoint is not None:
+                save_crawl_checkpoint(cursor, *checkpoint)
+
+        dimension_cache.commit()
+
+        for comment_data in new_comments:
+            logger.info(
+                "Новая запись с комментарием от %s: %s",
+                comment_data['snippet']['authorDisplayName'],
+                comment_data['snippet']['textDisplay']
+            )
+    except sqlite3.Error as err:
+        # Транзакция откатана: ни комментарии, ни уведомления не сохранены
+        new_comments = []
+        dimension_cache.rollback()
+        logger.error("Ошибка базы данных: %s", err)
+    except Exception as err:
+        dimension_cache.rollback()
+        logger.error("Ошибка в функции save_comments_to_db: %s", err)
+
+    DB_SAVE_SECONDS.observe(time.perf_counter() - started)
+
+    return new_comments
 
 
 def convert_utc_to_local(utc_time: str, logger) -> datetime:
@@ -318,54 +531,6 @@ def convert_utc_to_local(utc_time: str, logger) -> datetime:
         raise ValueError("Ошибка в формате даты.") from err
 
 
-def save_comment_data_to_json(comment_data):
-    """
-    Сохраняет данные комментария в JSON-файл.
-
-    Функция извлекает необходимую информацию из словаря с данными комментария, формирует путь для сохранения файла,
-    загружает предыдущие данные (если они существуют) и сравнивает их с текущими данными. Если данные изменились,
-    производится сохранение обновленных данных в JSON-файл.
-
-    Args:
-        comment_data (dict): Словарь с данными комментария, полученными из API или другого источника.
-
-    Raises:
-        KeyError: Если ожидаемый ключ отсутствует в comment_data.
-        OSError: Если возникает ошибка при работе с файловой системой.
-        Exception: При возникновении непредвиденной ошибки.
-    """
-    try:
-        top_level_comment_data = comment_data['snippet']['topLevelComment']
-        updated_date           = top_level_comment_data['snippet']['updatedAt']
-        channel_id             = comment_data['snippet']['channelId']
-        video_id               = comment_data['snippet']['videoId']
-        comment_id             = comment_data['id']
-
-        updated_date_local = convert_utc_to_local(utc_time=updated_date, logger=logger)
-        formatted_updated_date = updated_date_local.strftime('%Y-%m-%d %H-%M-%S')
-
-        save_path = generate_save_path(
-            channel_id=channel_id,
-            video_id=video_id,
-            comment_id=comment_id,
-            updated_date=formatted_updated_date
-        )
-
-        if os.path.exists(save_path):
-            past_json_data = load_json(file_path=save_path, default_type={}, logger=logger)
-
-            if past_json_data and not comments_have_changed(past_data=past_json_data, current_data=comment_data):
-                return
-
-        save_json(file_path=save_path, data=comment_data, logger=logger)
-    except KeyError as err:
-        logger.error("Отсутствует ожидаемый ключ в comment_data: %s", err)
-    except OSError as err:
-        logger.error("Ошибка файловой системы: %s", err)
-    except Exception:
-        logger.exception("Неожиданная ошибка в save_comment_data_to_json.")
-
-
 def extract_comments_with_replies(comments_data):
     """
     Извлекает комментарии и их ответы из предоставленных данных.
@@ -397,46 +562,789 @@ def extract_comments_with_replies(comments_data):
     return comments
 
 
-def process_video(video_id, video_index, total_videos, youtube_service, channel_name):
+def fetch_channel_comments(youtube_service, credentials, conn, video_ids, channel_name, incremental, quota_tracker, start_page_tokens=None):
     """
-    Обрабатывает комментарии для одного видео.
+    Загружает комментарии видео канала и отдаёт их постранично по мере загрузки.
+
+    Если включена настройка `config.async_comment_fetch`, одновременно загружаются
+    до `config.async_fetch_concurrency` видео, и страницы разных видео могут чередоваться.
+    Иначе видео загружаются по очереди через youtube_service.
+
+    Видео из `start_page_tokens` загружаются с сохранённой страницы прерванного обхода.
+    Для них инкрементальная остановка не применяется: несохранённые страницы до прерывания
+    содержат ещё не загруженные старые ветки.
 
     Args:
-        video_id (str): Идентификатор видео.
-        video_index (int): Индекс текущего видео в списке.
-        total_videos (int): Общее количество видео.
         youtube_service: Сервис YouTube API.
+        credentials (google.auth.credentials.Credentials): Учётные данные канала.
+        conn (sqlite3.Connection): Соединение с базой данных.
+        video_ids (list): Идентификаторы видео.
         channel_name (str): Название канала.
+        incremental (bool): Загружать только страницы с новыми ветками.
+        quota_tracker (QuotaTracker | QuotaReservation): Счётчик или резерв квоты проекта.
+        start_page_tokens (dict, optional): Токены начальных страниц видео {идентификатор видео: токен}.
+
+    Yields:
+        tuple: (идентификатор видео, ветки одной страницы, токен следующей страницы). После
+               последней страницы видео отдаётся (идентификатор видео, None, None), а если видео
+               загружено не полностью — (идентификатор видео, CommentFetchError, None).
+
+    Raises:
+        QuotaExceededError: Если квота проекта исчерпана.
+    """
+    start_page_tokens = start_page_tokens or {}
+
+    def get_watermark(video_id):
+        if not incremental or video_id in start_page_tokens:
+            return None
+
+        return get_video_comments_watermark(conn=conn, video_id=video_id)
+
+    total_videos = len(video_ids)
+
+    if config.async_comment_fetch:
+        videos = [(video_id, get_watermark(video_id), start_page_tokens.get(video_id)) for video_id in video_ids]
+
+        logger.info("Асинхронная загрузка комментариев %d видео канала [ %s ]", total_videos, channel_name)
+
+        yield from iter_videos_comments(
+            credentials=credentials,
+            videos=videos,
+            concurrency=config.async_fetch_concurrency,
+            logger=logger,
+            base_url=config.youtube_api_base_url,
+            quota_tracker=quota_tracker
+        )
+
+        return
+
+    for index, video_id in enumerate(video_ids):
+        video_label = f"[ {channel_name} | {video_id} | {index+1}/{total_videos} ]"
+        logger.info("Обновление комментариев видео %s", video_label)
+
+        pages = iter_video_comment_pages(
+            youtube_service=youtube_service,
+            video_id=video_id,
+            logger=logger,
+            known_watermark=get_watermark(video_id),
+            quota_tracker=quota_tracker,
+            page_token=start_page_tokens.get(video_id)
+        )
+
+        try:
+            for page_items, next_page_token in pages:
+                yield video_id, page_items, next_page_token
+        except CommentFetchError as err:
+            yield video_id, err, None
+
+            continue
+
+        yield video_id, None, None
+
+
+def complete_thread_replies(conn, comments_data, reply_fetcher):
+    """
+    Дополняет ветки страницы всеми ответами, если вместе с веткой пришли не все.
+
+    commentThreads.list возвращает только несколько ответов ветки. Для веток, у которых
+    totalReplyCount больше числа вернувшихся ответов и отличается от сохранённого при
+    прошлой загрузке, ответы загружаются полностью через comments.list(parentId=...).
+    Ветки с неизменившимся количеством ответов повторно не загружаются и остаются
+    с неполным списком ответов.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        comments_data (list): Ветки комментариев одной страницы (дополняются на месте).
+        reply_fetcher (callable): Функция (список идентификаторов веток) -> {идентификатор: ответы или None}.
+
+    Returns:
+        tuple: Кортежи (comment_id, video_id, количество ответов) для полностью загруженных веток
+            и множество идентификаторов веток, ответы которых остались неполными.
+    """
+    incomplete_threads = {}
+
+    for comment_data in comments_data:
+        try:
+            total_reply_count = comment_data['snippet'].get('totalReplyCount', 0)
+            inline_replies = comment_data.get('replies', {}).get('comments', [])
+
+            if total_reply_count > len(inline_replies):
+                incomplete_threads[comment_data['id']] = comment_data
+        except KeyError as err:
+            logger.error("Отсутствует ключ %s в ветке %s", err, comment_data.get('id', 'неизвестный'))
+
+    stored_reply_counts = get_thread_reply_counts(conn, list(incomplete_threads))
+
+    changed_thread_ids = [
+        comment_id for comment_id, comment_data in incomplete_threads.items()
+        if stored_reply_counts.get(comment_id) != comment_data['snippet']['totalReplyCount']
+    ]
+
+    if not changed_thread_ids:
+        return [], set(incomplete_threads)
+
+    replies_by_thread = reply_fetcher(changed_thread_ids)
+    reply_counts = []
+
+    for comment_id in changed_thread_ids:
+        replies = replies_by_thread.get(comment_id)
+
+        # При ошибке загрузки остаются ответы, пришедшие вместе с веткой
+        if replies is None:
+            continue
+
+        comment_data = incomplete_threads[comment_id]
+        comment_data['replies'] = {'comments': replies}
+        reply_counts.append((comment_id, comment_data['snippet']['videoId'], comment_data['snippet']['totalReplyCount']))
+        del incomplete_threads[comment_id]
+
+    logger.info("Загружены все ответы для %d веток из %d", len(reply_counts), len(changed_thread_ids))
+
+    return reply_counts, set(incomplete_threads)
+
+
+def process_comments_page(conn, comments_data, channel_name, hash_cache=None, reply_fetcher=None, checkpoint=None, dimension_cache=None):
     """
-    video_label = f"[ {channel_name} | {video_id} | {video_index+1}/{total_videos} ]"
-    logger.info("Обновление комментариев видео %s", video_label)
+    Обрабатывает одну загруженную страницу веток комментариев видео.
+
+    Каждый этап (архив, база данных вместе с очередью уведомлений) фиксируется
+    сразу для страницы, поэтому уведомления о новых комментариях отправляются,
+    пока остальные страницы видео ещё загружаются.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        comments_data (list): Ветки комментариев одной страницы.
+        channel_name (str): Название канала.
+        hash_cache (ThreadHashCache, optional): Хэши заархивированных веток канала.
+        reply_fetcher (callable, optional): Загрузчик всех ответов веток (см. complete_thread_replies).
+            По умолчанию None — сохраняются только ответы, пришедшие вместе с веткой.
+        checkpoint (tuple, optional): Контрольная точка обхода, сохраняемая вместе с комментариями
+            (см. save_comments_to_db).
+        dimension_cache (DimensionCache, optional): Ключи справочников каналов, видео и авторов.
 
-    comments_data = get_video_comments(youtube_service=youtube_service, video_id=video_id, logger=logger)
+    Returns:
+        int: Количество новых комментариев и ответов.
 
-    # Сначала сохраняем комментарии в JSON, если включено в настройках
+    Raises:
+        QuotaExceededError: Если квота проекта исчерпана при загрузке ответов.
+    """
+    # Дополняем ветки недостающими ответами до архивирования и сохранения
+    reply_counts = []
+    archived_threads = comments_data
+
+    if reply_fetcher:
+        with profiler.stage("complete_thread_replies"):
+            reply_counts, incomplete_thread_ids = complete_thread_replies(conn, comments_data, reply_fetcher)
+
+        # Ветка с неполными ответами не архивируется: её хэш не совпал бы с хэшем полной
+        # версии в архиве, и усечённая копия стала бы последней версией ветки
+        archived_threads = [
+            comment_data for comment_data in comments_data
+            if comment_data.get('id') not in incomplete_thread_ids
+        ]
+
+    # Сохраняем исходные данные веток в архив, если включено в настройках
     if config.save_comments_data_to_json:
-        for comment_data in comments_data:
-            save_comment_data_to_json(comment_data=comment_data)
+        try:
+            with profiler.stage("append_threads_to_archive"):
+                append_threads_to_archive(
+                    conn=conn,
+                    comment_threads=archived_threads,
+                    archive_dir=config.path_to_comments_archive_dir,
+                    compression=config.comments_archive_compression,
+                    logger=logger,
+                    hash_cache=hash_cache
+                )
+        except (OSError, sqlite3.Error) as err:
+            logger.error("Ошибка при сохранении комментариев в архив: %s", err)
 
-    # Извлекаем комментарии и сохраняем новые записи в базу данных
+    # Извлекаем комментарии и сохраняем новые записи в базу данных вместе с уведомлениями о них
     comments_to_db = extract_comments_with_replies(comments_data=comments_data)
-    new_comments = save_comments_to_db(database_path=config.database_path, items=comments_to_db, channel_name=channel_name)
 
-    # Отправляем уведомления в Telegram для новых комментариев
-    if config.send_notification_on_telegram:
-        for new_comment in new_comments:
-            send_comment_to_telegram(new_comment=new_comment, channel_name=channel_name)
+    with profiler.stage("save_comments_to_db"):
+        new_comments = save_comments_to_db(
+            conn=conn,
+            items=comments_to_db,
+            channel_name=channel_name,
+            notify=config.send_notification_on_telegram,
+            reply_counts=reply_counts,
+            checkpoint=checkpoint,
+            dimension_cache=dimension_cache
+        )
+
+    return len(new_comments)
+
+
+def sync_channel_videos(youtube_service, conn, upload_playlist_id, channel_id, channel_name, full_sync, quota_tracker):
+    """
+    Синхронизирует каталог видео канала с плейлистом загрузок и возвращает все видео канала.
+
+    Из плейлиста загружаются только видео новее последнего известного, поэтому обычный
+    запуск стоит один запрос к плейлисту. В полном запуске плейлист загружается целиком,
+    чтобы подхватить видео, пропущенные инкрементальной синхронизацией.
+
+    Args:
+        youtube_service: Сервис YouTube API.
+        conn (sqlite3.Connection): Соединение с базой данных.
+        upload_playlist_id (str): Идентификатор плейлиста загрузок.
+        channel_id (str): Идентификатор канала.
+        channel_name (str): Название канала.
+        full_sync (bool): Загрузить плейлист целиком.
+        quota_tracker (QuotaTracker): Счётчик квоты проекта.
+
+    Returns:
+        list: Идентификаторы всех известных видео канала, от новых к старым.
+    """
+    known_video_ids = set(get_channel_video_ids(conn=conn, channel_id=channel_id))
+
+    new_videos = get_channel_uploads(
+        youtube_service=youtube_service,
+        upload_playlist_id=upload_playlist_id,
+        channel_name=channel_name,
+        logger=logger,
+        known_video_ids=None if full_sync else known_video_ids,
+        quota_tracker=quota_tracker
+    )
+
+    # Сохраняем только полностью загруженный список, иначе остановка на первом
+    # известном видео в следующий раз пропустит недогруженную часть плейлиста
+    if new_videos is None:
+        logger.warning("Не удалось синхронизировать плейлист канала [ %s ], используем сохранённый каталог.", channel_name)
+    elif new_videos:
+        save_channel_videos(conn=conn, channel_id=channel_id, videos=new_videos)
+
+    return get_channel_video_ids(conn=conn, channel_id=channel_id)
+
+
+def select_videos_to_update(youtube_service, conn, video_ids, channel_id, channel_name, full_crawl, quota_tracker):
+    """
+    Отбирает видео, комментарии которых нужно обновить в текущем запуске.
+
+    Для всех видео канала запрашивается текущее количество комментариев и сравнивается
+    с сохранённым после прошлой обработки. Обновляются только видео, у которых количество
+    изменилось или которые ещё не обрабатывались. В полном запуске обходятся все видео канала.
+
+    Args:
+        youtube_service: Сервис YouTube API.
+        conn (sqlite3.Connection): Соединение с базой данных.
+        video_ids (list): Идентификаторы всех видео канала.
+        channel_id (str): Идентификатор канала.
+        channel_name (str): Название канала.
+        full_crawl (bool): Полный ли это запуск.
+        quota_tracker (QuotaTracker): Счётчик квоты проекта.
+
+    Returns:
+        tuple: (список видео для обновления, словарь текущего количества комментариев или None).
+    """
+    if not config.skip_unchanged_videos:
+        return video_ids, None
+
+    comment_counts = get_videos_comment_counts(
+        youtube_service=youtube_service,
+        video_ids=video_ids,
+        channel_name=channel_name,
+        logger=logger,
+        quota_tracker=quota_tracker
+    )
+
+    if comment_counts is None:
+        logger.warning("Не удалось получить статистику видео канала [ %s ], обновляем все видео.", channel_name)
+
+        return video_ids, None
+
+    if full_crawl:
+        return video_ids, comment_counts
+
+    stored_counts = get_stored_comment_counts(conn=conn, channel_id=channel_id)
 
+    videos_to_update = [
+        video_id for video_id in video_ids
+        if video_id not in stored_counts or stored_counts[video_id] != comment_counts.get(video_id)
+    ]
 
-def process_channel(token_path, client_secret_path):
+    logger.info(
+        "Канал [ %s ]: изменились комментарии у %d из %d видео",
+        channel_name, len(videos_to_update), len(video_ids)
+    )
+
+    return videos_to_update, comment_counts
+
+
+def plan_channel_crawl(conn, video_ids, comment_counts, channel_id, channel_name, incremental, quota_tracker):
+    """
+    Упорядочивает видео канала по приоритету и отбирает те, что укладываются в остаток квоты.
+
+    Бюджет запуска — остаток дневной квоты проекта за вычетом `config.quota_reserve_units`
+    и единиц, зарезервированных параллельно обрабатываемыми каналами того же проекта.
+    Сначала обновляются свежие видео и видео с наибольшим числом новых комментариев,
+    остальные откладываются на следующий запуск. Оценка расхода на запланированные видео
+    резервируется, чтобы другие каналы проекта не рассчитывали на эту же квоту.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        video_ids (list): Идентификаторы видео для обновления.
+        comment_counts (dict | None): Текущее количество комментариев видео.
+        channel_id (str): Идентификатор канала.
+        channel_name (str): Название канала.
+        incremental (bool): Используется ли инкрементальная загрузка.
+        quota_tracker (QuotaTracker): Счётчик квоты проекта.
+
+    Returns:
+        tuple: (список видео для обновления, список отложенных видео, QuotaReservation —
+            резерв квоты, через который оплачиваются запросы обхода).
+    """
+    budget_units = quota_tracker.available() - config.quota_reserve_units
+
+    planned, deferred, planned_units = plan_videos_within_budget(
+        video_ids=video_ids,
+        publish_dates=get_channel_video_publish_dates(conn=conn, channel_id=channel_id),
+        comment_counts=comment_counts,
+        stored_counts=get_stored_comment_counts(conn=conn, channel_id=channel_id),
+        budget_units=budget_units,
+        incremental=incremental,
+        reply_fetch_ratio=config.quota_reply_fetch_ratio if config.sync_all_replies else 0.0
+    )
+    reservation = quota_tracker.reserve(planned_units)
+
+    if deferred:
+        logger.warning(
+            "Канал [ %s ]: остаток квоты %d ед., обновляется %d видео, отложено до следующего запуска %d",
+            channel_name, budget_units, len(planned), len(deferred)
+        )
+
+    return planned, deferred, reservation
+
+
+def resume_channel_crawl(conn, video_ids, channel_id, channel_name):
+    """
+    Подготавливает продолжение прерванного обхода канала по его контрольным точкам.
+
+    Завершённые в обходе видео пропускаются, начатые загружаются с сохранённой страницы.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        video_ids (list): Идентификаторы видео для обновления.
+        channel_id (str): Идентификатор канала.
+        channel_name (str): Название канала.
+
+    Returns:
+        tuple: (список видео для обновления, словарь токенов начальных страниц начатых видео).
+    """
+    completed_video_ids, checkpoints = get_crawl_checkpoints(conn=conn, channel_id=channel_id)
+
+    remaining_video_ids = [video_id for video_id in video_ids if video_id not in completed_video_ids]
+    started_video_ids = [video_id for video_id in remaining_video_ids if video_id in checkpoints]
+    start_page_tokens = {video_id: checkpoints[video_id][1] for video_id in started_video_ids}
+
+    logger.info(
+        "Канал [ %s ]: продолжение прерванного обхода, завершено видео %d, начато %d (последнее — №%s), осталось %d",
+        channel_name,
+        len(completed_video_ids),
+        len(started_video_ids),
+        max((checkpoints[video_id][0] for video_id in started_video_ids), default="-"),
+        len(remaining_video_ids)
+    )
+
+    return remaining_video_ids, start_page_tokens
+
+
+def make_reply_fetcher(credentials, quota_tracker):
+    """
+    Создаёт загрузчик всех ответов веток для complete_thread_replies.
+
+    Ответы веток загружаются параллельно через асинхронный клиент.
+
+    Args:
+        credentials (google.auth.credentials.Credentials): Учётные данные канала.
+        quota_tracker (QuotaTracker | QuotaReservation): Счётчик или резерв квоты проекта.
+
+    Returns:
+        callable | None: Загрузчик или None, если настройка `config.sync_all_replies` выключена.
+    """
+    if not config.sync_all_replies:
+        return None
+
+    return partial(
+        get_threads_replies,
+        credentials,
+        concurrency=config.async_fetch_concurrency,
+        logger=logger,
+        base_url=config.youtube_api_base_url,
+        quota_tracker=quota_tracker
+    )
+
+
+def process_fetched_pages(conn, fetched_pages, video_ids, comment_counts, channel_id, channel_name, hash_cache, reply_fetcher, result, checkpoints=False, dimension_cache=None):
+    """
+    Сохраняет страницы комментариев, отдаваемые fetch_channel_comments, и подводит итог по видео.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        fetched_pages (iterable): Кортежи (идентификатор видео, страница, токен следующей страницы).
+            В конце видео вместо страницы передаётся None или CommentFetchError, если видео
+            загружено не полностью.
+        video_ids (list): Идентификаторы загружаемых видео (для номеров в логах).
+        comment_counts (dict | None): Текущее количество комментариев видео.
+        channel_id (str): Идентификатор канала.
+        channel_name (str): Название канала.
+        hash_cache (ThreadHashCache): Хэши заархивированных веток канала.
+        reply_fetcher (callable | None): Загрузчик всех ответов веток.
+        result (dict): Итог обработки канала (обновляется на месте: videos_processed,
+            new_comments, video_errors).
+        checkpoints (bool, optional): Сохранять ли контрольные точки обхода канала
+            (см. crawl_checkpoints). По умолчанию False.
+        dimension_cache (DimensionCache, optional): Ключи справочников каналов, видео и авторов.
+            По умолчанию создаётся на время вызова.
+
+    Raises:
+        QuotaExceededError: Если квота проекта исчерпана.
+    """
+    # Видео, при обработке страниц которых возникла ошибка, и номера видео для логов
+    failed_video_ids = set()
+    video_numbers = {video_id: index + 1 for index, video_id in enumerate(video_ids)}
+    dimension_cache = dimension_cache or DimensionCache()
+
+    for video_id, comments_data, next_page_token in profiler.iterate(fetched_pages, "fetch_comments"):
+        video_label = f"[ {channel_name} | {video_id} | {video_numbers.get(video_id)}/{len(video_ids)} ]"
+
+        # Видео загружено не полностью: его количество комментариев и отметка о завершении
+        # в обходе не сохраняются, контрольная точка остаётся на последней сохранённой странице
+        if isinstance(comments_data, CommentFetchError):
+            if video_id not in failed_video_ids:
+                failed_video_ids.add(video_id)
+                result["video_errors"] += 1
+
+            logger.error("Комментарии %s загружены не полностью: %s", video_label, comments_data)
+
+            continue
+
+        if comments_data is not None:
+            if video_id in failed_video_ids:
+                continue
+
+            checkpoint = (channel_id, video_id, video_numbers.get(video_id), next_page_token) if checkpoints else None
+
+            try:
+                new_comments = process_comments_page(conn, comments_data, channel_name, hash_cache, reply_fetcher, checkpoint, dimension_cache)
+                result["new_comments"] += new_comments
+
+                PAGES_PROCESSED.inc(channel=channel_name)
+                NEW_COMMENTS.inc(new_comments, channel=channel_name)
+            except QuotaExceededError:
+                raise
+            except Exception as err:
+                failed_video_ids.add(video_id)
+                result["video_errors"] += 1
+                logger.error("Ошибка при обновлении комментариев для %s: %s", video_label, err)
+
+            continue
+
+        # Все страницы видео загружены
+        if video_id in failed_video_ids:
+            continue
+
+        result["videos_processed"] += 1
+
+        # Запоминаем количество комментариев только после успешной обработки всех страниц видео,
+        # чтобы при ошибке видео было обновлено в следующем запуске. Отметка о завершении видео
+        # в обходе фиксируется в той же транзакции
+        has_comment_count = comment_counts is not None and video_id in comment_counts
+
+        if not has_comment_count and not checkpoints:
+            continue
+
+        try:
+            with profiler.stage("save_video_comment_count"), conn:
+                if checkpoints:
+                    complete_crawl_checkpoint(conn.cursor(), channel_id, video_id, video_numbers.get(video_id))
+
+                if has_comment_count:
+                    save_video_comment_count(
+                        conn=conn,
+                        channel_id=channel_id,
+                        video_id=video_id,
+                        comment_count=comment_counts[video_id]
+                    )
+        except Exception as err:
+            logger.error("Ошибка при сохранении количества комментариев для %s: %s", video_label, err)
+
+
+def process_channel(token_path, client_secret_path, credentials, quota_tracker):
     """
     Обрабатывает обновление комментариев для канала.
 
+    Функция выполняется в отдельном потоке пула: она создаёт собственный сервис YouTube API
+    и собственное соединение с базой данных, поэтому каналы обрабатываются независимо.
+
     Args:
         token_path (dict): Путь к token.
         client_secret_path (dict): Путь к client_secret.
+        credentials (google.auth.credentials.Credentials): Учётные данные канала.
+        quota_tracker (QuotaTracker): Счётчик квоты проекта, общий для каналов одного client_secret.
+
+    Returns:
+        dict: Итог обработки канала: название, число видео, новых комментариев,
+              ошибок по видео, отложенных видео и текст ошибки канала (None при успехе).
+    """
+    result = {
+        "token_path": token_path,
+        "channel_name": None,
+        "videos_total": 0,
+        "videos_processed": 0,
+        "new_comments": 0,
+        "video_errors": 0,
+        "videos_deferred": 0,
+        "error": None
+    }
+    conn = None
+    channel_id = None
+    reservation = None
+    started = time.monotonic()
+
+    with profiler.channel(token_path, logger):
+        try:
+            youtube_service = get_youtube_service(credentials=credentials)
+            channel_info = get_channel_info(youtube_service=youtube_service, quota_tracker=quota_tracker, logger=logger)
+            channel_id = channel_info['id']
+            channel_name = channel_info['snippet']['title']
+            upload_playlist_id = channel_info['contentDetails']['relatedPlaylists']['uploads']
+
+            result["channel_name"] = channel_name
+            logger.info("Началось обновление комментариев с канала [ %s ]", channel_name)
+
+            conn = connect_database(config.database_path, timeout=config.database_timeout)
+
+            # Незавершённый обход продолжается с тем же режимом, новый запуск при этом не считается
+            crawl_pass = get_crawl_pass(conn=conn, channel_id=channel_id, max_age_hours=config.crawl_checkpoint_max_age_hours)
+
+            if crawl_pass is not None:
+                full_crawl = crawl_pass["full_crawl"]
+            else:
+                run_count = increment_channel_run_count(conn=conn, channel_id=channel_id)
+                full_crawl = is_full_crawl_run(run_count=run_count, full_crawl_every_n_runs=config.full_crawl_every_n_runs)
+
+                if full_crawl:
+                    logger.info("Запуск №%d: полный обход всех видео канала [ %s ]", run_count, channel_name)
+
+            with profiler.stage("sync_channel_videos"):
+                video_ids = sync_channel_videos(
+                    youtube_service=youtube_service,
+                    conn=conn,
+                    upload_playlist_id=upload_playlist_id,
+                    channel_id=channel_id,
+                    channel_name=channel_name,
+                    full_sync=full_crawl,
+                    quota_tracker=quota_tracker
+                )
+
+            with profiler.stage("select_videos_to_update"):
+                video_ids, comment_counts = select_videos_to_update(
+                    youtube_service=youtube_service,
+                    conn=conn,
+                    video_ids=video_ids,
+                    channel_id=channel_id,
+                    channel_name=channel_name,
+                    full_crawl=full_crawl,
+                    quota_tracker=quota_tracker
+                )
+            incremental = config.incremental_comment_fetch and not full_crawl
+            start_page_tokens = {}
+
+            if crawl_pass is not None:
+                video_ids, start_page_tokens = resume_channel_crawl(
+                    conn=conn,
+                    video_ids=video_ids,
+                    channel_id=channel_id,
+                    channel_name=channel_name
+                )
+            else:
+                start_crawl_pass(conn=conn, channel_id=channel_id, full_crawl=full_crawl)
+
+            with profiler.stage("plan_channel_crawl"):
+                video_ids, deferred_video_ids, reservation = plan_channel_crawl(
+                    conn=conn,
+                    video_ids=video_ids,
+                    comment_counts=comment_counts,
+                    channel_id=channel_id,
+                    channel_name=channel_name,
+                    incremental=incremental,
+                    quota_tracker=quota_tracker
+                )
+
+            # Начатые в прерванном обходе видео догружаются первыми
+            video_ids.sort(key=lambda video_id: video_id not in start_page_tokens)
+
+            total_videos = len(video_ids)
+            result["videos_total"] = total_videos
+            result["videos_deferred"] = len(deferred_video_ids)
+
+            fetched_pages = fetch_channel_comments(
+                youtube_service=youtube_service,
+                credentials=credentials,
+                conn=conn,
+                video_ids=video_ids,
+                channel_name=channel_name,
+                incremental=incremental,
+                quota_tracker=reservation,
+                start_page_tokens=start_page_tokens
+            )
+
+            process_fetched_pages(
+                conn=conn,
+                fetched_pages=fetched_pages,
+                video_ids=video_ids,
+                comment_counts=comment_counts,
+                channel_id=channel_id,
+                channel_name=channel_name,
+                hash_cache=ThreadHashCache(conn),
+                reply_fetcher=make_reply_fetcher(credentials=credentials, quota_tracker=reservation),
+                result=result,
+                checkpoints=True
+            )
+
+            # Обход завершён, если все видео обработаны; отложенные из-за квоты и загруженные
+            # не полностью видео обходятся в следующем запуске как продолжение этого обхода
+            # (незавершённый обход старше config.crawl_checkpoint_max_age_hours начинается заново)
+            if not deferred_video_ids and not result["video_errors"]:
+                finish_crawl_pass(conn=conn, channel_id=channel_id)
+
+            logger.info("Завершено обновление комментариев с канала [ %s ]", channel_name)
+        except QuotaExceededError as err:
+            # Необработанные видео не получили новое количество комментариев
+            # и будут обновлены в следующем запуске
+            result["error"] = "квота исчерпана"
+            result["videos_deferred"] += result["videos_total"] - result["videos_processed"] - result["video_errors"]
+            logger.error("Канал с токеном %s остановлен: %s", token_path, err)
+        except Exception as err:
+            result["error"] = str(err)
+            logger.error("Ошибка обработки канала с токеном %s: %s", token_path, err)
+        finally:
+            # Неизрасходованный резерв квоты становится доступен другим каналам проекта
+            if reservation is not None:
+                reservation.release()
+
+            if conn is not None:
+                # Сводка канала открывается для отправки и при остановке канала:
+                # комментарии уже сохранены в базе данных
+                if channel_id is not None and config.telegram_digest_mode == "channel":
+                    try:
+                        release_held_notifications(conn, channel_id)
+                    except sqlite3.Error as err:
+                        logger.error("Не удалось открыть сводку канала [ %s ] для отправки: %s", channel_name, err)
+
+                conn.close()
+
+            if result["channel_name"] is not None:
+                CHANNEL_DURATION_SECONDS.set(time.monotonic() - started, channel=result["channel_name"])
+
+    return result
+
+
+def log_channels_summary(results):
+    """
+    Выводит в лог итоги обработки всех каналов.
+
+    Args:
+        results (list): Итоги обработки каналов, возвращённые process_channel.
+    """
+    for result in results:
+        channel_label = result["channel_name"] or result["token_path"]
+
+        if result["error"]:
+            logger.error("Канал [ %s ]: ошибка — %s", channel_label, result["error"])
+        else:
+            logger.info(
+                "Канал [ %s ]: обработано видео %d/%d, новых комментариев %d, ошибок по видео %d, отложено %d",
+                channel_label,
+                result["videos_processed"],
+                result["videos_total"],
+                result["new_comments"],
+                result["video_errors"],
+                result["videos_deferred"]
+            )
+
+
+def start_outbox_sender():
+    """
+    Запускает отправку уведомлений из очереди notification_outbox в фоновом потоке.
+
+    Returns:
+        tuple: (TelegramNotifier, OutboxSender) или (None, None), если уведомления отключены,
+               отправляются отдельным процессом или подключиться к Telegram не удалось.
+    """
+    if not config.send_notification_on_telegram or config.notification_outbox_separate_sender:
+        return None, None
+
+    notifier = TelegramNotifier(main_logger=logger)
+
+    # Без подключения к Telegram уведомления остаются в очереди до следующего запуска
+    if not notifier.start():
+        logger.warning("Уведомления не отправляются: они останутся в очереди notification_outbox.")
+
+        return None, None
+
+    outbox_sender = OutboxSender(database_path=config.database_path, notifier=notifier, main_logger=logger)
+    outbox_sender.start()
+
+    return notifier, outbox_sender
+
+
+def stop_outbox_sender(notifier, outbox_sender):
+    """
+    Дожидается отправки готовых уведомлений и останавливает отправку.
+
+    Args:
+        notifier (TelegramNotifier | None): Отправитель сообщений в Telegram.
+        outbox_sender (OutboxSender | None): Отправитель уведомлений из очереди.
+    """
+    if outbox_sender is not None:
+        logger.info("Ожидание отправки уведомлений из очереди в Telegram.")
+        outbox_sender.stop()
+        notifier.stop()
+
+
+def start_metrics_exporter():
+    """
+    Запускает HTTP-сервер метрик, если задан `config.metrics_http_port`.
     """
+    if config.metrics_http_port:
+        start_metrics_server(port=config.metrics_http_port, address=config.metrics_http_address, logger=logger)
+
+
+def export_metrics():
+    """
+    Записывает метрики в файл, если задан `config.metrics_textfile_path`.
+    """
+    if not config.metrics_textfile_path:
+        return
+
     try:
+        write_metrics_textfile(config.metrics_textfile_path)
+    except OSError as err:
+        logger.error("Не удалось записать метрики в %s: %s", config.metrics_textfile_path, err)
+
+
+def get_channel_tasks(results):
+    """
+    Получает учётные данные каналов из конфигурации и счётчики квоты их проектов.
+
+    Учётные данные получаются последовательно в главном потоке: обновление токена
+    может потребовать диалога с пользователем.
+
+    Args:
+        results (list): Итоги обработки каналов (дополняется каналами без учётных данных).
+
+    Returns:
+        tuple: (список кортежей (token_path, client_secret_path, credentials, quota_tracker),
+                словарь счётчиков квоты по проектам).
+    """
+    channel_tasks = []
+    quota_trackers = {}
+
+    for channel_data in config.channels:
+        token_path = channel_data["token_channel_path"]
+        client_secret_path = channel_data["client_secret_path"]
+
         credentials = get_channel_credentials(
             client_secret_path=client_secret_path,
             token_path=token_path,
@@ -444,37 +1352,54 @@ def process_channel(token_path, client_secret_path):
             main_logger=logger
         )
 
-        youtube_service = get_youtube_service(credentials=credentials)
-        channel_info = get_channel_info(youtube_service=youtube_service)
-        channel_name = channel_info['snippet']['title']
-        upload_playlist_id = channel_info['contentDetails']['relatedPlaylists']['uploads']
+        if credentials is None:
+            logger.error("Не удалось получить учетные данные для токена %s, канал пропущен.", token_path)
+            results.append({
+                "token_path": token_path,
+                "channel_name": None,
+                "error": "нет учетных данных"
+            })
 
-        logger.info("Началось обновление комментариев с канала [ %s ]", channel_name)
+            continue
 
-        video_ids = get_all_video_ids_from_channel(
-            youtube_service=youtube_service,
-            upload_playlist_id=upload_playlist_id,
-            channel_name=channel_name,
-            logger=logger
-        )
+        # Каналы с общим client_secret расходуют квоту одного проекта
+        project = get_quota_project(client_secret_path)
 
-        total_videos = len(video_ids)
+        if project not in quota_trackers:
+            quota_trackers[project] = QuotaTracker(
+                database_path=config.database_path,
+                project=project,
+                daily_limit=config.quota_daily_limit,
+                logger=logger
+            )
 
-        for index, video_id in enumerate(video_ids):
-            try:
-                process_video(video_id, index, total_videos, youtube_service, channel_name)
-            except Exception as err:
-                video_label = f"[ {channel_name} | {video_id} | {index+1}/{total_videos} ]"
-                logger.error("Ошибка при обновлении комментариев для %s: %s", video_label, err)
+        channel_tasks.append((token_path, client_secret_path, credentials, quota_trackers[project]))
 
-        logger.info("Завершено обновление комментариев с канала [ %s ]", channel_name)
-    except Exception as err:
-        logger.error("Ошибка обработки канала с токеном %s: %s", token_path, err)
+    return channel_tasks, quota_trackers
+
+
+def close_quota_trackers(quota_trackers):
+    """
+    Выводит в лог расход квоты проектов и закрывает счётчики.
+
+    Args:
+        quota_trackers (dict): Счётчики квоты по проектам.
+    """
+    for project, quota_tracker in quota_trackers.items():
+        logger.info(
+            "Квота проекта %s: осталось %d ед., расход по методам: %s",
+            project, quota_tracker.remaining(), quota_tracker.usage_by_endpoint()
+        )
+        quota_tracker.close()
 
 
 def main():
     """
     Главная функция для запуска процесса получения комментариев с каналов.
+
+    Учётные данные каналов получаются последовательно в главном потоке (обновление токена
+    может потребовать диалога с пользователем), после чего каналы обрабатываются
+    параллельно в пуле из `config.channel_workers` потоков.
     """
     logger.info("Программа для получения комментариев с каналов запущена!")
 
@@ -483,16 +1408,296 @@ def main():
         main_logger=logger
     )
 
-    for channel_data in config.channels:
-        token_path = channel_data["token_channel_path"]
-        client_secret_path = channel_data["client_secret_path"]
+    results = []
+    start_metrics_exporter()
+
+    # Уведомления отправляются из очереди notification_outbox параллельно с обходом каналов
+    notifier, outbox_sender = start_outbox_sender()
+    channel_tasks, quota_trackers = get_channel_tasks(results)
+
+    with ThreadPoolExecutor(max_workers=max(1, config.channel_workers)) as executor:
+        futures = [executor.submit(process_channel, *channel_task) for channel_task in channel_tasks]
 
-        process_channel(token_path, client_secret_path)
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    stop_outbox_sender(notifier, outbox_sender)
+    log_channels_summary(results)
+    close_quota_trackers(quota_trackers)
+    export_metrics()
 
     logger.info("Все каналы обработаны!")
 
 
+def prepare_watched_channel(conn, token_path, credentials, quota_tracker):
+    """
+    Получает сведения о канале для режима наблюдения.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        token_path (str): Путь к token.
+        credentials (google.auth.credentials.Credentials): Учётные данные канала.
+        quota_tracker (QuotaTracker): Счётчик квоты проекта.
+
+    Returns:
+        dict: Состояние канала: сервис API, идентификатор, название, плейлист загрузок и т. д.
+    """
+    youtube_service = get_youtube_service(credentials=credentials)
+    channel_info = get_channel_info(youtube_service=youtube_service, quota_tracker=quota_tracker, logger=logger)
+
+    return {
+        "token_path": token_path,
+        "credentials": credentials,
+        "quota_tracker": quota_tracker,
+        "youtube_service": youtube_service,
+        "channel_id": channel_info['id'],
+        "channel_name": channel_info['snippet']['title'],
+        "upload_playlist_id": channel_info['contentDetails']['relatedPlaylists']['uploads'],
+        "hash_cache": ThreadHashCache(conn),
+        "dimension_cache": DimensionCache(),
+        "reply_fetcher": make_reply_fetcher(credentials=credentials, quota_tracker=quota_tracker),
+        "uploads_checked_at": 0.0
+    }
+
+
+def check_channel_uploads(conn, channel, scheduler):
+    """
+    Обновляет каталог видео канала и добавляет новые видео в расписание опроса.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        channel (dict): Состояние канала (см. prepare_watched_channel).
+        scheduler (VideoScheduler): Расписание опроса видео.
+    """
+    sync_channel_videos(
+        youtube_service=channel["youtube_service"],
+        conn=conn,
+        upload_playlist_id=channel["upload_playlist_id"],
+        channel_id=channel["channel_id"],
+        channel_name=channel["channel_name"],
+        full_sync=False,
+        quota_tracker=channel["quota_tracker"]
+    )
+
+    added = scheduler.add_videos(
+        channel_id=channel["channel_id"],
+        publish_dates=get_channel_video_publish_dates(conn=conn, channel_id=channel["channel_id"])
+    )
+
+    if added:
+        logger.info("Канал [ %s ]: в расписание добавлено видео: %d", channel["channel_name"], added)
+
+    channel["uploads_checked_at"] = time.time()
+
+
+def poll_channel_videos(conn, channel, scheduler, video_ids):
+    """
+    Опрашивает видео канала, время которых наступило, и планирует следующий опрос.
+
+    Количество комментариев всех видео запрашивается одним вызовом videos.list на 50 видео;
+    комментарии загружаются только для видео, у которых количество изменилось.
+
+    Args:
+        conn (sqlite3.Connection): Соединение с базой данных.
+        channel (dict): Состояние канала (см. prepare_watched_channel).
+        scheduler (VideoScheduler): Расписание опроса видео.
+        video_ids (list): Идентификаторы опрашиваемых видео.
+    """
+    channel_id = channel["channel_id"]
+    channel_name = channel["channel_name"]
+    quota_tracker = channel["quota_tracker"]
+
+    if quota_tracker.remaining() - len(video_ids) <= config.quota_reserve_units:
+        logger.warning("Канал [ %s ]: квота на исходе, опрос %d видео отложен.", channel_name, len(video_ids))
+        scheduler.postpone(video_ids, config.watch_max_interval_seconds / 4)
+
+        return
+
+    comment_counts = get_videos_comment_counts(
+        youtube_service=channel["youtube_service"],
+        video_ids=video_ids,
+        channel_name=channel_name,
+        logger=logger,
+        quota_tracker=quota_tracker
+    )
+
+    if comment_counts is None:
+        scheduler.postpone(video_ids, config.watch_min_interval_seconds)
+
+        return
+
+    stored_counts = get_stored_comment_counts(conn=conn, channel_id=channel_id)
+    changed_video_ids = [video_id for video_id in video_ids if comment_counts.get(video_id) != stored_counts.get(video_id)]
+
+    # Для ещё не обработанных видео прирост неизвестен: их интервал задан возрастом видео
+    new_comments_by_video = {
+        video_id: max(0, (comment_counts.get(video_id) or 0) - stored_counts[video_id])
+        if stored_counts.get(video_id) is not None else 0
+        for video_id in video_ids
+    }
+
+    result = {"videos_processed": 0, "new_comments": 0, "video_errors": 0}
+
+    try:
+        fetched_pages = fetch_channel_comments(
+            youtube_service=channel["youtube_service"],
+            credentials=channel["credentials"],
+            conn=conn,
+            video_ids=changed_video_ids,
+            channel_name=channel_name,
+            incremental=config.incremental_comment_fetch,
+            quota_tracker=quota_tracker
+        )
+
+        process_fetched_pages(
+            conn=conn,
+            fetched_pages=fetched_pages,
+            video_ids=changed_video_ids,
+            comment_counts=comment_counts,
+            channel_id=channel_id,
+            channel_name=channel_name,
+            hash_cache=channel["hash_cache"],
+            reply_fetcher=channel["reply_fetcher"],
+            result=result,
+            dimension_cache=channel["dimension_cache"]
+        )
+    except QuotaExceededError as err:
+        logger.error("Канал [ %s ]: опрос остановлен: %s", channel_name, err)
+        scheduler.postpone(video_ids, config.watch_max_interval_seconds / 4)
+
+        return
+    finally:
+        if config.telegram_digest_mode == "channel":
+            release_held_notifications(conn, channel_id)
+
+    scheduler.record_poll(new_comments_by_video)
+
+    logger.info(
+        "Канал [ %s ]: опрошено видео %d, изменилось %d, новых комментариев %d",
+        channel_name, len(video_ids), len(changed_video_ids), result["new_comments"]
+    )
+
+
+def watch_channels():
+    """
+    Режим наблюдения: непрерывно опрашивает видео каналов, каждое со своим интервалом.
+
+    Свежие и активно комментируемые видео опрашиваются раз в `config.watch_min_interval_seconds`,
+    интервал видео без новых комментариев растёт до `config.watch_max_interval_seconds`.
+    Новые видео каналов проверяются раз в `config.watch_uploads_check_seconds`.
+    Расписание хранится в базе данных. Работа завершается по Ctrl+C.
+    """
+    logger.info("Режим наблюдения за комментариями каналов запущен!")
+
+    init_database(database_path=config.database_path, main_logger=logger)
+
+    results = []
+    start_metrics_exporter()
+    notifier, outbox_sender = start_outbox_sender()
+    channel_tasks, quota_trackers = get_channel_tasks(results)
+    conn = connect_database(config.database_path, timeout=config.database_timeout)
+
+    try:
+        channels = {}
+
+        for token_path, _, credentials, quota_tracker in channel_tasks:
+            try:
+                channel = prepare_watched_channel(conn, token_path, credentials, quota_tracker)
+                channels[channel["channel_id"]] = channel
+            except Exception as err:
+                logger.error("Ошибка подготовки канала с токеном %s: %s", token_path, err)
+
+        scheduler = VideoScheduler(
+            conn=conn,
+            min_interval=config.watch_min_interval_seconds,
+            max_interval=config.watch_max_interval_seconds,
+            backoff=config.watch_interval_backoff
+        )
+
+        while True:
+            for channel in channels.values():
+                if time.time() - channel["uploads_checked_at"] >= config.watch_uploads_check_seconds:
+                    try:
+                        check_channel_uploads(conn, channel, scheduler)
+                    except Exception as err:
+                        logger.error("Ошибка проверки новых видео канала [ %s ]: %s", channel["channel_name"], err)
+                        channel["uploads_checked_at"] = time.time()
+
+            due_videos = scheduler.pop_due(limit=config.watch_batch_size)
+
+            if not due_videos:
+                export_metrics()
+
+                next_uploads_check = min(
+                    (channel["uploads_checked_at"] + config.watch_uploads_check_seconds for channel in channels.values()),
+                    default=time.time() + config.watch_uploads_check_seconds
+                )
+                next_poll_at = scheduler.next_poll_at() or next_uploads_check
+
+                time.sleep(max(1.0, min(next_poll_at, next_uploads_check) - time.time()))
+
+                continue
+
+            videos_by_channel = {}
+
+            for channel_id, video_id in due_videos:
+                videos_by_channel.setdefault(channel_id, []).append(video_id)
+
+            for channel_id, video_ids in videos_by_channel.items():
+                # Видео каналов, удалённых из конфигурации, опрашиваются как можно реже
+                if channel_id not in channels:
+                    scheduler.postpone(video_ids, config.watch_max_interval_seconds)
+
+                    continue
+
+                try:
+                    poll_channel_videos(conn, channels[channel_id], scheduler, video_ids)
+                except Exception as err:
+                    logger.error("Ошибка опроса видео канала [ %s ]: %s", channels[channel_id]["channel_name"], err)
+                    scheduler.postpone(video_ids, config.watch_min_interval_seconds)
+    except KeyboardInterrupt:
+        logger.info("Режим наблюдения остановлен.")
+    finally:
+        conn.close()
+        stop_outbox_sender(notifier, outbox_sender)
+        close_quota_trackers(quota_trackers)
+        export_metrics()
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Получение новых комментариев с каналов YouTube.")
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Режим наблюдения: непрерывный опрос видео с адаптивными интервалами."
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Измерять время этапов обработки и сохранить отчёт в config.profile_output_dir."
+    )
+    parser.add_argument(
+        "--profile-cpu",
+        action="store_true",
+        help="Вместе с --profile снимать профиль cProfile для каждого канала (файл pstats)."
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Вместе с --profile отслеживать выделения памяти через tracemalloc."
+    )
+    args = parser.parse_args()
+
     logger = set_logger(config.log_folder)
 
-    main()
+    if args.profile or args.profile_cpu or args.profile_memory:
+        profiler.start(cpu=args.profile_cpu, memory=args.profile_memory)
+
+    try:
+        if args.watch:
+            watch_channels()
+        else:
+            main()
+    finally:
+        if profiler.enabled:
+            profiler.dump(config.profile_output_dir, logger)